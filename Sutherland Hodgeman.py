@@ -2,96 +2,262 @@ import pygame
 from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
+import os
 import sys
+import numpy as np
+from clip_window import ClipWindow
+from robust_predicates import orient2d
+from triangulation import TriangulationCache
 
 
 # --- Sutherland-Hodgman Polygon Clipping Algorithm ---
 
-def get_intersection(p1, p2, edge_start, edge_end):
-    """
-    Finds the intersection of a line segment (p1, p2) with an infinite line defined by an edge.
-    This is a modified version to work with the infinite edge lines for clipping.
-    """
-    s1_x, s1_y = p2[0] - p1[0], p2[1] - p1[1]
-    edge_x, edge_y = edge_end[0] - edge_start[0], edge_end[1] - edge_start[1]
-
-    denom = (-edge_x * s1_y + s1_x * edge_y)
-    if denom == 0:
-        return None  # Parallel
-
-    s_num = -s1_y * (p1[0] - edge_start[0]) + s1_x * (p1[1] - edge_start[1])
-    t_num = edge_x * (p1[1] - edge_start[1]) - edge_y * (p1[0] - edge_start[0])
-
-    s = s_num / denom
-    t = t_num / denom
-
-    if 0 <= t <= 1:  # Only care if intersection is on the segment p1-p2
-        i_x = p1[0] + (t * s1_x)
-        i_y = p1[1] + (t * s1_y)
-        return (i_x, i_y)
-
-    return None
-
-
-def is_inside(p, edge_start, edge_end):
-    """
-    Checks if a point 'p' is on the 'inside' of an infinite line defined by an edge.
-    Assumes a clockwise ordering of the clip polygon vertices.
-    Uses the cross-product to determine the side.
-    """
-    return (edge_end[0] - edge_start[0]) * (p[1] - edge_start[1]) - (edge_end[1] - edge_start[1]) * (
-                p[0] - edge_start[0]) <= 0
-
-
 def sutherland_hodgman_clip(subject_polygon, clip_polygon):
     """
     Clips a subject polygon against a convex clip polygon using the Sutherland-Hodgman algorithm.
+    'clip_polygon' is a ClipWindow or a vertex list; passing a ClipWindow reuses its normalized
+    clockwise vertices when many polygons are clipped against the same window.
     """
-    if not subject_polygon or not clip_polygon:
+    if not subject_polygon or not len(clip_polygon):
         return []
+    window = clip_polygon if isinstance(clip_polygon, ClipWindow) else ClipWindow(clip_polygon)
+    if window.is_rectangle:
+        clipped = RectClipper(window).clip(subject_polygon)
+        return [[tuple(v) for v in clipped.tolist()]] if len(clipped) else []
 
     clipped_vertices = list(subject_polygon)
 
     # Iterate through each edge of the clipping polygon
-    for i in range(len(clip_polygon)):
-        edge_start = clip_polygon[i - 1]
-        edge_end = clip_polygon[i]
-
-        input_list = list(clipped_vertices)
-        clipped_vertices = []
+    edge_ends = window.vertices.tolist()
+    for edge in range(len(edge_ends)):
+        # Each pass only reads the previous output, so the lists can be swapped instead of copied
+        input_list, clipped_vertices = clipped_vertices, []
 
         if not input_list:
             break  # No vertices left to clip
 
+        # Inside is the right-hand side of the clockwise edge (or on it), decided exactly
+        edge_start, edge_end = edge_ends[edge - 1], edge_ends[edge]
         s = input_list[-1]  # Start with the last vertex of the input list
+        s_inside = orient2d(edge_start, edge_end, s) <= 0
 
         for e in input_list:
-            s_inside = is_inside(s, edge_start, edge_end)
-            e_inside = is_inside(e, edge_start, edge_end)
+            e_inside = orient2d(edge_start, edge_end, e) <= 0
 
             if s_inside and e_inside:
                 # Case 1: Both vertices are inside -> Add the second vertex 'e'
                 clipped_vertices.append(e)
             elif s_inside and not e_inside:
                 # Case 2: S is inside, E is outside -> Add the intersection
-                intersection = get_intersection(s, e, edge_start, edge_end)
-                if intersection:
-                    clipped_vertices.append(intersection)
+                clipped_vertices.append(window.intersect(edge, s, e))
             elif not s_inside and not e_inside:
                 # Case 3: Both vertices are outside -> Do nothing
                 pass
             elif not s_inside and e_inside:
                 # Case 4: S is outside, E is inside -> Add intersection and then 'e'
-                intersection = get_intersection(s, e, edge_start, edge_end)
-                if intersection:
-                    clipped_vertices.append(intersection)
+                clipped_vertices.append(window.intersect(edge, s, e))
                 clipped_vertices.append(e)
 
-            s = e  # Move to the next edge
+            s, s_inside = e, e_inside  # Move to the next edge
 
     return [clipped_vertices] if clipped_vertices else []
 
 
+# --- Rectangle Fast Path ---
+
+class RectClipper:
+    """
+    Sutherland-Hodgman specialised for an axis-aligned clip window.
+    Each edge is a plain coordinate comparison with single-axis interpolation, and each
+    pass runs over the vertices of every polygon at once: it reads one preallocated
+    buffer and writes the other (ping-pong), growing them only when a result outgrows them.
+    """
+
+    def __init__(self, window, capacity=1024):
+        if not isinstance(window, ClipWindow):
+            window = ClipWindow.from_bounds(**window)
+        if not window.is_rectangle:
+            raise ValueError("RectClipper needs an axis-aligned rectangular window")
+        self.window = window
+        # Same edge order as the general clipper on the clockwise window: left, top, right, bottom
+        self.edges = [(0, window.xmin, True), (1, window.ymax, False), (0, window.xmax, False), (1, window.ymin, True)]
+        self.buffers = [np.empty((capacity, 2)), np.empty((capacity, 2))]
+
+    def _reserve(self, size):
+        if size > len(self.buffers[0]):
+            capacity = max(size, 2 * len(self.buffers[0]))
+            self.buffers = [np.resize(buffer, (capacity, 2)) for buffer in self.buffers]
+
+    def clip_flat(self, vertices, counts):
+        """
+        Clips polygons stored back to back: 'vertices' is a (V, 2) array and 'counts' the
+        number of vertices of each polygon. Returns (vertices, counts) in the same layout;
+        the vertices are a view of an internal buffer, valid until the next call.
+        """
+        counts = np.asarray(counts, dtype=np.int64)
+        total = len(vertices)
+        self._reserve(2 * total + 8)
+        self.buffers[0][:total] = vertices
+        read = 0  # Index of the buffer holding the current vertices
+        polygon_ids = np.arange(len(counts))
+
+        for axis, bound, keep_greater in self.edges:
+            if total == 0:
+                break
+            current = self.buffers[read][:total]
+            starts = np.cumsum(counts) - counts
+            prev = np.arange(-1, total - 1)
+            nonempty = counts > 0
+            prev[starts[nonempty]] = (starts + counts - 1)[nonempty]  # First vertex pairs with the polygon's last
+
+            coord = current[:, axis]
+            inside = coord >= bound if keep_greater else coord <= bound
+            crossing = inside != inside[prev]
+            emitted = inside.astype(np.int64) + crossing  # Per vertex: intersection, then the vertex if inside
+            position = np.cumsum(emitted) - emitted
+            counts = np.bincount(np.repeat(polygon_ids, counts), weights=emitted, minlength=len(counts)).astype(np.int64)
+
+            new_total = int(position[-1] + emitted[-1])
+            if new_total > len(self.buffers[0]):
+                self._reserve(new_total)
+                current = self.buffers[read][:total]
+            dst = self.buffers[1 - read]
+
+            s, e = current[prev[crossing]], current[crossing]
+            t = (bound - s[:, axis]) / (e[:, axis] - s[:, axis])
+            intersections = s + t[:, None] * (e - s)
+            intersections[:, axis] = bound
+            dst[position[crossing]] = intersections
+            dst[(position + crossing)[inside]] = current[inside]
+
+            total = new_total
+            read = 1 - read
+
+        return self.buffers[read][:total], counts
+
+    def clip(self, polygon):
+        """Clips one polygon; returns its clipped vertices as a (K, 2) array (empty if nothing is left)."""
+        polygon = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+        vertices, _ = self.clip_flat(polygon, [len(polygon)])
+        return vertices.copy()
+
+    def clip_many(self, polygons):
+        """Clips a list of polygons in one call; returns a list of (K, 2) arrays, one per input polygon."""
+        counts = [len(polygon) for polygon in polygons]
+        if not polygons:
+            return []
+        vertices = np.concatenate([np.asarray(polygon, dtype=np.float64).reshape(-1, 2) for polygon in polygons])
+        vertices, counts = self.clip_flat(vertices, counts)
+        return np.split(vertices.copy(), np.cumsum(counts)[:-1])
+
+
+def sutherland_hodgman_clip_batch(subject_polygons, clip_polygon):
+    """
+    Clips many subject polygons against one window. Rectangular windows go through a single
+    RectClipper call; other convex windows fall back to sutherland_hodgman_clip per polygon.
+    Returns one result list (as sutherland_hodgman_clip gives) per subject polygon.
+    """
+    window = clip_polygon if isinstance(clip_polygon, ClipWindow) else ClipWindow(clip_polygon)
+    if not window.is_rectangle:
+        return [sutherland_hodgman_clip(polygon, window) for polygon in subject_polygons]
+    clipped = RectClipper(window).clip_many(subject_polygons)
+    return [[[tuple(v) for v in polygon.tolist()]] if len(polygon) else [] for polygon in clipped]
+
+
+# --- Streaming (Reentrant) Clipper ---
+
+STREAM_CHUNK = 65536  # Vertices read from / written to disk at a time
+
+
+def _stream_stage(vertices, inside, intersect):
+    """
+    One clip edge of the reentrant pipeline. It keeps only the first and the previous vertex,
+    emitting output as each input vertex arrives, and closes the polygon with the edge from
+    the last vertex back to the first once its input runs out.
+    """
+    first = s = None
+    s_inside = False
+    for e in vertices:
+        e_inside = inside(e)
+        if first is None:
+            first, first_inside = e, e_inside
+        else:
+            if s_inside != e_inside:
+                yield intersect(s, e)
+            if e_inside:
+                yield e
+        s, s_inside = e, e_inside
+    if first is not None:
+        if s_inside != first_inside:
+            yield intersect(s, first)
+        if first_inside:
+            yield first
+
+
+def _stream_edges(window):
+    """(inside, intersect) pairs for each window edge, with single-axis tests for rectangles."""
+    if not window.is_rectangle:
+        return [(lambda v, a=a, b=b, c=c: a * v[0] + b * v[1] + c <= 0,
+                 lambda s, e, edge=edge: window.intersect(edge, s, e))
+                for edge, (a, b, c) in enumerate(window.planes)]
+
+    def x_edge(bound, keep_greater):
+        def intersect(s, e):
+            return (bound, s[1] + (bound - s[0]) / (e[0] - s[0]) * (e[1] - s[1]))
+        return (lambda v: v[0] >= bound) if keep_greater else (lambda v: v[0] <= bound), intersect
+
+    def y_edge(bound, keep_greater):
+        def intersect(s, e):
+            return (s[0] + (bound - s[1]) / (e[1] - s[1]) * (e[0] - s[0]), bound)
+        return (lambda v: v[1] >= bound) if keep_greater else (lambda v: v[1] <= bound), intersect
+
+    return [x_edge(window.xmin, True), y_edge(window.ymax, False),
+            x_edge(window.xmax, False), y_edge(window.ymin, True)]
+
+
+def sutherland_hodgman_stream(vertices, clip_polygon):
+    """
+    Pipelined Sutherland-Hodgman: chains one generator stage per clip edge, so vertices flow
+    from any iterable to the caller one at a time and memory stays O(number of clip edges).
+    The output is the same polygon sutherland_hodgman_clip returns, starting at a different vertex.
+    """
+    window = clip_polygon if isinstance(clip_polygon, ClipWindow) else ClipWindow(clip_polygon)
+    stream = iter(vertices)
+    for inside, intersect in _stream_edges(window):
+        stream = _stream_stage(stream, inside, intersect)
+    return stream
+
+
+def read_vertex_file(path, chunk_size=STREAM_CHUNK):
+    """Yields (x, y) tuples from a raw float64 x, y file, memory-mapped and read a chunk at a time."""
+    if os.path.getsize(path) == 0:
+        return
+    vertices = np.memmap(path, dtype=np.float64, mode='r').reshape(-1, 2)
+    for start in range(0, len(vertices), chunk_size):
+        yield from map(tuple, vertices[start:start + chunk_size].tolist())
+
+
+def clip_vertex_file(source_path, target_path, clip_polygon, chunk_size=STREAM_CHUNK):
+    """
+    Clips the polygon stored in 'source_path' (raw float64 x, y pairs) and writes the result
+    to 'target_path' in the same format, streaming through sutherland_hodgman_stream.
+    Returns the number of vertices written.
+    """
+    written = 0
+    chunk = []
+    with open(target_path, 'wb') as target:
+        for vertex in sutherland_hodgman_stream(read_vertex_file(source_path, chunk_size), clip_polygon):
+            chunk.append(vertex)
+            if len(chunk) == chunk_size:
+                np.asarray(chunk, dtype=np.float64).tofile(target)
+                written += len(chunk)
+                chunk = []
+        if chunk:
+            np.asarray(chunk, dtype=np.float64).tofile(target)
+            written += len(chunk)
+    return written
+
+
 # --- Pygame and OpenGL Setup ---
 
 # Global variables
@@ -99,6 +265,8 @@ state = 'draw_subject_start'
 subject_polygon = []
 clip_polygon = []
 clipped_polygons = []
+clipped_meshes = []  # Triangulated clipped_polygons, rebuilt only when the result changes
+triangulation_cache = TriangulationCache()
 temp_coords = []  # For drawing the clip rectangle
 WINDOW_WIDTH, WINDOW_HEIGHT = 800, 600
 
@@ -114,7 +282,7 @@ def init_gl():
     glClearColor(0.1, 0.1, 0.1, 1.0)
 
 
-def draw_polygon(polygon, color, line_width, fill=False, is_drawing=False):
+def draw_polygon(polygon, color, line_width, is_drawing=False):
     """Draws a polygon with a given color and line width."""
     if not polygon:
         return
@@ -122,7 +290,7 @@ def draw_polygon(polygon, color, line_width, fill=False, is_drawing=False):
     glColor3f(*color)
     glLineWidth(line_width)
 
-    draw_mode = GL_LINE_STRIP if is_drawing else (GL_POLYGON if fill else GL_LINE_LOOP)
+    draw_mode = GL_LINE_STRIP if is_drawing else GL_LINE_LOOP
 
     glBegin(draw_mode)
     for vertex in polygon:
@@ -130,6 +298,19 @@ def draw_polygon(polygon, color, line_width, fill=False, is_drawing=False):
     glEnd()
 
 
+def draw_mesh(mesh, color):
+    """Fills a triangulated polygon from its cached vertex and index arrays."""
+    vertices, triangles = mesh
+    if not len(triangles):
+        return
+
+    glColor3f(*color)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glVertexPointer(2, GL_DOUBLE, 0, vertices)
+    glDrawElements(GL_TRIANGLES, triangles.size, GL_UNSIGNED_INT, triangles)
+    glDisableClientState(GL_VERTEX_ARRAY)
+
+
 def draw_text(text, x, y, font):
     """Renders text on the screen using Pygame."""
     text_surface = font.render(text, True, (255, 255, 255, 255), (30, 30, 30, 255))
@@ -140,7 +321,7 @@ def draw_text(text, x, y, font):
 
 def main():
     """Main application loop."""
-    global state, subject_polygon, clip_polygon, clipped_polygons, temp_coords
+    global state, subject_polygon, clip_polygon, clipped_polygons, clipped_meshes, temp_coords
 
     pygame.init()
     display = (WINDOW_WIDTH, WINDOW_HEIGHT)
@@ -165,6 +346,7 @@ def main():
                 if event.key == pygame.K_r:
                     state = 'draw_subject_start'
                     subject_polygon, clip_polygon, clipped_polygons, temp_coords = [], [], [], []
+                    clipped_meshes = triangulation_cache.update([])
                     print("Canvas reset.")
 
                 if event.key == pygame.K_d:
@@ -184,12 +366,16 @@ def main():
                     state = 'drawing_clip_rect'
                 elif state == 'drawing_clip_rect':
                     temp_coords.append((x, y))
-                    p1, p2 = temp_coords
-                    xmin, xmax = sorted([p1[0], p2[0]])
-                    ymin, ymax = sorted([p1[1], p2[1]])
                     # Create a clockwise rectangle for clipping
-                    clip_polygon = [(xmin, ymax), (xmax, ymax), (xmax, ymin), (xmin, ymin)]
-                    clipped_polygons = sutherland_hodgman_clip(subject_polygon, clip_polygon)
+                    try:
+                        clip_window = ClipWindow.from_corners(*temp_coords)
+                    except ValueError:
+                        temp_coords.pop()
+                        print("The clipping window needs a width and a height. Click the second corner again.")
+                        continue
+                    clip_polygon = clip_window.vertices.tolist()
+                    clipped_polygons = sutherland_hodgman_clip(subject_polygon, clip_window)
+                    clipped_meshes = triangulation_cache.update([(poly, []) for poly in clipped_polygons])
                     state = 'clipped'
                     temp_coords = []
 
@@ -225,8 +411,8 @@ def main():
 
         # Draw clipped result (green)
         if state == 'clipped':
-            for poly in clipped_polygons:
-                draw_polygon(poly, (0.0, 1.0, 0.0), 1.0, fill=True)
+            for mesh in clipped_meshes:
+                draw_mesh(mesh, (0.0, 1.0, 0.0))
 
         # --- Display instructions ---
         if state == 'draw_subject_start':
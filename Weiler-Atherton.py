@@ -2,7 +2,19 @@ import pygame
 from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
+import os
 import sys
+import time
+import heapq
+import bisect
+import math
+import importlib.util
+from collections import namedtuple
+from fractions import Fraction
+import numpy as np
+from clip_window import ClipWindow
+from robust_predicates import point_on_segment, segment_crossing
+from triangulation import TriangulationCache
 
 
 # --- Weiler-Atherton Polygon Clipping Algorithm ---
@@ -11,32 +23,10 @@ def get_intersection(p1, p2, p3, p4):
     """
     Finds the intersection of two line segments, (p1, p2) and (p3, p4).
     Returns the intersection point or None if they don't intersect within the segments.
+    Whether they cross is decided exactly (see robust_predicates), so touching at an
+    endpoint and parallel or collinear overlaps are never reported.
     """
-    s1_x, s1_y = p2[0] - p1[0], p2[1] - p1[1]
-    s2_x, s2_y = p4[0] - p3[0], p4[1] - p3[1]
-
-    denom = (-s2_x * s1_y + s1_x * s2_y)
-    if denom == 0:
-        return None  # Parallel or collinear
-
-    # Use a small epsilon to handle floating point inaccuracies
-    epsilon = 1e-6
-    if abs(denom) < epsilon:
-        return None
-
-    s_num = -s1_y * (p1[0] - p3[0]) + s1_x * (p1[1] - p3[1])
-    t_num = s2_x * (p1[1] - p3[1]) - s2_y * (p1[0] - p3[0])
-
-    s = s_num / denom
-    t = t_num / denom
-
-    if epsilon < s < 1 - epsilon and epsilon < t < 1 - epsilon:
-        # Intersection detected
-        i_x = p1[0] + (t * s1_x)
-        i_y = p1[1] + (t * s1_y)
-        return (i_x, i_y)
-
-    return None  # No intersection within segments
+    return segment_crossing(p1, p2, p3, p4)
 
 
 def is_inside(p, polygon):
@@ -62,91 +52,364 @@ def is_inside(p, polygon):
     return inside
 
 
+# --- Indexed Point-in-Polygon ---
+
+LOCATOR_MAX_ROWS = 1 << 16  # Upper bound on the rows of a PolygonLocator
+LOCATOR_ENTRIES_PER_EDGE = 16  # Average row entries per edge the row count may cost
+LOCATOR_CHUNK = 1 << 20  # Points classified per vectorized step
+LOCATOR_MIN_QUERIES = 16  # Inside tests against one polygon that justify building a locator
+
+
+class PolygonLocator:
+    """
+    Point-in-polygon index. The polygon's y range is cut into equal rows; in each row the edges
+    spanning its full height cannot cross, so they are kept sorted by x and a query counts the
+    ones to its right by binary search, ray-casting only the few edges that end inside the row.
+    'rings' is a list of vertex lists, read even-odd; the answers match point_in_rings.
+    """
+
+    def __init__(self, rings, rows=None):
+        starts = np.array([p for ring in rings for p in ring], dtype=np.float64).reshape(-1, 2)
+        ends = np.array([p for ring in rings for p in ring[1:] + ring[:1]], dtype=np.float64).reshape(-1, 2)
+        keep = starts[:, 1] != ends[:, 1]  # Horizontal edges never count as crossings
+        (x1, y1), (x2, y2) = starts[keep].T, ends[keep].T
+        dx, dy = x2 - x1, y2 - y1
+        ylo, yhi = np.minimum(y1, y2), np.maximum(y1, y2)
+
+        edge_count = len(x1)
+        self.y0 = float(ylo.min()) if edge_count else 0.0
+        self.y1 = float(yhi.max()) if edge_count else 0.0
+        span = self.y1 - self.y0
+        if not rows:
+            # About one row per edge (fewer edges end inside each row), within the entry budget for tall edges
+            total_height = float((yhi - ylo).sum())
+            budget = int(LOCATOR_ENTRIES_PER_EDGE * edge_count * span / total_height) + 1 if total_height else 1
+            rows = min(max(edge_count, 1), LOCATOR_MAX_ROWS, budget)
+        self.rows = rows
+        self.row_height = span / rows if span > 0 else 1.0
+
+        # One entry per (row, edge) the edge's y span touches
+        r0, r1 = self._row(ylo), self._row(yhi)
+        spans = r1 - r0 + 1
+        edges = np.repeat(np.arange(edge_count), spans)
+        entry_rows = np.repeat(r0, spans) + (np.arange(len(edges)) - np.repeat(np.cumsum(spans) - spans, spans))
+
+        # Edges spanning the whole row (with a small margin for rounding) go to the sorted list
+        row_lo = self.y0 + entry_rows * self.row_height
+        margin = self.row_height * 1e-9
+        full = (ylo[edges] < row_lo - margin) & (yhi[edges] > row_lo + self.row_height + margin)
+        x_lo = x1[edges] + (row_lo - y1[edges]) * dx[edges] / dy[edges]
+        x_hi = x_lo + self.row_height * dx[edges] / dy[edges]
+        order = np.flatnonzero(full)[np.lexsort((x_lo[full] + x_hi[full], entry_rows[full]))]
+        # Crossing edges (self-intersecting input) can't be ordered; such rows test every edge directly
+        same_row = entry_rows[order[1:]] == entry_rows[order[:-1]]
+        unordered = same_row & ((x_lo[order[1:]] < x_lo[order[:-1]]) | (x_hi[order[1:]] < x_hi[order[:-1]]))
+        bad_rows = np.zeros(rows, dtype=bool)
+        bad_rows[entry_rows[order[1:]][unordered]] = True
+        full &= ~bad_rows[entry_rows]
+        order = order[~bad_rows[entry_rows[order]]]
+        partial = np.flatnonzero(~full)
+        partial = partial[np.argsort(entry_rows[partial], kind='stable')]
+
+        self.full_start = np.concatenate(([0], np.cumsum(np.bincount(entry_rows[order], minlength=rows))))
+        self.partial_start = np.concatenate(([0], np.cumsum(np.bincount(entry_rows[partial], minlength=rows))))
+        self.full_edges = np.stack((x1, y1, dx, dy))[:, edges[order]]
+        self.partial_edges = np.stack((ylo, yhi, np.maximum(x1, x2), x1, y1, dx, dy))[:, edges[partial]]
+        self._scalar_tables = None  # Python-list copies for contains(), built on first use
+
+    def _row(self, y):
+        return np.clip(((y - self.y0) // self.row_height).astype(np.int64), 0, self.rows - 1)
+
+    def contains(self, x, y):
+        """Inside test for a single point."""
+        if not self.y0 < y <= self.y1:
+            return False
+        if self._scalar_tables is None:
+            self._scalar_tables = (self.full_start.tolist(), self.full_edges.T.tolist(),
+                                   self.partial_start.tolist(), self.partial_edges.T.tolist())
+        full_start, full_edges, partial_start, partial_edges = self._scalar_tables
+        row = min(int((y - self.y0) // self.row_height), self.rows - 1)
+        # Full-height edges are sorted left to right: find the first one crossing at or right of x
+        lo, hi = full_start[row], full_start[row + 1]
+        end = hi
+        while lo < hi:
+            mid = (lo + hi) // 2
+            x1, y1, dx, dy = full_edges[mid]
+            if x <= (y - y1) * dx / dy + x1:
+                hi = mid
+            else:
+                lo = mid + 1
+        inside = (end - lo) % 2 == 1
+        for ylo, yhi, xmax, x1, y1, dx, dy in partial_edges[partial_start[row]:partial_start[row + 1]]:
+            if ylo < y <= yhi and x <= xmax and x <= (y - y1) * dx / dy + x1:
+                inside = not inside
+        return inside
+
+    def contains_points(self, points, chunk_size=LOCATOR_CHUNK):
+        """Vectorized inside test for an (N, 2) array of points; returns a boolean array."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        inside = np.zeros(len(points), dtype=bool)
+        for start in range(0, len(points), chunk_size):
+            x, y = points[start:start + chunk_size, 0], points[start:start + chunk_size, 1]
+            valid = np.flatnonzero((y > self.y0) & (y <= self.y1))
+            x, y = x[valid], y[valid]
+            rows = self._row(y)
+
+            # Binary search over each row's sorted full-height edges, all points in lockstep
+            lo, end = self.full_start[rows], self.full_start[rows + 1]
+            hi = end.copy()
+            searching = np.flatnonzero(lo < hi)
+            while len(searching):
+                mid = (lo[searching] + hi[searching]) // 2
+                x1, y1, dx, dy = self.full_edges[:, mid]
+                right = x[searching] <= (y[searching] - y1) * dx / dy + x1
+                hi[searching[right]] = mid[right]
+                lo[searching[~right]] = mid[~right] + 1
+                searching = searching[lo[searching] < hi[searching]]
+            crossings = end - lo
+
+            # Edges ending inside the row are tested directly
+            counts = self.partial_start[rows + 1] - self.partial_start[rows]
+            owner = np.repeat(np.arange(len(x)), counts)
+            pos = np.repeat(self.partial_start[rows] - (np.cumsum(counts) - counts), counts) + np.arange(len(owner))
+            ylo, yhi, xmax, x1, y1, dx, dy = self.partial_edges[:, pos]
+            py, px = y[owner], x[owner]
+            hit = (ylo < py) & (py <= yhi) & (px <= xmax) & (px <= (py - y1) * dx / dy + x1)
+            crossings += np.bincount(owner[hit], minlength=len(x))
+            inside[start + valid] = crossings % 2 == 1
+        return inside
+
+
+def inside_test(rings, queries):
+    """
+    contains(x, y) for a polygon given as rings: plain point_in_rings for a few queries,
+    a PolygonLocator once there are enough of them to repay building it.
+    """
+    if queries >= LOCATOR_MIN_QUERIES:
+        return PolygonLocator(rings).contains
+    return lambda x, y: point_in_rings((x, y), rings)
+
+
+def probe_vertex(polygon, other):
+    """
+    The first vertex of 'polygon' not lying on the boundary of 'other', so an inside test of it
+    is unambiguous; falls back to the first vertex when every vertex is on that boundary.
+    """
+    for p in polygon:
+        if not any(point_on_segment(p, other[i - 1], other[i]) for i in range(len(other))):
+            return p
+    return polygon[0]
+
+
+def sweep_edge_pairs(subject_rings, clip_rings):
+    """
+    Yields the ((subj_ring, subj_idx), (clip_ring, clip_idx)) edge pairs whose bounding boxes
+    overlap, found with a sweep: edges are visited in order of their left x, each is paired
+    only with still-active edges of the other side whose y range overlaps it, and edges
+    expire once the sweep passes them. Edge i of a ring runs from vertex i - 1 to vertex i.
+    Active edges are kept sorted by y range. Edges at most 'reach' tall (four times the median
+    height) can only overlap a new edge if their ymin lies within 'reach' below its ymin, so
+    a bisected slice holds every candidate; the few taller edges are checked one by one.
+    """
+    edges = []
+    for which, rings in enumerate((subject_rings, clip_rings)):
+        for r, ring in enumerate(rings):
+            for i in range(len(ring)):
+                (x1, y1), (x2, y2) = ring[i - 1], ring[i]
+                edges.append((min(x1, x2), max(x1, x2), min(y1, y2), max(y1, y2), which, (r, i)))
+    if not edges:
+        return
+    edges.sort()
+    heights = sorted(ymax - ymin for _, _, ymin, ymax, _, _ in edges)
+    reach = 4 * heights[len(heights) // 2]
+
+    active = ([], [])  # Per side: sorted (ymin, ymax, (ring, edge index)) of edges at most 'reach' tall
+    tall = ({}, {})  # Per side: (ring, edge index) -> (ymin, ymax) of the taller active edges
+    expiry = []  # Heap of (xmax, which, (ring, edge index), ymin, ymax)
+    for xmin, xmax, ymin, ymax, which, edge in edges:
+        while expiry and expiry[0][0] < xmin:
+            _, w, other, other_ymin, other_ymax = heapq.heappop(expiry)
+            if other_ymax - other_ymin > reach:
+                del tall[w][other]
+            else:
+                del active[w][bisect.bisect_left(active[w], (other_ymin, other_ymax, other))]
+
+        others = active[1 - which]
+        start = bisect.bisect_left(others, (ymin - reach,))
+        end = bisect.bisect_right(others, (ymax, math.inf))
+        for other_ymin, other_ymax, other in others[start:end]:
+            if other_ymax >= ymin:
+                yield (edge, other) if which == 0 else (other, edge)
+        for other, (other_ymin, other_ymax) in tall[1 - which].items():
+            if other_ymin <= ymax and other_ymax >= ymin:
+                yield (edge, other) if which == 0 else (other, edge)
+
+        if ymax - ymin > reach:
+            tall[which][edge] = (ymin, ymax)
+        else:
+            bisect.insort(active[which], (ymin, ymax, edge))
+        heapq.heappush(expiry, (xmax, which, edge, ymin, ymax))
+
+
+def find_ring_intersections(subject_rings, clip_rings):
+    """
+    Finds where the edges of two sets of rings cross, testing only the edge pairs
+    sweep_edge_pairs finds. Returns (point, (subj_ring, subj_idx), (clip_ring, clip_idx)) tuples.
+    """
+    found = []
+    for (sr, si), (cr, ci) in sweep_edge_pairs(subject_rings, clip_rings):
+        pt = get_intersection(clip_rings[cr][ci - 1], clip_rings[cr][ci],
+                              subject_rings[sr][si - 1], subject_rings[sr][si])
+        if pt:
+            found.append((pt, (sr, si), (cr, ci)))
+    return found
+
+
+def find_intersections(subject_polygon, clip_polygon):
+    """
+    Crossings of two single polygons, found with find_ring_intersections.
+    Returns (point, subj_idx, clip_idx) tuples, edge i running from vertex i - 1 to vertex i.
+    """
+    return [(pt, subj_idx, clip_idx)
+            for pt, (_, subj_idx), (_, clip_idx) in find_ring_intersections([subject_polygon], [clip_polygon])]
+
+
+class Node:
+    """A vertex of one of the Weiler-Atherton vertex lists, doubly linked to its neighbors."""
+    __slots__ = ('pt', 'prev', 'next', 'link', 'is_intersection', 'entering', 'visited', 'crossing')
+
+    def __init__(self, pt, is_intersection=False, crossing=None):
+        self.pt = pt
+        self.prev = self.next = None
+        self.link = None  # The same intersection in the other polygon's list
+        self.crossing = crossing  # The other polygon's edge crossed here, to order coincident crossings
+        self.is_intersection = is_intersection
+        self.entering = False
+        self.visited = False
+
+
+def build_node_list(polygon, edge_intersections):
+    """
+    Builds the circular doubly linked list for a polygon, placing the intersection nodes of
+    each edge (given sorted along the edge) before the vertex that ends it.
+    Returns the nodes in list order.
+    """
+    nodes = []
+    for i, pt in enumerate(polygon):
+        nodes.extend(edge_intersections.get(i, ()))
+        nodes.append(Node(pt))
+    for prev, node in zip(nodes[-1:] + nodes[:-1], nodes):
+        prev.next, node.prev = node, prev
+    return nodes
+
+
+def crossing_alpha(start, end, crossing):
+    """Exact position, as a fraction of the edge start-end, where it meets the line through 'crossing'."""
+    (ax, ay), (bx, by), (cx, cy), (dx, dy) = ([Fraction(v) for v in p] for p in (start, end, *crossing))
+    return ((cx - ax) * (dy - cy) - (cy - ay) * (dx - cx)) / ((bx - ax) * (dy - cy) - (by - ay) * (dx - cx))
+
+
+def sort_along_edges(polygon, edge_intersections):
+    """
+    Sorts the intersection nodes of each edge by distance from the edge's start vertex.
+    Distinct crossings can round to the same point; nodes that know the edge they cross
+    are then put in their exact order along the edge.
+    """
+    for idx, nodes in edge_intersections.items():
+        start = polygon[idx - 1]
+        sx, sy = start
+        nodes.sort(key=lambda n: (n.pt[0] - sx) ** 2 + (n.pt[1] - sy) ** 2)
+        i = 0
+        while i < len(nodes):
+            j = i + 1
+            while j < len(nodes) and nodes[j].pt == nodes[i].pt:
+                j += 1
+            if j - i > 1 and all(n.crossing for n in nodes[i:j]):
+                nodes[i:j] = sorted(nodes[i:j], key=lambda n: crossing_alpha(start, polygon[idx], n.crossing))
+            i = j
+
+
+def classify_intersections(nodes, contains):
+    """
+    Marks the intersection nodes of one ring as entering or leaving the other polygon,
+    whose inside test is 'contains(x, y)'. They alternate along the ring, so one inside
+    test of a plain vertex settles them all.
+    """
+    first_vertex = next(n for n in nodes if not n.is_intersection)
+    inside = contains(*first_vertex.pt)
+    node = first_vertex
+    while True:
+        node = node.next
+        if node.is_intersection:
+            node.entering = not inside
+            inside = not inside
+        if node is first_vertex:
+            break
+
+
+def point_in_rings(p, rings):
+    """Even-odd inside test against every ring of a polygon, so points in holes count as outside."""
+    inside = False
+    for ring in rings:
+        if is_inside(p, ring):
+            inside = not inside
+    return inside
+
+
 def weiler_atherton_clip(subject_polygon, clip_polygon):
     """
     Clips a subject polygon against a clip polygon using the Weiler-Atherton algorithm.
+    'clip_polygon' may also be a ClipWindow, which is clipped against as its vertex list.
+    Polygons that touch (a vertex on the other's boundary, shared or overlapping edges) break
+    the traversal's assumption that edges cross properly, so they go to greiner_hormann_clip.
     """
+    if isinstance(clip_polygon, ClipWindow):
+        clip_polygon = [tuple(v) for v in clip_polygon.vertices.tolist()]
     if not subject_polygon or not clip_polygon:
         return []
-
-    # 1. Build lists of vertices including intersections
-    subj_list, clip_list = list(subject_polygon), list(clip_polygon)
+    if has_degeneracies([subject_polygon], [clip_polygon]):
+        # An intersection of two simple polygons has no holes
+        return [outer for outer, _ in greiner_hormann_clip(subject_polygon, clip_polygon)]
+    # The traversal walks both lists forward, which only follows the overlap when they wind the same way
+    if (ring_area(list(subject_polygon)) > 0) != (ring_area(list(clip_polygon)) > 0):
+        clip_polygon = list(clip_polygon)[::-1]
 
     # --- Find Intersections ---
     intersections_map = {}  # Using a map to avoid duplicate intersection points
-    for i in range(len(clip_list)):
-        p1 = clip_list[i - 1]
-        p2 = clip_list[i]
-        for j in range(len(subj_list)):
-            p3 = subj_list[j - 1]
-            p4 = subj_list[j]
-
-            intersect_pt = get_intersection(p1, p2, p3, p4)
-            if intersect_pt:
-                # Round to avoid floating point issues
-                pt_key = (round(intersect_pt[0], 5), round(intersect_pt[1], 5))
-                if pt_key not in intersections_map:
-                    intersections_map[pt_key] = {'clip_idx': i, 'subj_idx': j}
-
-    intersections = [{'pt': k, **v} for k, v in intersections_map.items()]
+    for intersect_pt, subj_idx, clip_idx in sorted(find_intersections(subject_polygon, clip_polygon),
+                                                   key=lambda hit: (hit[2], hit[1])):
+        if intersect_pt not in intersections_map:
+            intersections_map[intersect_pt] = (subj_idx, clip_idx)
 
     # No intersections, check for trivial cases
-    if not intersections:
-        if is_inside(subject_polygon[0], clip_polygon):
+    if not intersections_map:
+        if is_inside(probe_vertex(subject_polygon, clip_polygon), clip_polygon):
             return [subject_polygon]
-        if is_inside(clip_polygon[0], subject_polygon):
+        if is_inside(probe_vertex(clip_polygon, subject_polygon), subject_polygon):
             return [clip_polygon]
         return []
 
-    # --- Insert Intersections into Polygon Lists ---
-    def insert_intersections(polygon, poly_intersections, idx_key):
-        # Sort points on the same edge by distance from start vertex
-        for i in poly_intersections:
-            p_start = polygon[i[idx_key] - 1]
-            i['dist'] = (i['pt'][0] - p_start[0]) ** 2 + (i['pt'][1] - p_start[1]) ** 2
-
-        # Insert sorted points
-        for i in sorted(poly_intersections, key=lambda x: (x[idx_key], x['dist']), reverse=True):
-            polygon.insert(i[idx_key], i['pt'])
-
-    insert_intersections(clip_list, [i for i in intersections], 'clip_idx')
-    insert_intersections(subj_list, [i for i in intersections], 'subj_idx')
-
-    # --- Build Linked List Structure ---
-    def build_linked_list(polygon_list, other_polygon, is_subject):
-        linked_list = []
-        for pt in polygon_list:
-            node = {'pt': pt, 'link': None, 'visited': False}
-            # Check if it's an intersection point
-            if pt in [i['pt'] for i in intersections]:
-                node['is_intersection'] = True
-                prev_idx = (polygon_list.index(pt) - 1 + len(polygon_list)) % len(polygon_list)
-                prev_pt = polygon_list[prev_idx]
-                if is_subject:
-                    node['type'] = 'leaving' if is_inside(prev_pt, clip_polygon) else 'entering'
-            else:
-                node['is_intersection'] = False
-            linked_list.append(node)
-        return linked_list
-
-    subj_linked = build_linked_list(subj_list, clip_polygon, True)
-    clip_linked = build_linked_list(clip_list, subject_polygon, False)
-
-    # Link intersection nodes between the two lists
-    for s_node in subj_linked:
-        if s_node['is_intersection']:
-            for c_node in clip_linked:
-                if c_node['pt'] == s_node['pt']:
-                    s_node['link'] = c_node
-                    c_node['link'] = s_node
-                    break
+    # --- Build Linked Lists, One Linked Node Pair per Intersection ---
+    subj_edges, clip_edges = {}, {}
+    for pt, (subj_idx, clip_idx) in intersections_map.items():
+        s_node, c_node = Node(pt, True), Node(pt, True)
+        s_node.link, c_node.link = c_node, s_node
+        subj_edges.setdefault(subj_idx, []).append(s_node)
+        clip_edges.setdefault(clip_idx, []).append(c_node)
+
+    sort_along_edges(subject_polygon, subj_edges)
+    sort_along_edges(clip_polygon, clip_edges)
+    subj_nodes = build_node_list(subject_polygon, subj_edges)
+    build_node_list(clip_polygon, clip_edges)
+
+    classify_intersections(subj_nodes, lambda x, y: is_inside((x, y), clip_polygon))
 
     # --- Traverse and Build Result Polygons ---
     clipped_polygons = []
-    entering_nodes = [n for n in subj_linked if n.get('type') == 'entering']
+    entering_nodes = [n for n in subj_nodes if n.entering]
 
     for start_node in entering_nodes:
-        if start_node['visited']:
+        if start_node.visited:
             continue
 
         current_poly = []
@@ -155,51 +418,421 @@ def weiler_atherton_clip(subject_polygon, clip_polygon):
         # This loop traces one complete clipped polygon
         while True:
             # Mark the current intersection node as visited
-            current_node['visited'] = True
+            current_node.visited = True
 
             # 1. Follow the subject polygon's path until the next intersection
-            idx = subj_linked.index(current_node)
+            node = current_node.next
             while True:
-                idx = (idx + 1) % len(subj_linked)
-                next_node_subj = subj_linked[idx]
-                current_poly.append(next_node_subj['pt'])
-
-                if next_node_subj['is_intersection']:
-                    next_node_subj['visited'] = True
-                    current_node = next_node_subj['link']  # Switch to the clip list
+                current_poly.append(node.pt)
+                if node.is_intersection:
+                    node.visited = True
+                    current_node = node.link  # Switch to the clip list
                     break
+                node = node.next
 
             # 2. Follow the clipping polygon's path until the next intersection
-            idx = clip_linked.index(current_node)
+            node = current_node.next
             while True:
-                idx = (idx + 1) % len(clip_linked)
-                next_node_clip = clip_linked[idx]
-                current_poly.append(next_node_clip['pt'])
-
-                if next_node_clip['is_intersection']:
-                    current_node = next_node_clip['link']  # Switch back to the subject list
+                current_poly.append(node.pt)
+                if node.is_intersection:
+                    current_node = node.link  # Switch back to the subject list
                     break
+                node = node.next
 
-            # 3. If we've returned to where we started, this clipped polygon is complete
-            if current_node == start_node:
+            # 3. If we've returned to where we started (or to a traced loop), this clipped polygon is complete
+            if current_node is start_node or current_node.visited:
                 break
 
         if current_poly:
             # Remove duplicate points before adding the polygon to the final list
-            final_poly = []
-            [final_poly.append(p) for p in current_poly if p not in final_poly]
-            clipped_polygons.append(final_poly)
+            clipped_polygons.append(list(dict.fromkeys(current_poly)))
 
     return clipped_polygons
 
 
+# --- Boolean Operations ---
+
+BOOLEAN_OPERATIONS = ('intersection', 'union', 'difference', 'xor')
+
+
+def _is_point(item):
+    return len(item) == 2 and all(isinstance(c, (int, float)) for c in item)
+
+
+def polygon_rings(polygon):
+    """
+    The rings of a polygon given as a vertex list, an (outer, holes) pair, or a list of
+    (outer, holes) pairs (the form polygon_boolean returns). Rings are read even-odd.
+    """
+    if not polygon:
+        return []
+    if _is_point(polygon[0]):
+        return [list(polygon)]
+    if _is_point(polygon[0][0]):
+        outer, holes = polygon
+        return [list(outer)] + [list(hole) for hole in holes]
+    return [ring for part in polygon for ring in polygon_rings(part)]
+
+
+def ring_area(ring):
+    """Signed shoelace area: positive for counterclockwise rings."""
+    return 0.5 * sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring[-1:] + ring[:-1], ring))
+
+
+def ring_bounds(rings):
+    xs = [x for ring in rings for x, _ in ring]
+    ys = [y for ring in rings for _, y in ring]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def assemble_regions(rings):
+    """
+    Groups loose rings into (outer, holes) pairs by how deeply each is nested: rings inside an
+    even number of others are outer rings (made counterclockwise), the rest are holes (made
+    clockwise) of the innermost ring around them.
+    """
+    rings = [ring for ring in rings if len(ring) >= 3 and abs(ring_area(ring)) > 1e-9]
+    bounds = [ring_bounds([ring]) for ring in rings]
+    containers = []
+    for i, ring in enumerate(rings):
+        x0, y0, x1, y1 = bounds[i]
+        around = []
+        for j, other in enumerate(rings):
+            ox0, oy0, ox1, oy1 = bounds[j]
+            if j == i or ox0 > x0 or oy0 > y0 or ox1 < x1 or oy1 < y1:
+                continue
+            # Rings only touch at shared vertices, so test a vertex the other ring doesn't have
+            shared = set(other)
+            probe = next((p for p in ring if p not in shared), None)
+            if probe is not None and is_inside(probe, other):
+                around.append(j)
+        containers.append(around)
+
+    depth = [len(around) for around in containers]
+    regions = {}
+    for i, ring in enumerate(rings):
+        if depth[i] % 2 == 0:
+            regions[i] = (ring if ring_area(ring) > 0 else ring[::-1], [])
+    for i, ring in enumerate(rings):
+        if depth[i] % 2 == 1:
+            parent = max(containers[i], key=lambda j: depth[j])
+            regions[parent][1].append(ring if ring_area(ring) < 0 else ring[::-1])
+    return list(regions.values())
+
+
+def polygon_boolean(subject, clip, operation='intersection'):
+    """
+    Intersection, union, difference (subject minus clip) or xor of two polygons, each given
+    in any form polygon_rings accepts, so holes and multi-part inputs work.
+    Reuses the Weiler-Atherton node lists and entering/leaving classification; the operation
+    only decides which way each list is walked from an intersection (flipping a side's flags
+    walks the part of its boundary outside the other polygon instead of inside).
+    Returns a list of (outer, holes) pairs. Edges are assumed to cross in general position.
+    """
+    if operation not in BOOLEAN_OPERATIONS:
+        raise ValueError(f"Unknown boolean operation '{operation}'")
+    if operation == 'xor':
+        return polygon_boolean(subject, clip, 'difference') + polygon_boolean(clip, subject, 'difference')
+
+    subject_rings, clip_rings = polygon_rings(subject), polygon_rings(clip)
+    if not subject_rings or not clip_rings:
+        kept = {'intersection': [], 'union': subject_rings + clip_rings, 'difference': subject_rings}
+        return assemble_regions(kept[operation])
+
+    # Every crossing gets its own node pair, even when two of them round to the same point
+    subj_edges = [{} for _ in subject_rings]
+    clip_edges = [{} for _ in clip_rings]
+    for pt, (sr, si), (cr, ci) in find_ring_intersections(subject_rings, clip_rings):
+        s_node = Node(pt, True, (clip_rings[cr][ci - 1], clip_rings[cr][ci]))
+        c_node = Node(pt, True, (subject_rings[sr][si - 1], subject_rings[sr][si]))
+        s_node.link, c_node.link = c_node, s_node
+        subj_edges[sr].setdefault(si, []).append(s_node)
+        clip_edges[cr].setdefault(ci, []).append(c_node)
+
+    # Per side: (rings, their intersections, the other side, flip the flags?, keep untouched rings that are inside?)
+    # Each ring of one side is tested once against the other side
+    sides = ((subject_rings, subj_edges, inside_test(clip_rings, len(subject_rings)),
+              operation != 'intersection', operation == 'intersection'),
+             (clip_rings, clip_edges, inside_test(subject_rings, len(clip_rings)),
+              operation == 'union', operation != 'union'))
+    result_rings = []
+    start_nodes = []
+    for rings, edges, other_contains, flip, keep_inside in sides:
+        for ring, ring_edges in zip(rings, edges):
+            if not ring_edges:
+                if other_contains(*ring[0]) == keep_inside:
+                    result_rings.append(ring)
+                continue
+            sort_along_edges(ring, ring_edges)
+            nodes = build_node_list(ring, ring_edges)
+            classify_intersections(nodes, other_contains)
+            for node in nodes:
+                if node.is_intersection:
+                    node.entering ^= flip
+                    if rings is subject_rings:
+                        start_nodes.append(node)
+
+    # Walk forward from entering nodes and backward from leaving ones, switching lists at each intersection
+    for start_node in start_nodes:
+        if start_node.visited:
+            continue
+        ring = []
+        node = start_node
+        while not node.visited:
+            node.visited = node.link.visited = True
+            forward = node.entering
+            ring.append(node.pt)
+            node = node.next if forward else node.prev
+            while not node.is_intersection:
+                ring.append(node.pt)
+                node = node.next if forward else node.prev
+            node = node.link
+        result_rings.append(ring)
+
+    return assemble_regions(result_rings)
+
+
+def union_all(polygons):
+    """
+    Unions many polygons by divide and conquer: the polygons are ordered by x, each half is
+    unioned recursively and the two results are merged, so every input takes part in
+    O(log n) unions of similar size instead of being folded into one ever-growing result.
+    Halves whose bounding boxes don't overlap are merged by concatenation.
+    Returns a list of (outer, holes) pairs.
+    """
+    regions = [assemble_regions(polygon_rings(polygon)) for polygon in polygons]
+    regions = [region for region in regions if region]
+    regions.sort(key=lambda region: ring_bounds(polygon_rings(region))[0])
+
+    def merge(lo, hi):
+        if hi - lo == 1:
+            return regions[lo]
+        mid = (lo + hi) // 2
+        left, right = merge(lo, mid), merge(mid, hi)
+        ax0, ay0, ax1, ay1 = ring_bounds(polygon_rings(left))
+        bx0, by0, bx1, by1 = ring_bounds(polygon_rings(right))
+        if ax1 < bx0 or bx1 < ax0 or ay1 < by0 or by1 < ay0:
+            return left + right
+        return polygon_boolean(left, right, 'union')
+
+    return merge(0, len(regions)) if regions else []
+
+
+# --- Greiner-Hormann Clipping ---
+
+GH_PERTURBATION = 1e-9  # Nudge for degenerate vertices, relative to the polygons' extent
+GH_MAX_ROUNDS = 8  # Nudging rounds before giving up on a stubborn degeneracy
+GH_SNAP_DISTANCE = 1e-6  # Result points this close to an input vertex or crossing, relative to the extent, snap to it
+
+
+def has_degeneracies(subject_rings, clip_rings):
+    """Whether a vertex of either polygon lies exactly on an edge of the other."""
+    for (sr, si), (cr, ci) in sweep_edge_pairs(subject_rings, clip_rings):
+        s_start, s_end = subject_rings[sr][si - 1], subject_rings[sr][si]
+        c_start, c_end = clip_rings[cr][ci - 1], clip_rings[cr][ci]
+        if point_on_segment(s_end, c_start, c_end) or point_on_segment(c_end, s_start, s_end):
+            return True
+    return False
+
+
+def remove_degeneracies(subject_rings, clip_rings):
+    """
+    Nudges every vertex that lies exactly on an edge of the other polygon (shared vertices,
+    vertices touching an edge, overlapping edges) a tiny distance off that edge, to its left,
+    as Greiner and Hormann suggest. Subject vertices are moved first; clip vertices only once
+    no subject vertex touches the clip, so the two sides never move in lockstep.
+    Afterwards the polygons only meet in proper crossings.
+    Modifies the rings in place; returns the number of vertices moved.
+    """
+    x0, y0, x1, y1 = ring_bounds(subject_rings + clip_rings)
+    delta = GH_PERTURBATION * max(x1 - x0, y1 - y0, 1.0)
+    moved = 0
+    for _ in range(GH_MAX_ROUNDS):
+        nudges, clip_nudges = {}, {}
+        for (sr, si), (cr, ci) in sweep_edge_pairs(subject_rings, clip_rings):
+            s_start, s_end = subject_rings[sr][si - 1], subject_rings[sr][si]
+            c_start, c_end = clip_rings[cr][ci - 1], clip_rings[cr][ci]
+            if point_on_segment(s_end, c_start, c_end):
+                nudges.setdefault((0, sr, si), (c_start, c_end))
+            elif not nudges and point_on_segment(c_end, s_start, s_end):
+                clip_nudges.setdefault((1, cr, ci), (s_start, s_end))
+        nudges = nudges or clip_nudges
+        if not nudges:
+            break
+        for (which, r, i), ((ax, ay), (bx, by)) in nudges.items():
+            ring = (subject_rings, clip_rings)[which][r]
+            length = ((bx - ax) ** 2 + (by - ay) ** 2) ** 0.5 or 1.0
+            x, y = ring[i]
+            ring[i] = (x - (by - ay) / length * delta, y + (bx - ax) / length * delta)
+        moved += len(nudges)
+    return moved
+
+
+def near_line(p, a, b, distance):
+    """Whether p lies within 'distance' of the line through a and b."""
+    (ax, ay), (bx, by) = a, b
+    length = ((bx - ax) ** 2 + (by - ay) ** 2) ** 0.5
+    return length > 0 and abs((bx - ax) * (p[1] - ay) - (by - ay) * (p[0] - ax)) <= distance * length
+
+
+def snap_regions(regions, targets, distance):
+    """
+    Moves every vertex of the (outer, holes) pairs within 'distance' of a target point onto
+    the nearest such target, then drops the repeated vertices and collapsed rings this leaves
+    and regroups the rings with assemble_regions. Vertices that snap to nothing but lie within
+    'distance' of the line through their neighbours are dropped too: they are where nudged
+    copies of overlapping edges happen to cross. A thin sliver can snap to an outer ring and
+    a hole with the same vertices; read even-odd such pairs cancel, so both are dropped.
+    """
+    snapped = set(targets)
+    cells = {}
+    for target in targets:
+        cells.setdefault((int(target[0] // distance), int(target[1] // distance)), []).append(target)
+
+    def snap(p):
+        cx, cy = int(p[0] // distance), int(p[1] // distance)
+        near = [t for dx in (-1, 0, 1) for dy in (-1, 0, 1) for t in cells.get((cx + dx, cy + dy), ())]
+        best = min(near, key=lambda t: (t[0] - p[0]) ** 2 + (t[1] - p[1]) ** 2, default=None)
+        if best is None or (best[0] - p[0]) ** 2 + (best[1] - p[1]) ** 2 > distance ** 2:
+            return p
+        return best
+
+    rings = {}
+    for ring in polygon_rings(regions):
+        ring = [snap(p) for p in ring]
+        ring = [p for i, p in enumerate(ring) if p != ring[i - 1]]
+        ring = [p for i, p in enumerate(ring)
+                if p in snapped or not near_line(p, ring[i - 1], ring[(i + 1) % len(ring)], distance)]
+        if not ring:
+            continue
+        # The same cycle in either direction, from its smallest vertex
+        start = ring.index(min(ring))
+        key = min(tuple(ring[start:] + ring[:start]), tuple((ring[start::-1] + ring[:start:-1])))
+        if key in rings:
+            del rings[key]
+        else:
+            rings[key] = ring
+    return assemble_regions(list(rings.values()))
+
+
+def greiner_hormann_clip(subject_polygon, clip_polygon, operation='intersection'):
+    """
+    Greiner-Hormann clipping of two simple polygons, concave or not, given in any form
+    polygon_rings accepts (or 'clip_polygon' as a ClipWindow). Degenerate vertices are first
+    nudged off the other polygon's edges, after which every contact is a proper crossing and
+    the node-list traversal of polygon_boolean applies. The result is then snapped back onto
+    the input vertices and edge crossings, so touching inputs give exact vertices too.
+    With the sweep for intersections this takes O((n + m + k) log(n + m)) for the usual
+    k crossings. Returns (outer, holes) pairs.
+    """
+    if isinstance(clip_polygon, ClipWindow):
+        clip_polygon = [tuple(v) for v in clip_polygon.vertices.tolist()]
+    subject_rings, clip_rings = polygon_rings(subject_polygon), polygon_rings(clip_polygon)
+    if not subject_rings or not clip_rings:
+        return polygon_boolean(subject_polygon, clip_polygon, operation)
+    original_subject, original_clip = [list(ring) for ring in subject_rings], [list(ring) for ring in clip_rings]
+    moved = remove_degeneracies(subject_rings, clip_rings)
+    regions = polygon_boolean([(ring, []) for ring in subject_rings], [(ring, []) for ring in clip_rings], operation)
+    if not moved:
+        return regions
+    targets = [tuple(p) for ring in original_subject + original_clip for p in ring]
+    targets += [pt for pt, _, _ in find_ring_intersections(original_subject, original_clip)]
+    x0, y0, x1, y1 = ring_bounds(original_subject + original_clip)
+    return snap_regions(regions, targets, GH_SNAP_DISTANCE * max(x1 - x0, y1 - y0, 1.0))
+
+
+# --- Polygon Clipping Engines ---
+
+_sutherland_hodgman = None
+
+
+def load_sutherland_hodgman():
+    """'Sutherland Hodgeman.py' can't be imported by name, so it is loaded from its path once."""
+    global _sutherland_hodgman
+    if _sutherland_hodgman is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Sutherland Hodgeman.py')
+        spec = importlib.util.spec_from_file_location('sutherland_hodgeman', path)
+        _sutherland_hodgman = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_sutherland_hodgman)
+    return _sutherland_hodgman
+
+
+# Every engine offers the same interface: clip(subject_polygon, clip_polygon) returning a list
+# of (outer, holes) pairs; 'concave' says whether the clip polygon may be concave.
+PolygonClipEngine = namedtuple('PolygonClipEngine', 'clip concave')
+POLYGON_CLIP_ENGINES = {
+    'weiler-atherton': PolygonClipEngine(lambda s, c: [(p, []) for p in weiler_atherton_clip(s, c)], True),
+    'greiner-hormann': PolygonClipEngine(greiner_hormann_clip, True),
+    'sutherland-hodgman': PolygonClipEngine(
+        lambda s, c: [(p, []) for p in load_sutherland_hodgman().sutherland_hodgman_clip(s, c)], False),
+}
+DEFAULT_POLYGON_CLIP_ENGINE = 'weiler-atherton'
+
+
+def engine_accepts(name, clip_polygon):
+    """Whether engine 'name' can clip against 'clip_polygon': convex-only engines need a valid ClipWindow."""
+    if POLYGON_CLIP_ENGINES[name].concave:
+        return True
+    try:
+        ClipWindow(clip_polygon)
+    except ValueError:
+        return False
+    return True
+
+
+def next_engine(name, clip_polygon=None):
+    """
+    The engine after 'name' in POLYGON_CLIP_ENGINES, skipping those that can't clip against
+    'clip_polygon' when one is given; 'name' itself when no other engine can.
+    """
+    names = list(POLYGON_CLIP_ENGINES)
+    start = names.index(name)
+    for step in range(1, len(names)):
+        candidate = names[(start + step) % len(names)]
+        if clip_polygon is None or engine_accepts(candidate, clip_polygon):
+            return candidate
+    return name
+
+
+def make_concave_polygon(n, center, radius, rng):
+    """
+    Random clockwise polygon with n vertices: a wavy, slightly noisy outline around 'center',
+    concave for n > 3, whose edges get shorter as n grows (like a coastline traced in more detail).
+    """
+    angle = np.linspace(2 * np.pi, 0, n, endpoint=False)
+    waves = rng.integers(3, 9)
+    r = radius * (0.75 + 0.2 * np.sin(waves * angle + rng.uniform(0, 2 * np.pi)) + rng.uniform(0, 2.0 / n, n))
+    return list(zip((center[0] + r * np.cos(angle)).tolist(), (center[1] + r * np.sin(angle)).tolist()))
+
+
+def benchmark_engines(sizes=(100, 1_000, 10_000, 50_000), repeats=3):
+    """Times the engines that accept concave clip polygons on random concave pairs of growing size."""
+    rng = np.random.default_rng(0)
+    print(f"{'vertices':>9} {'engine':<18} {'seconds':>9} {'parts':>6} {'area':>12}")
+    for n in sizes:
+        subject = make_concave_polygon(n, (400, 300), 250, rng)
+        clip = make_concave_polygon(n, (430, 320), 250, rng)
+        for name, engine in POLYGON_CLIP_ENGINES.items():
+            if not engine.concave:
+                continue
+            start = time.perf_counter()
+            for _ in range(repeats):
+                regions = engine.clip(subject, clip)
+            elapsed = (time.perf_counter() - start) / repeats
+            area = sum(abs(ring_area(outer)) - sum(abs(ring_area(hole)) for hole in holes) for outer, holes in regions)
+            print(f"{n:>9,} {name:<18} {elapsed:>9.3f} {len(regions):>6} {area:>12,.1f}")
+
+
 # --- Pygame and OpenGL Setup ---
 
 # Global variables
 state = 'draw_subject_start'
 subject_polygon = []
 clip_polygon = []
-clipped_polygons = []
+clipped_polygons = []  # (outer, holes) pairs from the selected engine
+clipped_meshes = []  # Triangulated clipped_polygons, rebuilt only when the result changes
+triangulation_cache = TriangulationCache()
+engine_name = DEFAULT_POLYGON_CLIP_ENGINE
 WINDOW_WIDTH, WINDOW_HEIGHT = 800, 600
 
 
@@ -214,7 +847,7 @@ def init_gl():
     glClearColor(0.1, 0.1, 0.1, 1.0)
 
 
-def draw_polygon(polygon, color, line_width, fill=False, is_drawing=False):
+def draw_polygon(polygon, color, line_width, is_drawing=False):
     """Draws a polygon with a given color and line width."""
     if not polygon:
         return
@@ -222,7 +855,7 @@ def draw_polygon(polygon, color, line_width, fill=False, is_drawing=False):
     glColor3f(*color)
     glLineWidth(line_width)
 
-    draw_mode = GL_LINE_STRIP if is_drawing else (GL_POLYGON if fill else GL_LINE_LOOP)
+    draw_mode = GL_LINE_STRIP if is_drawing else GL_LINE_LOOP
 
     glBegin(draw_mode)
     for vertex in polygon:
@@ -230,6 +863,19 @@ def draw_polygon(polygon, color, line_width, fill=False, is_drawing=False):
     glEnd()
 
 
+def draw_mesh(mesh, color):
+    """Fills a triangulated polygon from its cached vertex and index arrays."""
+    vertices, triangles = mesh
+    if not len(triangles):
+        return
+
+    glColor3f(*color)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glVertexPointer(2, GL_DOUBLE, 0, vertices)
+    glDrawElements(GL_TRIANGLES, triangles.size, GL_UNSIGNED_INT, triangles)
+    glDisableClientState(GL_VERTEX_ARRAY)
+
+
 def draw_text(text, x, y, font):
     """Renders text on the screen using Pygame."""
     text_surface = font.render(text, True, (255, 255, 255, 255), (30, 30, 30, 255))
@@ -240,7 +886,7 @@ def draw_text(text, x, y, font):
 
 def main():
     """Main application loop."""
-    global state, subject_polygon, clip_polygon, clipped_polygons
+    global state, subject_polygon, clip_polygon, clipped_polygons, clipped_meshes, engine_name
 
     pygame.init()
     display = (WINDOW_WIDTH, WINDOW_HEIGHT)
@@ -265,8 +911,16 @@ def main():
                 if event.key == pygame.K_r:
                     state = 'draw_subject_start'
                     subject_polygon, clip_polygon, clipped_polygons = [], [], []
+                    clipped_meshes = triangulation_cache.update([])
                     print("Canvas reset.")
 
+                if event.key == pygame.K_e:
+                    # Once clipped, only switch to engines that can handle the clip polygon
+                    engine_name = next_engine(engine_name, clip_polygon if state == 'clipped' else None)
+                    if state == 'clipped':
+                        clipped_polygons = POLYGON_CLIP_ENGINES[engine_name].clip(subject_polygon, clip_polygon)
+                        clipped_meshes = triangulation_cache.update(clipped_polygons)
+
                 if event.key == pygame.K_d:
                     if state == 'drawing_subject':
                         if len(subject_polygon) >= 3:
@@ -275,8 +929,15 @@ def main():
                             print("Subject polygon must have at least 3 vertices.")
                     elif state == 'drawing_clip':
                         if len(clip_polygon) >= 3:
-                            clipped_polygons = weiler_atherton_clip(subject_polygon, clip_polygon)
-                            state = 'clipped'
+                            try:
+                                clipped_polygons = POLYGON_CLIP_ENGINES[engine_name].clip(subject_polygon,
+                                                                                          clip_polygon)
+                            except ValueError as error:  # Convex-only engines reject the clip polygon
+                                print(f"{engine_name} can't clip against this polygon: {error}. "
+                                      f"Press 'E' to switch clippers.")
+                            else:
+                                clipped_meshes = triangulation_cache.update(clipped_polygons)
+                                state = 'clipped'
                         else:
                             print("Clipping polygon must have at least 3 vertices.")
 
@@ -316,8 +977,8 @@ def main():
 
         # Draw clipped result (green)
         if state == 'clipped':
-            for poly in clipped_polygons:
-                draw_polygon(poly, (0.0, 1.0, 0.0), 1.0, fill=True)
+            for mesh in clipped_meshes:
+                draw_mesh(mesh, (0.0, 1.0, 0.0))
 
         # --- Display instructions ---
         if state == 'draw_subject_start':
@@ -334,11 +995,15 @@ def main():
             text = ""
 
         draw_text(text, 10, WINDOW_HEIGHT - 30, font)
+        draw_text(f"Clipper: {engine_name} (press 'E' to switch)", 10, WINDOW_HEIGHT - 55, font)
 
         pygame.display.flip()
         pygame.time.wait(10)
 
 
 if __name__ == '__main__':
-    main()
+    if '--benchmark' in sys.argv:
+        benchmark_engines()
+    else:
+        main()
 
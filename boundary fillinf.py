@@ -1,6 +1,9 @@
 import pygame
 import sys
 import math
+import numpy as np
+from array import array
+from undo_history import SpanRecorder, UndoHistory, stroke_bounds
 
 # --- Configuration ---
 SCREEN_WIDTH, SCREEN_HEIGHT = 800, 700
@@ -15,54 +18,246 @@ COLORS = [
     (255, 165, 0), (165, 42, 42), (128, 128, 128), (211, 211, 211)
 ]
 ANIMATION_BATCH_SIZE = 500  # Pixels per frame during fill animation
+MAX_STACK_ENTRIES = 1 << 20  # Hard cap on the bitset fill's int32 stack (4 MB)
 
 
 # --- Core Algorithm (Generators for Animation) ---
 
-def boundary_fill_iterative(screen, x, y, fill_color, boundary_color, connectivity=4):
+def boundary_fill_iterative(screen, x, y, fill_color, boundary_color, connectivity=4, recorder=None):
     """
     Performs an iterative boundary fill using a stack.
-    Yields control to the main loop to create an animation effect.
+    Boundary and already-filled pixels are found once with a packed-color comparison over
+    the whole canvas; the traversal then reads only that mask, and each batch of pixels is
+    written with one vectorized assignment. Pixels are closed in the mask when pushed, so
+    each one enters the stack at most once.
+    Yields the rectangle changed since the previous yield to the main loop,
+    which redraws only that area to create an animation effect.
+    Overwritten pixels are reported to 'recorder' (a SpanRecorder) for undo.
     """
-    stack = [(x, y)]
-    pixels_processed = 0
-
-    # Check if the initial seed point is valid
-    try:
-        initial_color = screen.get_at((x, y))
-        if initial_color == boundary_color or initial_color == fill_color:
-            print("Seed point is on boundary or already filled.")
-            return
-    except IndexError:
+    width, height = screen.get_size()
+    if not (0 <= x < width and 0 <= y < height):
         print("Seed point is outside the canvas.")
         return
 
-    while stack:
-        px, py = stack.pop()
+    # Closed mask: one byte per pixel in row-major order, set for blocked and already pushed pixels
+    packed = pygame.surfarray.array2d(screen)
+    blocked = (packed == screen.map_rgb(boundary_color)) | (packed == screen.map_rgb(fill_color))
+    closed = bytearray(blocked.T.tobytes())
+    del packed, blocked
 
-        if not (0 <= px < CANVAS_WIDTH and 0 <= py < CANVAS_HEIGHT):
-            continue
+    # Check if the initial seed point is valid
+    if closed[y * width + x]:
+        print("Seed point is on boundary or already filled.")
+        return
+
+    closed[y * width + x] = 1
+    stack = [y * width + x]
+    batch = array('i')
 
-        if screen.get_at((px, py)) != boundary_color and screen.get_at((px, py)) != fill_color:
-            screen.set_at((px, py), fill_color)
-            pixels_processed += 1
+    while stack:
+        idx = stack.pop()
+        batch.append(idx)
+
+        # Write and yield a batch of pixels for animation
+        if len(batch) == ANIMATION_BATCH_SIZE:
+            yield write_pixel_batch(screen, batch, fill_color, recorder)
+            batch = array('i')
+
+        # Push the open neighbors based on connectivity
+        py, px = divmod(idx, width)
+        right, left = px + 1 < width, px > 0
+        down, up = py + 1 < height, py > 0
+        neighbors = []
+        if right:
+            neighbors.append(idx + 1)
+        if left:
+            neighbors.append(idx - 1)
+        if down:
+            neighbors.append(idx + width)
+        if up:
+            neighbors.append(idx - width)
+
+        if connectivity == 8:
+            if right and down:
+                neighbors.append(idx + width + 1)
+            if left and down:
+                neighbors.append(idx + width - 1)
+            if right and up:
+                neighbors.append(idx - width + 1)
+            if left and up:
+                neighbors.append(idx - width - 1)
+
+        for n in neighbors:
+            if not closed[n]:
+                closed[n] = 1
+                stack.append(n)
+    yield write_pixel_batch(screen, batch, fill_color, recorder)  # Final yield to update the last batch
+
+
+def write_pixel_batch(screen, batch, color, recorder=None):
+    """
+    Sets every flat row-major pixel index in 'batch' to 'color' with a single masked
+    assignment and returns the Rect that changed (None for an empty batch).
+    """
+    if not batch:
+        return None
+    ys, xs = np.divmod(np.frombuffer(batch, dtype=np.int32), screen.get_width())
+    pixels = pygame.surfarray.pixels2d(screen)
+    if recorder is not None:
+        recorder.add_many(xs, ys, pixels[xs, ys])
+    pixels[xs, ys] = screen.map_rgb(color)
+    del pixels
+    x0, y0 = int(xs.min()), int(ys.min())
+    return pygame.Rect(x0, y0, int(xs.max()) - x0 + 1, int(ys.max()) - y0 + 1)
+
+
+def bitset_row(bits, row, width):
+    """Unpacks one canvas row of a row-major uint8 bitset into a bool array."""
+    start = row * width
+    chunk = bits[start >> 3:((start + width - 1) >> 3) + 1]
+    return np.unpackbits(chunk, bitorder='little')[start & 7:(start & 7) + width].astype(bool)
+
+
+def set_bit_range(bits, start, end):
+    """Sets bits start..end - 1 of a row-major uint8 bitset."""
+    first, last = start >> 3, (end - 1) >> 3
+    head = (0xFF << (start & 7)) & 0xFF
+    tail = 0xFF >> (7 - ((end - 1) & 7))
+    if first == last:
+        bits[first] |= head & tail
+    else:
+        bits[first] |= head
+        bits[first + 1:last] = 0xFF
+        bits[last] |= tail
+
+
+def boundary_fill_bitset(screen, x, y, fill_color, boundary_color, connectivity=4, max_stack=MAX_STACK_ENTRIES,
+                         recorder=None):
+    """
+    Performs a boundary fill with bounded memory.
+    Works span by span: a popped seed grows left and right over pixels that are neither boundary
+    nor fill colored (so the pixels it has painted already stop it too), the span is written with
+    one slice assignment, and one seed per free run in the rows above and below is pushed. A single
+    packed bitset marks the pixels this fill painted, which tells them apart from pixels that were
+    fill colored before. Seeds live in a preallocated int32 ring buffer of 'max_stack' entries;
+    when it overflows, the oldest seed is dropped and its row is marked, and once the stack drains
+    only the marked rows are rescanned for free pixels next to painted ones. Peak memory is about
+    width * height / 8 bytes plus 4 * max_stack bytes. Yields changed rectangles for animation and
+    reports overwritten pixels to 'recorder'.
+    """
+    width, height = screen.get_size()
+    if width * height > 2 ** 31 - 1:
+        raise ValueError("Canvas is too large for int32 pixel indices.")
+    if not (0 <= x < width and 0 <= y < height):
+        print("Seed point is outside the canvas.")
+        return
 
-            # Yield control after a batch of pixels for animation
-            if pixels_processed % ANIMATION_BATCH_SIZE == 0:
-                yield
+    boundary, fill = screen.map_rgb(boundary_color), screen.map_rgb(fill_color)
+    if screen.get_at_mapped((x, y)) in (boundary, fill):
+        print("Seed point is on boundary or already filled.")
+        return
 
-            # Add neighbors to the stack based on connectivity
-            stack.append((px + 1, py))
-            stack.append((px - 1, py))
-            stack.append((px, py + 1))
-            stack.append((px, py - 1))
+    painted = np.zeros((width * height + 7) >> 3, dtype=np.uint8)
+    stack = array('i', bytes(4 * max_stack))
+    base, count = 0, 0  # Ring buffer: 'count' entries starting at the oldest entry 'base'
+    dropped_rows = bytearray(height)  # Rows that lost a seed since the last rescan
+    overflowed = False
+    reach = 1 if connectivity == 8 else 0  # Diagonal neighbours widen the next row's range by one pixel
+    pixels = pygame.surfarray.pixels2d(screen)  # Released around every yield so the canvas can be blitted
+
+    def free(row, x0, x1):
+        # Pixels x0..x1 - 1 of 'row' that are neither boundary nor fill colored
+        segment = pixels[x0:x1, row]
+        return (segment != boundary) & (segment != fill)
+
+    def push(idx):
+        nonlocal base, count, overflowed
+        if count == max_stack:
+            # Stack is full: drop the oldest seed; the rescan of its row finds it again
+            dropped_rows[stack[base] // width] = 1
+            base = (base + 1) % max_stack
+            count -= 1
+            overflowed = True
+        stack[(base + count) % max_stack] = idx
+        count += 1
+
+    def push_runs(row, mask, x0):
+        # One seed for the first pixel of every run of free pixels in 'mask', which starts at column x0
+        starts = np.flatnonzero(mask & ~np.concatenate(([False], mask[:-1])))
+        for px in (starts + (row * width + x0)).tolist():
+            push(px)
+
+    def grow(row, px):
+        # Extends the free run through (px, row) in blocks that double in size; returns it half-open
+        x0, step = px, 16
+        while x0 > 0:
+            lo = max(x0 - step, 0)
+            stops = np.flatnonzero(~free(row, lo, x0))
+            if len(stops):
+                x0 = lo + int(stops[-1]) + 1
+                break
+            x0, step = lo, step * 2
+        x1, step = px + 1, 16
+        while x1 < width:
+            hi = min(x1 + step, width)
+            stops = np.flatnonzero(~free(row, x1, hi))
+            if len(stops):
+                x1 += int(stops[0])
+                break
+            x1, step = hi, step * 2
+        return x0, x1
+
+    def rescan(row):
+        # A dropped seed is a free pixel next to a painted pixel in the row above or below
+        near = np.zeros(width, dtype=bool)
+        for other in (row - 1, row + 1):
+            if 0 <= other < height:
+                near |= bitset_row(painted, other, width)
+        if connectivity == 8:
+            wide = near.copy()
+            wide[1:] |= near[:-1]
+            wide[:-1] |= near[1:]
+            near = wide
+        push_runs(row, near & free(row, 0, width), 0)
+
+    push(y * width + x)
+    changed, batch_pixels = None, 0
+
+    while count or overflowed:
+        if not count:
+            overflowed = False
+            for row in np.flatnonzero(np.frombuffer(dropped_rows, dtype=np.uint8)).tolist():
+                dropped_rows[row] = 0
+                rescan(row)
+            continue
 
-            if connectivity == 8:
-                stack.append((px + 1, py + 1))
-                stack.append((px - 1, py + 1))
-                stack.append((px + 1, py - 1))
-                stack.append((px - 1, py - 1))
-    yield  # Final yield to update the last batch
+        count -= 1
+        row, px = divmod(stack[(base + count) % max_stack], width)
+        if not free(row, px, px + 1)[0]:
+            continue  # Painted from another seed in the meantime
+
+        x0, x1 = grow(row, px)
+        if recorder is not None:
+            recorder.add_many(np.arange(x0, x1), np.full(x1 - x0, row), pixels[x0:x1, row].copy())
+        pixels[x0:x1, row] = fill
+        set_bit_range(painted, row * width + x0, row * width + x1)
+        span = pygame.Rect(x0, row, x1 - x0, 1)
+        changed = changed.union(span) if changed else span
+        batch_pixels += x1 - x0
+
+        lo, hi = max(x0 - reach, 0), min(x1 + reach, width)
+        for next_row in (row - 1, row + 1):
+            if 0 <= next_row < height:
+                push_runs(next_row, free(next_row, lo, hi), lo)
+
+        # Yield a batch of pixels for animation
+        if batch_pixels >= ANIMATION_BATCH_SIZE:
+            del pixels
+            yield changed
+            pixels = pygame.surfarray.pixels2d(screen)
+            changed, batch_pixels = None, 0
+    del pixels
+    yield changed
 
 
 # --- Main Application ---
@@ -81,11 +276,13 @@ def main():
     boundary_color = COLORS[0]  # Default to black
     fill_color = COLORS[1]  # Default to red
     active_filler = None
+    history = UndoHistory()
+    recorder = None  # Collects the changes of the fill or stroke in progress
 
     font = pygame.font.SysFont('Arial', 14, bold=True)
 
     # --- UI Layout ---
-    tools = ['pencil', 'line', 'rect', 'circle', 'fill_4', 'fill_8']
+    tools = ['pencil', 'line', 'rect', 'circle', 'fill_4', 'fill_8', 'bitset_4', 'bitset_8']
     button_width, button_height, margin = 70, 30, 10
     tool_buttons = {
         tool: pygame.Rect(margin + i * (button_width + margin), CANVAS_HEIGHT + 20, button_width, button_height) for
@@ -96,11 +293,44 @@ def main():
     color_buttons = {color: pygame.Rect(margin + i * (color_swatch_size + 5), CANVAS_HEIGHT + 70, color_swatch_size,
                                         color_swatch_size) for i, color in enumerate(COLORS)}
 
+    # Text surfaces are rendered once and reused whenever the UI panel is redrawn
+    tool_labels = {tool: font.render(tool.replace('_', '-').title(), True, (0, 0, 0)) for tool in tools}
+    clear_label = font.render("Clear", True, (0, 0, 0))
+    info_text = font.render("Left-click to set Boundary | Right-click to set Fill | Ctrl+Z / Ctrl+Y to Undo / Redo",
+                            True, (50, 50, 50))
+
+    # --- Dirty-Rectangle State ---
+    canvas_rect = canvas.get_rect()
+    panel_rect = pygame.Rect(0, CANVAS_HEIGHT, SCREEN_WIDTH, UI_HEIGHT)
+    panel_snapshot = None  # Copy of the drawn UI panel, used to repair areas under the preview
+    ui_dirty = True
+    dirty_rects = [canvas_rect]
+    preview_rect = None
+
     running = True
     while running:
-        for event in pygame.event.get():
+        # Sleep until the next event unless there is something left to animate or present
+        if active_filler or dirty_rects or ui_dirty:
+            events = pygame.event.get()
+        else:
+            events = [pygame.event.wait()] + pygame.event.get()
+
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.VIDEOEXPOSE:
+                dirty_rects.append(screen.get_rect())
+
+            # --- Undo / Redo ---
+            elif event.type == pygame.KEYDOWN and event.mod & pygame.KMOD_CTRL:
+                if active_filler is None and not drawing:
+                    changed = None
+                    if event.key == pygame.K_z:
+                        changed = history.undo(canvas)
+                    elif event.key == pygame.K_y:
+                        changed = history.redo(canvas)
+                    if changed:
+                        dirty_rects.append(changed)
 
             # --- Mouse Events ---
             if event.type == pygame.MOUSEBUTTONDOWN:
@@ -108,12 +338,15 @@ def main():
                     # UI clicks
                     clicked_ui = False
                     if clear_button.collidepoint(event.pos):
-                        canvas.fill(BG_COLOR)
+                        recorder = SpanRecorder()
+                        dirty_rects.append(recorder.record_stroke(canvas, canvas_rect, pygame.Surface.fill, BG_COLOR))
+                        history.push(recorder.finish(), canvas.map_rgb(BG_COLOR))
                         clicked_ui = True
 
                     for tool, rect in tool_buttons.items():
                         if rect.collidepoint(event.pos):
                             active_tool = tool
+                            ui_dirty = True
                             clicked_ui = True
                             break
 
@@ -123,15 +356,21 @@ def main():
                                 boundary_color = color
                             elif event.button == 3:  # Right-click sets fill color
                                 fill_color = color
+                            ui_dirty = True
                             clicked_ui = True
                             break
 
                     # Canvas clicks
                     if not clicked_ui and event.pos[1] < CANVAS_HEIGHT:
+                        recorder = SpanRecorder()
                         if 'fill' in active_tool:
                             conn = 8 if active_tool == 'fill_8' else 4
                             active_filler = boundary_fill_iterative(canvas, event.pos[0], event.pos[1], fill_color,
-                                                                    boundary_color, conn)
+                                                                    boundary_color, conn, recorder)
+                        elif 'bitset' in active_tool:
+                            conn = 8 if active_tool == 'bitset_8' else 4
+                            active_filler = boundary_fill_bitset(canvas, event.pos[0], event.pos[1], fill_color,
+                                                                 boundary_color, conn, recorder=recorder)
                         else:
                             drawing = True
                             start_pos = event.pos
@@ -139,7 +378,9 @@ def main():
 
             elif event.type == pygame.MOUSEMOTION:
                 if drawing and active_tool == 'pencil' and event.pos[1] < CANVAS_HEIGHT:
-                    pygame.draw.line(canvas, boundary_color, last_pos, event.pos, 2)
+                    area = stroke_bounds((last_pos, event.pos), 2)
+                    dirty_rects.append(recorder.record_stroke(canvas, area, pygame.draw.line, boundary_color, last_pos,
+                                                              event.pos, 2))
                     last_pos = event.pos
 
             elif event.type == pygame.MOUSEBUTTONUP:
@@ -149,56 +390,77 @@ def main():
                     if end_pos[1] >= CANVAS_HEIGHT: end_pos = (end_pos[0], CANVAS_HEIGHT - 1)
 
                     if active_tool == 'line':
-                        pygame.draw.line(canvas, boundary_color, start_pos, end_pos, 2)
+                        area = stroke_bounds((start_pos, end_pos), 2)
+                        dirty_rects.append(recorder.record_stroke(canvas, area, pygame.draw.line, boundary_color,
+                                                                  start_pos, end_pos, 2))
                     elif active_tool == 'rect':
                         rect = pygame.Rect(start_pos, (end_pos[0] - start_pos[0], end_pos[1] - start_pos[1]))
                         rect.normalize()
-                        pygame.draw.rect(canvas, boundary_color, rect, 2)
+                        area = stroke_bounds((rect.topleft, rect.bottomright), 2)
+                        dirty_rects.append(recorder.record_stroke(canvas, area, pygame.draw.rect, boundary_color,
+                                                                  rect, 2))
                     elif active_tool == 'circle':
                         dx = end_pos[0] - start_pos[0]
                         dy = end_pos[1] - start_pos[1]
                         radius = int(math.sqrt(dx * dx + dy * dy))
                         if radius > 0:
-                            pygame.draw.circle(canvas, boundary_color, start_pos, radius, 2)
+                            cx, cy = start_pos
+                            area = stroke_bounds(((cx - radius, cy - radius), (cx + radius, cy + radius)), 2)
+                            dirty_rects.append(recorder.record_stroke(canvas, area, pygame.draw.circle,
+                                                                      boundary_color, start_pos, radius, 2))
+                    history.push(recorder.finish(), canvas.map_rgb(boundary_color))
 
         # --- Animation Step ---
         if active_filler:
             try:
-                next(active_filler)
+                changed = next(active_filler)
+                if changed:
+                    dirty_rects.append(changed)
             except StopIteration:
                 active_filler = None
+                history.push(recorder.finish(), canvas.map_rgb(fill_color))
 
         # --- Drawing ---
-        screen.fill((50, 50, 60))  # Dark UI background
-        screen.blit(canvas, (0, 0))
-
-        # UI Panel
-        pygame.draw.rect(screen, (230, 230, 240), (0, CANVAS_HEIGHT, SCREEN_WIDTH, UI_HEIGHT))
-
-        # Draw tool buttons
-        for tool, rect in tool_buttons.items():
-            is_active = active_tool == tool
-            pygame.draw.rect(screen, (180, 190, 220) if is_active else (210, 210, 220), rect, border_radius=5)
-            pygame.draw.rect(screen, (60, 70, 100) if is_active else (150, 150, 150), rect, 2, 5)
-            label = tool.replace('_', '-').title()
-            text = font.render(label, True, (0, 0, 0))
-            screen.blit(text, text.get_rect(center=rect.center))
-
-        # Draw clear button
-        pygame.draw.rect(screen, (220, 180, 180), clear_button, border_radius=5)
-        pygame.draw.rect(screen, (100, 60, 60), clear_button, 2, 5)
-        text = font.render("Clear", True, (0, 0, 0))
-        screen.blit(text, text.get_rect(center=clear_button.center))
-
-        # Draw color palette and info
-        info_text = font.render("Left-click to set Boundary | Right-click to set Fill", True, (50, 50, 50))
-        screen.blit(info_text, (margin, CANVAS_HEIGHT + 55))
-        for color, rect in color_buttons.items():
-            pygame.draw.rect(screen, color, rect, border_radius=4)
-            if color == boundary_color:
-                pygame.draw.rect(screen, (0, 0, 0), rect, 3, 4)
-            if color == fill_color:
-                pygame.draw.rect(screen, (0, 0, 0), (rect.x + 2, rect.y + 2, rect.width - 4, rect.height - 4), 2, 4)
+        if ui_dirty:
+            # UI Panel
+            pygame.draw.rect(screen, (230, 230, 240), panel_rect)
+
+            # Draw tool buttons
+            for tool, rect in tool_buttons.items():
+                is_active = active_tool == tool
+                pygame.draw.rect(screen, (180, 190, 220) if is_active else (210, 210, 220), rect, border_radius=5)
+                pygame.draw.rect(screen, (60, 70, 100) if is_active else (150, 150, 150), rect, 2, 5)
+                screen.blit(tool_labels[tool], tool_labels[tool].get_rect(center=rect.center))
+
+            # Draw clear button
+            pygame.draw.rect(screen, (220, 180, 180), clear_button, border_radius=5)
+            pygame.draw.rect(screen, (100, 60, 60), clear_button, 2, 5)
+            screen.blit(clear_label, clear_label.get_rect(center=clear_button.center))
+
+            # Draw color palette and info
+            screen.blit(info_text, (margin, CANVAS_HEIGHT + 55))
+            for color, rect in color_buttons.items():
+                pygame.draw.rect(screen, color, rect, border_radius=4)
+                if color == boundary_color:
+                    pygame.draw.rect(screen, (0, 0, 0), rect, 3, 4)
+                if color == fill_color:
+                    pygame.draw.rect(screen, (0, 0, 0), (rect.x + 2, rect.y + 2, rect.width - 4, rect.height - 4), 2, 4)
+
+            panel_snapshot = screen.subsurface(panel_rect).copy()
+            dirty_rects.append(panel_rect)
+            ui_dirty = False
+
+        # Repair every changed area (including the old preview) from the canvas and panel
+        if preview_rect:
+            dirty_rects.append(preview_rect)
+            preview_rect = None
+        for rect in dirty_rects:
+            area = rect.clip(canvas_rect)
+            if area:
+                screen.blit(canvas, area, area)
+            area = rect.clip(panel_rect)
+            if area:
+                screen.blit(panel_snapshot, area, area.move(0, -CANVAS_HEIGHT))
 
         # Draw dynamic preview
         if drawing and start_pos and active_tool in ['line', 'rect', 'circle']:
@@ -206,19 +468,24 @@ def main():
             if current_pos[1] >= CANVAS_HEIGHT: current_pos = (current_pos[0], CANVAS_HEIGHT - 1)
 
             if active_tool == 'line':
-                pygame.draw.line(screen, (100, 100, 100), start_pos, current_pos, 1)
+                preview_rect = pygame.draw.line(screen, (100, 100, 100), start_pos, current_pos, 1)
             elif active_tool == 'rect':
                 rect = pygame.Rect(start_pos, (current_pos[0] - start_pos[0], current_pos[1] - start_pos[1]))
                 rect.normalize()
-                pygame.draw.rect(screen, (100, 100, 100), rect, 1)
+                preview_rect = pygame.draw.rect(screen, (100, 100, 100), rect, 1)
             elif active_tool == 'circle':
                 dx = current_pos[0] - start_pos[0]
                 dy = current_pos[1] - start_pos[1]
                 radius = int(math.sqrt(dx * dx + dy * dy))
                 if radius > 0:
-                    pygame.draw.circle(screen, (100, 100, 100), start_pos, radius, 1)
-
-        pygame.display.flip()
+                    preview_rect = pygame.draw.circle(screen, (100, 100, 100), start_pos, radius, 1)
+            if preview_rect:
+                dirty_rects.append(preview_rect)
+
+        # Push only the changed regions to the display
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+            dirty_rects = []
 
     pygame.quit()
     sys.exit()
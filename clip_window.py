@@ -0,0 +1,121 @@
+from collections.abc import Mapping
+from fractions import Fraction
+import math
+import numpy as np
+from robust_predicates import orient2d
+
+# --- Clip Window Shared by the Point, Line and Polygon Clippers ---
+
+class ClipWindow(Mapping):
+    """
+    A convex clip window with everything the clippers derive from it computed once:
+    the clockwise vertex list, one half-plane a*x + b*y + c <= 0 per edge, and the
+    bounding box. Repeated vertices are dropped; a window that encloses no area or is
+    not convex raises ValueError.
+
+    It reads as the mapping {'xmin', 'ymin', 'xmax', 'ymax'}, so it can be passed as
+    **window to the rectangle clippers, and has pygame.Rect-style left/top/right/bottom.
+    """
+
+    def __init__(self, vertices):
+        vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+        # A repeated vertex adds a zero-length edge, whose half-plane would hold every point
+        vertices = vertices[np.any(vertices != np.roll(vertices, 1, axis=0), axis=1)]
+        x, y = vertices[:, 0], vertices[:, 1]
+        area = np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)
+        if len(vertices) < 3 or area == 0:
+            raise ValueError(f"Clip window {vertices.tolist()} encloses no area")
+        # Sutherland-Hodgman treats the right-hand side of each edge as inside, so keep the vertices clockwise
+        if area > 0:
+            vertices = vertices[::-1].copy()
+        # Convex exactly when no vertex lies strictly left of (outside) any edge
+        points = [tuple(p) for p in vertices.tolist()]
+        for start, end in zip(points[-1:] + points[:-1], points):
+            if any(orient2d(start, end, p) > 0 for p in points):
+                raise ValueError(f"Clip window {points} is not convex")
+        self.vertices = vertices
+
+        starts = np.roll(vertices, 1, axis=0)  # Edge i runs from vertex i - 1 to vertex i
+        edges = vertices - starts
+        self.half_planes = np.column_stack((-edges[:, 1], edges[:, 0],
+                                            edges[:, 1] * starts[:, 0] - edges[:, 0] * starts[:, 1]))
+        self.planes = [tuple(plane) for plane in self.half_planes.tolist()]  # For scalar loops
+
+        self.xmin, self.ymin = (float(v) for v in vertices.min(axis=0))
+        self.xmax, self.ymax = (float(v) for v in vertices.max(axis=0))
+        self.is_rectangle = len(vertices) == 4 and bool(np.all((edges[:, 0] == 0) | (edges[:, 1] == 0)))
+
+    @classmethod
+    def from_bounds(cls, xmin, ymin, xmax, ymax):
+        """Rectangle window, listed clockwise the way the clipping apps draw it."""
+        return cls([(xmin, ymax), (xmax, ymax), (xmax, ymin), (xmin, ymin)])
+
+    @classmethod
+    def from_corners(cls, p1, p2):
+        """Rectangle window spanned by two opposite corners in any order."""
+        xmin, xmax = sorted([p1[0], p2[0]])
+        ymin, ymax = sorted([p1[1], p2[1]])
+        return cls.from_bounds(xmin, ymin, xmax, ymax)
+
+    @classmethod
+    def from_rect(cls, rect):
+        """Window matching a pygame.Rect, using its right/bottom as the far edges."""
+        return cls.from_bounds(rect.left, rect.top, rect.right, rect.bottom)
+
+    # Mapping interface: {'xmin': ..., 'ymin': ..., 'xmax': ..., 'ymax': ...}
+    def __getitem__(self, key):
+        if key not in ('xmin', 'ymin', 'xmax', 'ymax'):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(('xmin', 'ymin', 'xmax', 'ymax'))
+
+    def __len__(self):
+        return 4
+
+    # pygame.Rect-style edges
+    left = property(lambda self: self.xmin)
+    right = property(lambda self: self.xmax)
+    top = property(lambda self: self.ymin)
+    bottom = property(lambda self: self.ymax)
+
+    def __repr__(self):
+        if self.is_rectangle:
+            return f"ClipWindow.from_bounds({self.xmin}, {self.ymin}, {self.xmax}, {self.ymax})"
+        return f"ClipWindow({self.vertices.tolist()})"
+
+    def side(self, edge, x, y):
+        """Signed distance-like value of (x, y) from edge 'edge': <= 0 is inside. Works on arrays."""
+        a, b, c = self.planes[edge]
+        return a * x + b * y + c
+
+    def intersect(self, edge, p1, p2):
+        """
+        Where segment p1-p2 crosses edge 'edge', for endpoints on opposite sides of it.
+        When the float side values can't tell the endpoints apart (an endpoint a hair off the
+        edge, or an overflowing difference) the crossing is solved exactly instead. The point
+        always lies on the segment; a segment parallel to the edge, which never crosses it, gives p1.
+        """
+        d1, d2 = self.side(edge, *p1), self.side(edge, *p2)
+        if d1 != d2 and math.isfinite(d1 - d2):
+            t = min(max(d1 / (d1 - d2), 0.0), 1.0)
+            return (p1[0] + t * (p2[0] - p1[0]), p1[1] + t * (p2[1] - p1[1]))
+
+        (sx, sy), (ex, ey) = ([Fraction(c) for c in v] for v in self.vertices[[edge - 1, edge]].tolist())
+        q1, q2 = [Fraction(c) for c in p1], [Fraction(c) for c in p2]
+        d1 = (ex - sx) * (q1[1] - sy) - (ey - sy) * (q1[0] - sx)
+        d2 = (ex - sx) * (q2[1] - sy) - (ey - sy) * (q2[0] - sx)
+        if d1 == d2:
+            return (p1[0], p1[1])
+        t = min(max(d1 / (d1 - d2), 0), 1)
+        return (float(q1[0] + t * (q2[0] - q1[0])), float(q1[1] + t * (q2[1] - q1[1])))
+
+    def contains(self, x, y):
+        """Inside test for a point or for arrays of coordinates (edges count as inside)."""
+        if self.is_rectangle:
+            return (x >= self.xmin) & (x <= self.xmax) & (y >= self.ymin) & (y <= self.ymax)
+        inside = True
+        for edge in range(len(self.planes)):
+            inside = inside & (self.side(edge, x, y) <= 0)
+        return inside
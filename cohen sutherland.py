@@ -1,5 +1,7 @@
 import pygame
 import sys
+from clip_window import ClipWindow
+from line_clip import cohen_sutherland_clip_batch
 
 # Initialize Pygame
 pygame.init()
@@ -13,16 +15,11 @@ GREEN = (0, 255, 0)
 BLUE = (0, 100, 255)
 GRAY = (200, 200, 200)
 YELLOW = (255, 255, 0)
+LINE_LAYER_KEY = (255, 0, 255)  # Transparent color of the line layer, used by no drawing
 
-# Region codes
-INSIDE = 0  # 0000
-LEFT = 1  # 0001
-RIGHT = 2  # 0010
-BOTTOM = 4  # 0100
-TOP = 8  # 1000
-
-# Clipping window
+# Clipping window: the Rect is drawn, the ClipWindow built from it is what the clippers use
 clip_rect = pygame.Rect(200, 150, 400, 300)
+clip_window = ClipWindow.from_rect(clip_rect)
 
 # Screen setup
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
@@ -35,83 +32,21 @@ lines = []
 current_line_start = None
 
 
-def compute_outcode(x, y, rect):
-    """Compute the region code for a point (x, y) relative to rectangle"""
-    code = INSIDE
-
-    if x < rect.left:
-        code |= LEFT
-    elif x > rect.right:
-        code |= RIGHT
-
-    if y < rect.top:
-        code |= TOP
-    elif y > rect.bottom:
-        code |= BOTTOM
-
-    return code
-
-
-def cohen_sutherland_clip(x1, y1, x2, y2, rect):
-    """
-    Cohen-Sutherland line clipping algorithm
-    Returns clipped line coordinates or None if line is outside
-    """
-    outcode1 = compute_outcode(x1, y1, rect)
-    outcode2 = compute_outcode(x2, y2, rect)
-    accept = False
-
-    while True:
-        # Both endpoints inside - trivially accept
-        if outcode1 == 0 and outcode2 == 0:
-            accept = True
-            break
-
-        # Both endpoints share an outside region - trivially reject
-        elif (outcode1 & outcode2) != 0:
-            break
-
-        # Line needs clipping
-        else:
-            # Pick an endpoint that's outside
-            outcode_out = outcode1 if outcode1 != 0 else outcode2
-
-            # Find intersection point
-            if outcode_out & TOP:
-                x = x1 + (x2 - x1) * (rect.top - y1) / (y2 - y1)
-                y = rect.top
-            elif outcode_out & BOTTOM:
-                x = x1 + (x2 - x1) * (rect.bottom - y1) / (y2 - y1)
-                y = rect.bottom
-            elif outcode_out & RIGHT:
-                y = y1 + (y2 - y1) * (rect.right - x1) / (x2 - x1)
-                x = rect.right
-            elif outcode_out & LEFT:
-                y = y1 + (y2 - y1) * (rect.left - x1) / (x2 - x1)
-                x = rect.left
-
-            # Replace outside point with intersection point
-            if outcode_out == outcode1:
-                x1, y1 = x, y
-                outcode1 = compute_outcode(x1, y1, rect)
-            else:
-                x2, y2 = x, y
-                outcode2 = compute_outcode(x2, y2, rect)
-
-    if accept:
-        return (x1, y1, x2, y2)
-    return None
-
-
-def draw_grid():
+def clip_all(lines, window):
+    """Clip every stored line; returns the clipped coordinates or None for each line"""
+    clipped, accepted = cohen_sutherland_clip_batch(lines, **window)
+    return [tuple(line) if keep else None for line, keep in zip(clipped.tolist(), accepted.tolist())]
+
+
+def draw_grid(surface):
     """Draw background grid"""
     for x in range(0, WIDTH, 50):
-        pygame.draw.line(screen, GRAY, (x, 0), (x, HEIGHT), 1)
+        pygame.draw.line(surface, GRAY, (x, 0), (x, HEIGHT), 1)
     for y in range(0, HEIGHT, 50):
-        pygame.draw.line(screen, GRAY, (0, y), (WIDTH, y), 1)
+        pygame.draw.line(surface, GRAY, (0, y), (WIDTH, y), 1)
 
 
-def draw_instructions():
+def draw_instructions(surface):
     """Draw instruction text"""
     instructions = [
         "Click and drag to draw lines",
@@ -122,77 +57,137 @@ def draw_instructions():
     y_offset = 10
     for instruction in instructions:
         text = font.render(instruction, True, BLACK)
-        screen.blit(text, (10, y_offset))
+        surface.blit(text, (10, y_offset))
         y_offset += 30
 
 
-# Main loop
-running = True
-while running:
-    screen.fill(WHITE)
-    draw_grid()
+def draw_legend(surface):
+    """Draw line legend"""
+    legend_y = HEIGHT - 80
+    pygame.draw.line(surface, RED, (10, legend_y), (40, legend_y), 1)
+    surface.blit(font.render("= Original Line", True, BLACK), (50, legend_y - 10))
+
+    pygame.draw.line(surface, GREEN, (10, legend_y + 30), (40, legend_y + 30), 3)
+    surface.blit(font.render("= Clipped Line", True, BLACK), (50, legend_y + 20))
+
+
+def draw_line_pair(surface, start, end, clipped):
+    """Draw a line and its clipped part"""
+    # Draw original line in red (thin)
+    pygame.draw.line(surface, RED, start, end, 1)
+
+    # Draw clipped line in green (thick)
+    if clipped:
+        x1, y1, x2, y2 = clipped
+        pygame.draw.line(surface, GREEN, (x1, y1), (x2, y2), 3)
+
+        # Draw clipping points
+        pygame.draw.circle(surface, YELLOW, (int(x1), int(y1)), 5)
+        pygame.draw.circle(surface, YELLOW, (int(x2), int(y2)), 5)
+
+
+def build_window_layer():
+    """Render the clipping window onto a copy of the background"""
+    layer = background.copy()
 
     # Draw clipping rectangle
-    pygame.draw.rect(screen, BLUE, clip_rect, 3)
+    pygame.draw.rect(layer, BLUE, clip_rect, 3)
 
     # Draw label for clipping window
     label = font.render("Clipping Window", True, BLUE)
-    screen.blit(label, (clip_rect.centerx - 70, clip_rect.top - 30))
+    layer.blit(label, (clip_rect.centerx - 70, clip_rect.top - 30))
+    return layer
+
+
+def build_line_layer():
+    """Render all stored lines onto a color-keyed layer that is blitted over the line preview"""
+    layer = pygame.Surface((WIDTH, HEIGHT))
+    layer.fill(LINE_LAYER_KEY)
+    layer.set_colorkey(LINE_LAYER_KEY)
+    for (start, end), clipped in zip(lines, clipped_lines):
+        draw_line_pair(layer, start, end, clipped)
+    return layer
+
+
+# Static layers are rendered once: the grid below everything, the text on top
+background = pygame.Surface((WIDTH, HEIGHT))
+background.fill(WHITE)
+draw_grid(background)
+overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+draw_instructions(overlay)
+draw_legend(overlay)
+
+# Clipped result of every stored line, kept in step with 'lines'
+clipped_lines = []
+window_layer = build_window_layer()
+line_layer = build_line_layer()
+
+# Main loop
+running = True
+needs_redraw = True  # Set when the lines, the window or the line preview change
+while running:
+    # Sleep until the next event when the screen is up to date
+    if needs_redraw:
+        events = pygame.event.get()
+    else:
+        events = [pygame.event.wait()] + pygame.event.get()
 
     # Event handling
-    for event in pygame.event.get():
+    for event in events:
         if event.type == pygame.QUIT:
             running = False
 
+        elif event.type == pygame.VIDEOEXPOSE:
+            needs_redraw = True
+
         elif event.type == pygame.MOUSEBUTTONDOWN:
             current_line_start = event.pos
+            needs_redraw = True
+
+        elif event.type == pygame.MOUSEMOTION:
+            if current_line_start:
+                needs_redraw = True
 
         elif event.type == pygame.MOUSEBUTTONUP:
             if current_line_start:
-                lines.append((current_line_start, event.pos))
+                line = (current_line_start, event.pos)
+                lines.append(line)
+                # Only the new line needs clipping and drawing
+                clipped_lines.extend(clip_all([line], clip_window))
+                draw_line_pair(line_layer, *line, clipped_lines[-1])
                 current_line_start = None
+                needs_redraw = True
 
         elif event.type == pygame.KEYDOWN:
             if event.key == pygame.K_c:
                 lines.clear()
+                clipped_lines.clear()
+                line_layer = build_line_layer()
+                needs_redraw = True
             elif event.key == pygame.K_r:
                 clip_rect = pygame.Rect(200, 150, 400, 300)
+                clip_window = ClipWindow.from_rect(clip_rect)
+                clipped_lines = clip_all(lines, clip_window)
+                window_layer = build_window_layer()
+                line_layer = build_line_layer()
+                needs_redraw = True
 
-    # Draw current line being created
-    if current_line_start:
-        mouse_pos = pygame.mouse.get_pos()
-        pygame.draw.line(screen, GRAY, current_line_start, mouse_pos, 2)
-
-    # Draw all lines and their clipped versions
-    for start, end in lines:
-        # Draw original line in red (thin)
-        pygame.draw.line(screen, RED, start, end, 1)
-
-        # Draw clipped line in green (thick)
-        clipped = cohen_sutherland_clip(
-            start[0], start[1], end[0], end[1], clip_rect
-        )
+    # Compose and present the frame only when something on it changed
+    if needs_redraw:
+        screen.blit(window_layer, (0, 0))
 
-        if clipped:
-            x1, y1, x2, y2 = clipped
-            pygame.draw.line(screen, GREEN, (x1, y1), (x2, y2), 3)
+        # Draw current line being created, below the stored lines
+        if current_line_start:
+            mouse_pos = pygame.mouse.get_pos()
+            pygame.draw.line(screen, GRAY, current_line_start, mouse_pos, 2)
 
-            # Draw clipping points
-            pygame.draw.circle(screen, YELLOW, (int(x1), int(y1)), 5)
-            pygame.draw.circle(screen, YELLOW, (int(x2), int(y2)), 5)
-
-    # Draw instructions
-    draw_instructions()
-
-    # Draw legend
-    legend_y = HEIGHT - 80
-    pygame.draw.line(screen, RED, (10, legend_y), (40, legend_y), 1)
-    screen.blit(font.render("= Original Line", True, BLACK), (50, legend_y - 10))
+        screen.blit(line_layer, (0, 0))
 
-    pygame.draw.line(screen, GREEN, (10, legend_y + 30), (40, legend_y + 30), 3)
-    screen.blit(font.render("= Clipped Line", True, BLACK), (50, legend_y + 20))
+        # Draw instructions and legend
+        screen.blit(overlay, (0, 0))
 
-    pygame.display.flip()
+        pygame.display.flip()
+        needs_redraw = False
     clock.tick(60)
 
 pygame.quit()
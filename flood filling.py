@@ -1,6 +1,14 @@
 import pygame
 import sys
 import math
+import time
+from array import array
+import tempfile
+import atexit
+from collections import namedtuple, OrderedDict
+import numpy as np
+from multiprocessing import Pool, shared_memory
+from undo_history import SpanRecorder, UndoHistory, stroke_bounds
 
 # --- Configuration ---
 SCREEN_WIDTH, SCREEN_HEIGHT = 800, 700
@@ -15,57 +23,209 @@ COLORS = [
     (255, 165, 0), (165, 42, 42), (128, 128, 128), (211, 211, 211)
 ]
 ANIMATION_BATCH_SIZE = 500  # Pixels per frame during fill animation
+TOLERANCE_STEP = 8  # Tolerance change per '[' / ']' key press
+FILL_STYLES = ['solid', 'linear', 'radial', 'pattern']  # Cycled with the 'G' key
+PARALLEL_TILE_SIZE = 512  # Tile edge length for the parallel fill engine
+CANVAS_TILE_SIZE = 256  # Tile edge length of the memory-mapped tiled canvas
+TILE_CACHE_SIZE = 256  # Tiles kept mapped at once (256 KiB each)
+TILED_CANVAS_SIZE = (50000, 50000)  # Canvas size used by the '--tiled' viewer
+PAN_STEP = 200  # Pixels the tiled viewport moves per arrow key press
+
+
+# --- Fill Statistics ---
+
+FillResult = namedtuple('FillResult', ['pixel_count', 'bbox', 'span_count', 'perimeter', 'elapsed'])
+FillResult.__doc__ = """
+Summary of a finished fill: pixels filled, bounding Rect, number of horizontal spans,
+perimeter in pixel edges (4-connected) and elapsed seconds.
+"""
+
+
+class FillStats:
+    """
+    Accumulates a FillResult span by span (or pixel by pixel) while a fill runs, so no second
+    pass is needed. Spans and perimeter follow from counting adjacencies between filled pixels,
+    which are marked in one byte row per canvas row the fill reaches, allocated when first reached.
+    Every pixel must be added at most once.
+    """
+
+    def __init__(self, width, height):
+        self.width, self.height = width, height
+        self.rows = {}  # Canvas row -> bytearray marking the filled pixels of that row
+        self.count = self.h_adjacent = self.v_adjacent = 0
+        self.min_x = self.min_y = self.max_x = self.max_y = None
+        self.start = time.perf_counter()
+
+    def add(self, x, y):
+        """Counts pixel (x, y) as filled."""
+        self.add_span(y, x, x)
+
+    def add_span(self, y, x0, x1):
+        """Counts pixels x0..x1 (inclusive) of row y as filled."""
+        rows = self.rows
+        row = rows.get(y)
+        if row is None:
+            row = rows[y] = bytearray(self.width)
+        self.h_adjacent += x1 - x0
+        if x0 > 0:
+            self.h_adjacent += row[x0 - 1]
+        if x1 + 1 < self.width:
+            self.h_adjacent += row[x1 + 1]
+        above, below = rows.get(y - 1), rows.get(y + 1)
+        if above is not None:
+            self.v_adjacent += above.count(1, x0, x1 + 1)
+        if below is not None:
+            self.v_adjacent += below.count(1, x0, x1 + 1)
+        row[x0:x1 + 1] = b'\x01' * (x1 - x0 + 1)
+
+        if self.count == 0:
+            self.min_x, self.max_x = x0, x1
+            self.min_y = self.max_y = y
+        else:
+            self.min_x, self.max_x = min(self.min_x, x0), max(self.max_x, x1)
+            self.min_y, self.max_y = min(self.min_y, y), max(self.max_y, y)
+        self.count += x1 - x0 + 1
+
+    def result(self):
+        """Returns the FillResult for the pixels counted so far."""
+        bbox = None
+        if self.count:
+            bbox = pygame.Rect(self.min_x, self.min_y, self.max_x - self.min_x + 1, self.max_y - self.min_y + 1)
+        return FillResult(self.count, bbox, self.count - self.h_adjacent,
+                          4 * self.count - 2 * (self.h_adjacent + self.v_adjacent), time.perf_counter() - self.start)
+
+
+# --- Color Distance ---
+
+def _rgb_to_lab(rgb):
+    """Converts an (..., 3) array of sRGB values in 0-255 to CIE Lab (D65)."""
+    c = rgb / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = c @ np.array([[0.4124, 0.2126, 0.0193],
+                        [0.3576, 0.7152, 0.1192],
+                        [0.1805, 0.0722, 0.9505]], dtype=np.float32)
+    xyz /= np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16 / 116)
+    return np.stack((116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])), axis=-1)
+
+
+def color_distance_mask(screen, seed_color, tolerance, color_space='rgb'):
+    """
+    Returns a flat row-major bytearray holding 1 for every pixel within 'tolerance' of 'seed_color'.
+    Distances are Euclidean in RGB (0-441) or, with color_space='lab', CIE76 delta E.
+    Computed once per fill so the traversal only does a byte lookup per pixel.
+    """
+    rgb = pygame.surfarray.array3d(screen).transpose(1, 0, 2).astype(np.float32)
+    seed = np.array(seed_color[:3], dtype=np.float32)
+    if color_space == 'lab':
+        rgb, seed = _rgb_to_lab(rgb), _rgb_to_lab(seed)
+    dist2 = np.square(rgb - seed).sum(axis=2)
+    return bytearray((dist2 <= tolerance * tolerance).tobytes())
 
 
 # --- Core Algorithms (Generators for Animation) ---
 
-def boundary_fill_iterative(screen, x, y, fill_color, boundary_color, connectivity=4):
+def boundary_fill_iterative(screen, x, y, fill_color, boundary_color, connectivity=4, recorder=None,
+                            on_complete=None):
     """
     Performs an iterative boundary fill using a stack.
-    Yields control to the main loop to create an animation effect.
+    Boundary and already-filled pixels are found once with a packed-color comparison over
+    the canvas, and pixels are closed in that mask when pushed, so each enters the stack once.
+    Yields the rectangle changed by each batch of pixels to the main loop,
+    which redraws only that area to create an animation effect.
+    Overwritten pixels are reported to 'recorder' (a SpanRecorder) for undo.
+    Returns a FillResult (the generator's StopIteration.value), also passed to 'on_complete'.
     """
-    stack = [(x, y)]
-    pixels_processed = 0
-
-    try:
-        initial_color = screen.get_at((x, y))
-        if initial_color == boundary_color or initial_color == fill_color:
-            print("Seed point is on boundary or already filled.")
-            return
-    except IndexError:
+    width, height = CANVAS_WIDTH, CANVAS_HEIGHT
+    if not (0 <= x < width and 0 <= y < height):
         print("Seed point is outside the canvas.")
         return
 
+    # Closed mask: one byte per pixel in row-major order, set for blocked and already pushed pixels
+    packed = pygame.surfarray.array2d(screen)[:width, :height]
+    blocked = (packed == screen.map_rgb(boundary_color)) | (packed == screen.map_rgb(fill_color))
+    closed = bytearray(blocked.T.tobytes())
+    del packed, blocked
+
+    if closed[y * width + x]:
+        print("Seed point is on boundary or already filled.")
+        return
+
+    closed[y * width + x] = 1
+    stack = [y * width + x]
+    batch = array('i')
+    stats = FillStats(width, height)
+
     while stack:
-        px, py = stack.pop()
+        idx = stack.pop()
+        py, px = divmod(idx, width)
+        batch.append(idx)
+        stats.add(px, py)
 
-        if not (0 <= px < CANVAS_WIDTH and 0 <= py < CANVAS_HEIGHT):
-            continue
+        if len(batch) == ANIMATION_BATCH_SIZE:
+            yield write_pixel_batch(screen, batch, fill_color, recorder)
+            batch = array('i')
 
-        if screen.get_at((px, py)) != boundary_color and screen.get_at((px, py)) != fill_color:
-            screen.set_at((px, py), fill_color)
-            pixels_processed += 1
+        right, left = px + 1 < width, px > 0
+        down, up = py + 1 < height, py > 0
+        neighbors = []
+        if right:
+            neighbors.append(idx + 1)
+        if left:
+            neighbors.append(idx - 1)
+        if down:
+            neighbors.append(idx + width)
+        if up:
+            neighbors.append(idx - width)
 
-            if pixels_processed % ANIMATION_BATCH_SIZE == 0:
-                yield
+        if connectivity == 8:
+            if right and down:
+                neighbors.append(idx + width + 1)
+            if left and down:
+                neighbors.append(idx + width - 1)
+            if right and up:
+                neighbors.append(idx - width + 1)
+            if left and up:
+                neighbors.append(idx - width - 1)
 
-            stack.append((px + 1, py))
-            stack.append((px - 1, py))
-            stack.append((px, py + 1))
-            stack.append((px, py - 1))
+        for n in neighbors:
+            if not closed[n]:
+                closed[n] = 1
+                stack.append(n)
+    yield write_pixel_batch(screen, batch, fill_color, recorder)
 
-            if connectivity == 8:
-                stack.append((px + 1, py + 1))
-                stack.append((px - 1, py + 1))
-                stack.append((px + 1, py - 1))
-                stack.append((px - 1, py - 1))
-    yield
+    result = stats.result()
+    if on_complete is not None:
+        on_complete(result)
+    return result
 
 
-def flood_fill_iterative(screen, x, y, fill_color, connectivity=4):
+def write_pixel_batch(screen, batch, color, recorder=None):
+    """
+    Sets every flat row-major canvas index in 'batch' to 'color' with a single masked
+    assignment and returns the Rect that changed (None for an empty batch).
+    """
+    if not batch:
+        return None
+    ys, xs = np.divmod(np.frombuffer(batch, dtype=np.int32), CANVAS_WIDTH)
+    pixels = pygame.surfarray.pixels2d(screen)
+    if recorder is not None:
+        recorder.add_many(xs, ys, pixels[xs, ys])
+    pixels[xs, ys] = screen.map_rgb(color)
+    del pixels
+    x0, y0 = int(xs.min()), int(ys.min())
+    return pygame.Rect(x0, y0, int(xs.max()) - x0 + 1, int(ys.max()) - y0 + 1)
+
+
+def flood_fill_iterative(screen, x, y, fill_color, connectivity=4, recorder=None, tolerance=0, color_space='rgb',
+                         on_complete=None):
     """
     Performs an iterative flood fill using a stack.
-    Replaces a target color with the fill color. Yields for animation.
+    Replaces a target color with the fill color. Yields changed rectangles for animation.
+    Overwritten pixels are reported to 'recorder' (a SpanRecorder) for undo.
+    With a 'tolerance' > 0, every pixel within that color distance of the seed (see
+    color_distance_mask) is replaced, which lets fills cover antialiased edges.
+    Returns a FillResult (the generator's StopIteration.value), also passed to 'on_complete'.
     """
     try:
         target_color = screen.get_at((x, y))
@@ -73,12 +233,17 @@ def flood_fill_iterative(screen, x, y, fill_color, connectivity=4):
         print("Seed point is outside the canvas.")
         return
 
-    if target_color == fill_color:
+    if target_color == fill_color and not tolerance:
         print("Target area is already the fill color.")
         return
 
+    # In tolerance mode the precomputed mask doubles as the visited map
+    mask = color_distance_mask(screen, target_color, tolerance, color_space) if tolerance else None
+
     stack = [(x, y)]
     pixels_processed = 0
+    dirty = pygame.Rect(x, y, 1, 1)
+    stats = FillStats(CANVAS_WIDTH, CANVAS_HEIGHT)
 
     while stack:
         px, py = stack.pop()
@@ -86,12 +251,24 @@ def flood_fill_iterative(screen, x, y, fill_color, connectivity=4):
         if not (0 <= px < CANVAS_WIDTH and 0 <= py < CANVAS_HEIGHT):
             continue
 
-        if screen.get_at((px, py)) == target_color:
+        if mask is not None:
+            idx = py * CANVAS_WIDTH + px
+            matches = mask[idx]
+            mask[idx] = 0
+        else:
+            matches = screen.get_at((px, py)) == target_color
+
+        if matches:
+            if recorder is not None:
+                recorder.add(px, py, screen.get_at_mapped((px, py)))
             screen.set_at((px, py), fill_color)
             pixels_processed += 1
+            dirty.union_ip((px, py, 1, 1))
+            stats.add(px, py)
 
             if pixels_processed % ANIMATION_BATCH_SIZE == 0:
-                yield
+                yield dirty
+                dirty = pygame.Rect(px, py, 1, 1)
 
             stack.append((px + 1, py))
             stack.append((px - 1, py))
@@ -103,7 +280,750 @@ def flood_fill_iterative(screen, x, y, fill_color, connectivity=4):
                 stack.append((px - 1, py + 1))
                 stack.append((px + 1, py - 1))
                 stack.append((px - 1, py - 1))
-    yield
+    yield dirty
+
+    result = stats.result()
+    if on_complete is not None:
+        on_complete(result)
+    return result
+
+
+# --- Region Spans and Shaders ---
+
+def fill_region_spans(screen, x, y, connectivity=4, boundary_color=None, fill_color=None, tolerance=0,
+                      color_space='rgb'):
+    """
+    Finds the region a flood fill from (x, y) would cover without touching the canvas.
+    With 'boundary_color' the region extends up to that color instead, stopping at pixels
+    already painted 'fill_color' too, like boundary_fill_iterative.
+    Returns an (N, 3) int32 array of (row, x0, x1) spans with inclusive ends, or None.
+    """
+    width, height = screen.get_size()
+    if not (0 <= x < width and 0 <= y < height):
+        print("Seed point is outside the canvas.")
+        return None
+
+    if boundary_color is not None:
+        packed = pygame.surfarray.array2d(screen).T
+        blocked = packed == screen.map_rgb(boundary_color)
+        if fill_color is not None:
+            blocked |= packed == screen.map_rgb(fill_color)
+        mask = bytearray((~blocked).tobytes())
+    elif tolerance:
+        mask = color_distance_mask(screen, screen.get_at((x, y)), tolerance, color_space)
+    else:
+        packed = pygame.surfarray.array2d(screen).T
+        mask = bytearray((packed == packed[y, x]).tobytes())
+
+    if not mask[y * width + x]:
+        print("Seed point is on boundary or already filled.")
+        return None
+
+    return np.array(_trace_spans(mask, width, height, y * width + x, connectivity), dtype=np.int32).reshape(-1, 3)
+
+
+def _trace_spans(mask, width, height, seed, connectivity=4):
+    """
+    Collects the (row, x0, x1) spans of the region of a flat row-major byte mask connected
+    to index 'seed'. Traced pixels are cleared, so the mask doubles as the visited map.
+    """
+    reach = 1 if connectivity == 8 else 0
+    spans = []
+    stack = [seed]
+
+    while stack:
+        idx = stack.pop()
+        if not mask[idx]:
+            continue
+        py = idx // width
+        row = py * width
+
+        left = mask.rfind(0, row, idx) + 1
+        if left == 0:
+            left = row
+        right = mask.find(0, idx, row + width)
+        if right == -1:
+            right = row + width
+        mask[left:right] = bytes(right - left)
+        spans.append((py, left - row, right - row - 1))
+
+        for ny in (py - 1, py + 1):
+            if not 0 <= ny < height:
+                continue
+            pos = ny * width + max(left - row - reach, 0)
+            end = ny * width + min(right - row + reach, width)
+            while pos < end:
+                pos = mask.find(1, pos, end)
+                if pos == -1:
+                    break
+                stack.append(pos)
+                pos = mask.find(0, pos, end)
+                if pos == -1:
+                    break
+    return spans
+
+
+def linear_gradient(start, end, color0, color1):
+    """Returns a shader blending color0 at 'start' into color1 at 'end'."""
+    (sx, sy), (ex, ey) = start, end
+    dx, dy = ex - sx, ey - sy
+    length2 = float(dx * dx + dy * dy) or 1.0
+    c0, c1 = np.array(color0[:3], dtype=np.float64), np.array(color1[:3], dtype=np.float64)
+
+    def shade(xs, ys):
+        t = np.clip(((xs - sx) * dx + (ys - sy) * dy) / length2, 0.0, 1.0)
+        return (c0 + t[:, None] * (c1 - c0) + 0.5).astype(np.uint8)
+    return shade
+
+
+def radial_gradient(center, radius, color0, color1):
+    """Returns a shader blending color0 at 'center' into color1 at 'radius' and beyond."""
+    cx, cy = center
+    radius = float(radius) or 1.0
+    c0, c1 = np.array(color0[:3], dtype=np.float64), np.array(color1[:3], dtype=np.float64)
+
+    def shade(xs, ys):
+        t = np.clip(np.hypot(xs - cx, ys - cy) / radius, 0.0, 1.0)
+        return (c0 + t[:, None] * (c1 - c0) + 0.5).astype(np.uint8)
+    return shade
+
+
+def pattern_shader(pattern, origin=(0, 0)):
+    """Returns a shader tiling an (h, w, 3) uint8 bitmap across the canvas from 'origin'."""
+    pattern = np.asarray(pattern, dtype=np.uint8)
+    ph, pw = pattern.shape[:2]
+    ox, oy = origin
+
+    def shade(xs, ys):
+        return pattern[(ys - oy) % ph, (xs - ox) % pw]
+    return shade
+
+
+def make_hatch_pattern(color, background, size=8):
+    """Builds a size x size bitmap of diagonal 'color' stripes over 'background'."""
+    stripes = np.add.outer(np.arange(size), np.arange(size)) % size < max(size // 4, 1)
+    return np.where(stripes[..., None], color[:3], background[:3]).astype(np.uint8)
+
+
+def region_shader(style, seed, color, background=BG_COLOR):
+    """
+    Builds the shader for one of FILL_STYLES. Gradients are sized to the bounding box of the
+    pixels they shade, so redoing a fill with the same shader reproduces it exactly.
+    """
+    if style == 'pattern':
+        return pattern_shader(make_hatch_pattern(color, background))
+
+    def shade(xs, ys):
+        x0, x1, y0, y1 = int(xs.min()), int(xs.max()), int(ys.min()), int(ys.max())
+        if style == 'linear':
+            return linear_gradient((x0, y0), (x1, y0), color, background)(xs, ys)
+        sx, sy = seed
+        radius = max(math.hypot(cx - sx, cy - sy) for cx in (x0, x1) for cy in (y0, y1))
+        return radial_gradient(seed, radius, color, background)(xs, ys)
+    return shade
+
+
+def _expand_spans(spans):
+    """Returns the x and y coordinates of every pixel covered by (row, x0, x1) spans."""
+    lengths = spans[:, 2] - spans[:, 1] + 1
+    offsets = np.cumsum(lengths) - lengths
+    ys = np.repeat(spans[:, 0], lengths)
+    xs = np.arange(lengths.sum()) + np.repeat(spans[:, 1] - offsets, lengths)
+    return xs, ys
+
+
+def shade_spans(screen, spans, shader, recorder=None):
+    """
+    Colors every pixel of the (row, x0, x1) spans with shader(xs, ys), evaluated over
+    all span pixels at once and written in bulk. Overwritten pixels go to 'recorder'.
+    Returns the bounding Rect of the spans, or None if there are none.
+    """
+    if not len(spans):
+        return None
+    spans = np.asarray(spans, dtype=np.int64)
+    xs, ys = _expand_spans(spans)
+    colors = shader(xs, ys)
+
+    if recorder is not None:
+        packed = pygame.surfarray.pixels2d(screen)
+        recorder.add_many(xs, ys, packed[xs, ys])
+        del packed
+    pixels = pygame.surfarray.pixels3d(screen)
+    pixels[xs, ys] = colors
+    del pixels
+
+    x0, y0 = int(spans[:, 1].min()), int(spans[:, 0].min())
+    return pygame.Rect(x0, y0, int(spans[:, 2].max()) - x0 + 1, int(spans[:, 0].max()) - y0 + 1)
+
+
+def styled_fill(screen, x, y, shader, connectivity=4, boundary_color=None, fill_color=None, tolerance=0,
+                color_space='rgb', recorder=None, on_complete=None):
+    """
+    Fills the region fill_region_spans finds around (x, y) with shader(xs, ys), shading all
+    of its spans in one bulk write. Overwritten pixels are reported to 'recorder' for undo.
+    A generator like the other fills: yields the changed Rect once and returns a FillResult
+    (the generator's StopIteration.value), also passed to 'on_complete'.
+    """
+    stats = FillStats(*screen.get_size())
+    spans = fill_region_spans(screen, x, y, connectivity, boundary_color, fill_color, tolerance, color_space)
+    if spans is None:
+        return
+    yield shade_spans(screen, spans, shader, recorder)
+
+    for row, x0, x1 in spans.tolist():
+        stats.add_span(row, x0, x1)
+    result = stats.result()
+    if on_complete is not None:
+        on_complete(result)
+    return result
+
+
+# --- Multi-Seed Batch Fill ---
+
+def batch_flood_fill(screen, seeds, colors, connectivity=4):
+    """
+    Flood fills many seeds in one traversal, each region with the color paired with its seed.
+    The canvas is read once and cut into horizontal runs of equal color, and runs of the same
+    color touching across rows are linked (see _color_runs). A single label array over the runs
+    doubles as the visited map: a seed on an unlabeled run labels its whole region, and a seed
+    landing in a region already claimed by an earlier seed is deduplicated by one lookup.
+    Regions are taken from the canvas as it was before the call, and all of them are written in
+    one bulk assignment at the end.
+    Returns (labels, results): labels[i] is the index of the seed whose region seed i fell in
+    (-1 if outside the canvas) and results[i] is a FillResult for seeds that started a region.
+    """
+    width, height = screen.get_size()
+    seeds = np.asarray(seeds, dtype=np.int64).reshape(-1, 2)
+    values = np.ascontiguousarray(pygame.surfarray.array2d(screen).T)
+    runs, run_ids, starts, neighbors = _color_runs(values, connectivity)
+
+    labels = np.full(len(seeds), -1, dtype=np.int32)
+    results = [None] * len(seeds)
+    owners = array('i', [-1]) * len(runs)  # Seed that claimed each run, -1 while unvisited
+    inside = (seeds[:, 0] >= 0) & (seeds[:, 0] < width) & (seeds[:, 1] >= 0) & (seeds[:, 1] < height)
+
+    for i in np.flatnonzero(inside).tolist():
+        run = int(run_ids[seeds[i, 1], seeds[i, 0]])
+        if owners[run] >= 0:
+            labels[i] = owners[run]
+            continue
+
+        stats = FillStats(width, height)
+        owners[run] = labels[i] = i
+        region, stack = [run], [run]
+        while stack:
+            r = stack.pop()
+            for n in neighbors[starts[r]:starts[r + 1]].tolist():
+                if owners[n] < 0:
+                    owners[n] = i
+                    region.append(n)
+                    stack.append(n)
+        for row, x0, x1 in runs[region].tolist():
+            stats.add_span(row, x0, x1)
+        results[i] = stats.result()
+
+    owners = np.frombuffer(owners, dtype=np.int32)
+    claimed = np.flatnonzero(owners >= 0)
+    if len(claimed):
+        palette = np.zeros(len(seeds), dtype=np.uint32)
+        for i in np.flatnonzero(labels == np.arange(len(seeds))).tolist():
+            palette[i] = screen.map_rgb(colors[i])
+        spans = runs[claimed]
+        xs, ys = _expand_spans(spans)
+        pixels = pygame.surfarray.pixels2d(screen)
+        pixels[xs, ys] = np.repeat(palette[owners[claimed]], spans[:, 2] - spans[:, 1] + 1)
+        del pixels
+    return labels, results
+
+
+def _color_runs(values, connectivity=4):
+    """
+    Cuts a (height, width) array of packed colors into maximal horizontal runs of one color.
+    Returns (runs, run_ids, starts, neighbors): runs is an (R, 3) int64 array of (row, x0, x1)
+    spans, run_ids maps every pixel to its run, and the runs of the same color that touch run r
+    in the rows above and below are neighbors[starts[r]:starts[r + 1]].
+    """
+    height, width = values.shape
+    breaks = np.ones(values.shape, dtype=bool)
+    breaks[:, 1:] = values[:, 1:] != values[:, :-1]
+    run_ids = (np.cumsum(breaks, dtype=np.int64) - 1).astype(np.int32).reshape(values.shape)
+    first = np.flatnonzero(breaks)
+    last = np.append(first[1:], values.size) - 1
+    rows = first // width
+    runs = np.column_stack((rows, first - rows * width, last - rows * width))
+
+    # Vertically (and for 8-connectivity diagonally) adjacent pixels of one color link their runs
+    pairs = [(slice(None, -1), slice(None), slice(1, None), slice(None))]
+    if connectivity == 8:
+        pairs += [(slice(None, -1), slice(None, -1), slice(1, None), slice(1, None)),
+                  (slice(None, -1), slice(1, None), slice(1, None), slice(None, -1))]
+    links = []
+    for y0, x0, y1, x1 in pairs:
+        same = values[y0, x0] == values[y1, x1]
+        links.append(np.unique(run_ids[y0, x0][same].astype(np.int64) * len(runs) + run_ids[y1, x1][same]))
+    links = np.unique(np.concatenate(links))
+    upper, lower = np.divmod(links, len(runs))
+
+    sources = np.concatenate((upper, lower))
+    order = np.argsort(sources, kind='stable')
+    neighbors = np.concatenate((lower, upper))[order]
+    starts = np.concatenate(([0], np.cumsum(np.bincount(sources, minlength=len(runs)))))
+    return runs, run_ids, starts, neighbors
+
+
+# --- Tiled Parallel Fill Engine ---
+
+_shared_canvas = None  # Per-worker handle of the shared canvas buffer
+_default_pool = None  # FillPool used by parallel_fill when none is passed
+
+
+def _attach_shared_canvas(shm_name):
+    """Pool initializer: maps the shared canvas buffer into the worker process once."""
+    global _shared_canvas
+    _shared_canvas = shared_memory.SharedMemory(name=shm_name)
+
+
+class FillPool:
+    """
+    A process pool and a shared-memory canvas buffer kept for a whole session, so a parallel
+    fill only pays for its tiles: the workers start and map the buffer once, not per fill.
+    The buffer is reallocated (restarting the pool) only when a larger canvas comes along.
+    Views returned by canvas() must be dropped before close().
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes
+        self.pool = None
+        self.shm = None
+        self.capacity = 0
+
+    def canvas(self, shape):
+        """Returns a (height, width) uint32 view of the shared buffer, growing the buffer if needed."""
+        size = shape[0] * shape[1] * 4
+        if size > self.capacity:
+            self.close()
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.capacity = size
+            self.pool = Pool(self.processes, initializer=_attach_shared_canvas, initargs=(self.shm.name,))
+        return np.ndarray(shape, dtype=np.uint32, buffer=self.shm.buf)
+
+    def close(self):
+        if self.pool is None:
+            return
+        # close() and join() instead of terminate(): workers forked after pygame.init() inherit
+        # SDL's signal handlers and ignore SIGTERM
+        self.pool.close()
+        self.pool.join()
+        self.shm.close()
+        self.shm.unlink()
+        self.pool, self.shm, self.capacity = None, None, 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def default_fill_pool():
+    """Returns the session-wide FillPool, started on first use and shut down at exit."""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = FillPool()
+        atexit.register(_default_pool.close)
+    return _default_pool
+
+
+def _run_starts(mask):
+    """Returns the indices where runs of True begin in a 1D boolean array."""
+    return np.flatnonzero(mask & ~np.concatenate(([False], mask[:-1])))
+
+
+def _fill_tile(task):
+    """Pool worker: fills one tile of the shared canvas with _fill_block."""
+    (x0, y0, x1, y1), shape, seeds, target, fill, boundary, connectivity = task
+    pixels = np.ndarray(shape, dtype=np.uint32, buffer=_shared_canvas.buf)
+    height, width = shape
+    return _fill_block(pixels[y0:y1, x0:x1], x0, y0, width, height, seeds, target, fill, boundary, connectivity)
+
+
+def _fill_block(block, x0, y0, width, height, seeds, target, fill, boundary, connectivity):
+    """
+    Scan-line fills one tile from its (x, y) canvas seeds, writing into 'block', the tile's
+    view of a width x height canvas whose top-left corner is (x0, y0). Never reads or writes
+    outside the tile; neighbours across the tile border are returned as (y, x_start, x_end)
+    spans for the next exchange round. Returns (pixels filled, outgoing spans).
+    """
+    x1, y1 = x0 + block.shape[1], y0 + block.shape[0]
+    if boundary is None:
+        mask = block == target
+    else:
+        mask = (block != boundary) & (block != fill)
+
+    # Flat byte mask so span searches run as C-level find/rfind calls
+    fillable = bytearray(mask.tobytes())
+    tile_w, tile_h = x1 - x0, y1 - y0
+    reach = 1 if connectivity == 8 else 0
+    stack = [(sy - y0) * tile_w + (sx - x0) for sx, sy in seeds]
+    outgoing = []
+
+    while stack:
+        idx = stack.pop()
+        if not fillable[idx]:
+            continue
+        ly = idx // tile_w
+        row = ly * tile_w
+
+        # Extend the seed to a full span within the tile
+        left = fillable.rfind(0, row, idx) + 1
+        if left == 0:
+            left = row
+        right = fillable.find(0, idx, row + tile_w)
+        if right == -1:
+            right = row + tile_w
+        fillable[left:right] = bytes(right - left)
+        left, right = left - row, right - row
+
+        gy = y0 + ly
+        if left == 0 and x0 > 0:
+            outgoing.append((gy, x0 - 1, x0))
+        if right == tile_w and x1 < width:
+            outgoing.append((gy, x1, x1 + 1))
+
+        lo, hi = left - reach, right + reach
+        for ny in (ly - 1, ly + 1):
+            if not 0 <= y0 + ny < height:
+                continue
+            if 0 <= ny < tile_h:
+                pos, end = ny * tile_w + max(lo, 0), ny * tile_w + min(hi, tile_w)
+                while pos < end:
+                    pos = fillable.find(1, pos, end)
+                    if pos == -1:
+                        break
+                    stack.append(pos)
+                    pos = fillable.find(0, pos, end)
+                    if pos == -1:
+                        break
+                # Diagonal neighbours that fall in the tiles to the left or right
+                if lo < 0 and x0 > 0:
+                    outgoing.append((y0 + ny, x0 - 1, x0))
+                if hi > tile_w and x1 < width:
+                    outgoing.append((y0 + ny, x1, x1 + 1))
+            else:
+                outgoing.append((y0 + ny, max(x0 + lo, 0), min(x0 + hi, width)))
+
+    # Everything that was fillable and has been consumed belongs to the region
+    filled_mask = mask & ~np.frombuffer(fillable, dtype=bool).reshape(mask.shape)
+    block[filled_mask] = fill
+    return int(np.count_nonzero(filled_mask)), outgoing
+
+
+def parallel_fill(pixels, x, y, fill_value, connectivity=4, boundary_value=None,
+                  tile_size=PARALLEL_TILE_SIZE, pool=None):
+    """
+    Fills the region around (x, y) of a packed-color canvas using a pool of processes.
+    'pixels' is a (height, width) uint32 array of mapped colors and is updated in place.
+    Follows flood_fill_iterative semantics, or boundary_fill_iterative when 'boundary_value'
+    is given. The canvas is split into tiles that are filled independently over shared memory;
+    seeds crossing tile borders are exchanged in rounds until none remain, so the result is
+    identical to the sequential fill. 'pool' is the FillPool to run on (default_fill_pool() if
+    omitted); a canvas kept in its shared buffer (see FillPool.canvas) is filled without copies.
+    Returns the number of pixels filled.
+    """
+    height, width = pixels.shape
+    if not (0 <= x < width and 0 <= y < height):
+        print("Seed point is outside the canvas.")
+        return 0
+
+    target = int(pixels[y, x])
+    if boundary_value is None:
+        if target == fill_value:
+            print("Target area is already the fill color.")
+            return 0
+    elif target == boundary_value or target == fill_value:
+        print("Seed point is on boundary or already filled.")
+        return 0
+
+    pool = pool or default_fill_pool()
+    shared = pool.canvas(pixels.shape)
+    in_place = shared.ctypes.data == pixels.ctypes.data and pixels.flags.c_contiguous
+    if not in_place:
+        shared[:] = pixels
+    filled = 0
+    seeds = [(x, y)]
+
+    while seeds:
+        tiles = {}
+        for sx, sy in seeds:
+            tiles.setdefault((sx // tile_size, sy // tile_size), []).append((sx, sy))
+
+        tasks = []
+        for (tx, ty), tile_seeds in tiles.items():
+            x0, y0 = tx * tile_size, ty * tile_size
+            bounds = (x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height))
+            tasks.append((bounds, pixels.shape, tile_seeds, target, fill_value, boundary_value, connectivity))
+
+        # Turn border spans into seeds, keeping only pixels that are still fillable
+        seeds = []
+        for tile_filled, outgoing in pool.pool.imap_unordered(_fill_tile, tasks):
+            filled += tile_filled
+            for sy, sx0, sx1 in outgoing:
+                span = shared[sy, sx0:sx1]
+                if boundary_value is None:
+                    mask = span == target
+                else:
+                    mask = (span != boundary_value) & (span != fill_value)
+                seeds.extend((sx0 + int(s), sy) for s in _run_starts(mask))
+        seeds = list(set(seeds))
+
+    if not in_place:
+        pixels[:] = shared
+    del shared
+    return filled
+
+
+def parallel_fill_surface(screen, x, y, fill_color, connectivity=4, boundary_color=None, pool=None, **kwargs):
+    """Runs parallel_fill on a pygame Surface, copying it straight into the pool's shared buffer and back."""
+    pool = pool or default_fill_pool()
+    width, height = screen.get_size()
+    pixels = pool.canvas((height, width))
+    pixels[:] = pygame.surfarray.pixels2d(screen).T
+    boundary_value = None if boundary_color is None else screen.map_rgb(boundary_color)
+    filled = parallel_fill(pixels, x, y, screen.map_rgb(fill_color), connectivity, boundary_value, pool=pool, **kwargs)
+    pygame.surfarray.blit_array(screen, pixels.T)
+    del pixels
+    return filled
+
+
+# --- Tiled Canvas Backing Store ---
+
+class TiledCanvas:
+    """
+    A packed-color canvas of any size, stored as square uint32 tiles in a memory-mapped file.
+    Only the most recently used 'cache_tiles' tiles stay mapped. A tile gets a slot in the
+    file the first time a pixel of it is written; until then it holds a single value (the
+    background at first, changed as a whole by fill_tile) and reads as a shared constant
+    tile, so a blank 50k x 50k canvas costs nothing on disk.
+    """
+
+    def __init__(self, width, height, background=0, path=None, tile_size=CANVAS_TILE_SIZE,
+                 cache_tiles=TILE_CACHE_SIZE):
+        self.width, self.height = width, height
+        self.tile_size = tile_size
+        self.tiles_x, self.tiles_y = -(-width // tile_size), -(-height // tile_size)
+        self.background = background
+        self.cache_tiles = cache_tiles
+        self.file = tempfile.TemporaryFile() if path is None else open(path, 'w+b')
+        self.slots = np.full((self.tiles_y, self.tiles_x), -1, dtype=np.int64)  # -1 = never written
+        self.uniform = np.full((self.tiles_y, self.tiles_x), background, dtype=np.uint32)  # Value of unwritten tiles
+        self.slot_count = 0
+        self.resident = OrderedDict()  # (tx, ty) -> mapped tile, least recently used first
+        self.constants = {}  # Value -> read-only tile filled with it
+
+    def constant(self, value):
+        """Returns the shared read-only tile holding only 'value'."""
+        tile = self.constants.get(value)
+        if tile is None:
+            tile = self.constants[value] = np.full((self.tile_size, self.tile_size), value, dtype=np.uint32)
+            tile.flags.writeable = False
+        return tile
+
+    def is_uniform(self, tx, ty):
+        """True while tile (tx, ty) has no slot and holds the single value uniform[ty, tx]."""
+        return self.slots[ty, tx] < 0
+
+    def fill_tile(self, tx, ty, value):
+        """Sets every pixel of tile (tx, ty) to 'value' without giving an unwritten tile a slot."""
+        if self.is_uniform(tx, ty):
+            self.uniform[ty, tx] = value
+        else:
+            self.tile(tx, ty)[:] = value
+
+    def tile(self, tx, ty, create=False):
+        """
+        Returns tile (tx, ty) as a (tile_size, tile_size) array indexed [row, column].
+        Tiles that were never written come back as a read-only constant tile unless
+        'create' is set, in which case a slot is allocated for them.
+        """
+        key = (tx, ty)
+        tile = self.resident.get(key)
+        if tile is not None:
+            self.resident.move_to_end(key)
+            return tile
+
+        tile_bytes = self.tile_size * self.tile_size * 4
+        slot = int(self.slots[ty, tx])
+        if slot < 0:
+            if not create:
+                return self.constant(int(self.uniform[ty, tx]))
+            slot = self.slots[ty, tx] = self.slot_count
+            self.slot_count += 1
+            self.file.truncate((slot + 1) * tile_bytes)
+            tile = np.memmap(self.file, dtype=np.uint32, mode='r+', offset=slot * tile_bytes,
+                             shape=(self.tile_size, self.tile_size))
+            tile[:] = self.uniform[ty, tx]
+        else:
+            tile = np.memmap(self.file, dtype=np.uint32, mode='r+', offset=slot * tile_bytes,
+                             shape=(self.tile_size, self.tile_size))
+
+        self.resident[key] = tile
+        if len(self.resident) > self.cache_tiles:
+            self.resident.popitem(last=False)[1].flush()
+        return tile
+
+    def get_pixel(self, x, y):
+        ts = self.tile_size
+        return int(self.tile(x // ts, y // ts)[y % ts, x % ts])
+
+    def read_rect(self, x, y, w, h):
+        """Returns the w x h area at (x, y) as a (h, w) array; parts off the canvas read as background."""
+        out = np.full((h, w), self.background, dtype=np.uint32)
+        ts = self.tile_size
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + w, self.width), min(y + h, self.height)
+        for ty in range(top // ts, -(-bottom // ts)):
+            for tx in range(left // ts, -(-right // ts)):
+                cx0, cy0 = max(left, tx * ts), max(top, ty * ts)
+                cx1, cy1 = min(right, (tx + 1) * ts), min(bottom, (ty + 1) * ts)
+                if self.is_uniform(tx, ty):
+                    out[cy0 - y:cy1 - y, cx0 - x:cx1 - x] = self.uniform[ty, tx]
+                    continue
+                tile = self.tile(tx, ty)
+                out[cy0 - y:cy1 - y, cx0 - x:cx1 - x] = tile[cy0 - ty * ts:cy1 - ty * ts, cx0 - tx * ts:cx1 - tx * ts]
+        return out
+
+    def put_points(self, xs, ys, value):
+        """Sets the pixels at (xs[i], ys[i]) to 'value', touching each tile once. Off-canvas points are dropped."""
+        xs, ys = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+        keep = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        xs, ys = xs[keep], ys[keep]
+        ts = self.tile_size
+        keys = (ys // ts) * self.tiles_x + xs // ts
+        order = np.argsort(keys, kind='stable')
+        xs, ys, keys = xs[order], ys[order], keys[order]
+        uniques, starts = np.unique(keys, return_index=True)
+        for key, start, end in zip(uniques.tolist(), starts.tolist(), starts[1:].tolist() + [len(keys)]):
+            ty, tx = divmod(key, self.tiles_x)
+            self.tile(tx, ty, create=True)[ys[start:end] % ts, xs[start:end] % ts] = value
+
+    def flush(self):
+        for tile in self.resident.values():
+            tile.flush()
+
+    def close(self):
+        self.flush()
+        self.resident.clear()
+        self.file.close()
+
+
+def bresenham_points(start, end):
+    """Returns the x and y coordinates of the Bresenham line from 'start' to 'end', computed in one pass."""
+    (x0, y0), (x1, y1) = start, end
+    dx, dy = abs(x1 - x0), abs(y1 - y0)
+    step_x, step_y = (1 if x1 >= x0 else -1), (1 if y1 >= y0 else -1)
+    major = max(dx, dy)
+    i = np.arange(major + 1, dtype=np.int64)
+    if major == 0:
+        return i + x0, i + y0
+    # Rounding i * minor / major to the nearest integer is exactly the error term Bresenham tracks
+    if dx >= dy:
+        return x0 + step_x * i, y0 + step_y * ((2 * i * dy + dx) // (2 * dx))
+    return x0 + step_x * ((2 * i * dx + dy) // (2 * dy)), y0 + step_y * i
+
+
+def tiled_line(canvas, start, end, value, width=1):
+    """Draws a Bresenham line on a TiledCanvas, 'width' pixels thick across its major axis."""
+    xs, ys = bresenham_points(start, end)
+    offsets = np.arange(width) - width // 2
+    if abs(end[0] - start[0]) >= abs(end[1] - start[1]):
+        xs, ys = np.tile(xs, width), (ys[None, :] + offsets[:, None]).ravel()
+    else:
+        xs, ys = (xs[None, :] + offsets[:, None]).ravel(), np.tile(ys, width)
+    canvas.put_points(xs, ys, value)
+    return pygame.Rect(int(xs.min()), int(ys.min()), int(xs.max() - xs.min()) + 1, int(ys.max() - ys.min()) + 1)
+
+
+def tiled_fill(canvas, x, y, fill_value, connectivity=4, boundary_value=None):
+    """
+    Fills the region around (x, y) of a TiledCanvas one tile at a time, so only the tiles
+    the region reaches are ever mapped. Each tile gets the same scan-line pass as the
+    parallel engine; spans leaving a tile are queued for its neighbour until no tile has
+    work left. A never-written tile holds one value, so it is either untouched or filled
+    whole with fill_tile, without reading or allocating its pixels. Semantics follow
+    parallel_fill. Returns the number of pixels filled.
+    """
+    if not (0 <= x < canvas.width and 0 <= y < canvas.height):
+        print("Seed point is outside the canvas.")
+        return 0
+
+    target = canvas.get_pixel(x, y)
+    if boundary_value is None:
+        if target == fill_value:
+            print("Target area is already the fill color.")
+            return 0
+    elif target == boundary_value or target == fill_value:
+        print("Seed point is on boundary or already filled.")
+        return 0
+
+    ts = canvas.tile_size
+    pending = {(x // ts, y // ts): [(y, x, x + 1)]}  # Tile -> (y, x_start, x_end) spans to seed from
+    filled = 0
+
+    def queue(sy, sx0, sx1):
+        # Spans can straddle a tile column; split them per tile
+        sx0, sx1 = max(sx0, 0), min(sx1, canvas.width)
+        if not 0 <= sy < canvas.height:
+            return
+        while sx0 < sx1:
+            split = min(sx1, (sx0 // ts + 1) * ts)
+            pending.setdefault((sx0 // ts, sy // ts), []).append((sy, sx0, split))
+            sx0 = split
+
+    while pending:
+        (tx, ty), spans = pending.popitem()
+        x0, y0 = tx * ts, ty * ts
+        width, height = min(ts, canvas.width - x0), min(ts, canvas.height - y0)
+
+        if canvas.is_uniform(tx, ty):
+            value = int(canvas.uniform[ty, tx])
+            if boundary_value is None:
+                fillable = value == target
+            else:
+                fillable = value != boundary_value and value != fill_value
+            if not fillable:
+                continue
+            canvas.fill_tile(tx, ty, fill_value)
+            filled += width * height
+            # One span per side reaches a whole unwritten neighbour; a written one needs every edge pixel
+            reach = 1 if connectivity == 8 else 0
+            queue(y0 - 1, x0 - reach, x0 + width + reach)
+            queue(y0 + height, x0 - reach, x0 + width + reach)
+            for nx, side in ((tx - 1, x0 - 1), (tx + 1, x0 + width)):
+                if 0 <= nx < canvas.tiles_x:
+                    rows = [y0] if canvas.is_uniform(nx, ty) else range(y0, y0 + height)
+                    for sy in rows:
+                        queue(sy, side, side + 1)
+            continue
+
+        # Every fillable pixel of the incoming spans seeds the tile; _fill_block skips consumed ones
+        tile = canvas.tile(tx, ty)
+        xs, ys = _expand_spans(np.array(spans, dtype=np.int64) - (0, 0, 1))
+        values = tile[ys - y0, xs - x0]
+        if boundary_value is None:
+            mask = values == target
+        else:
+            mask = (values != boundary_value) & (values != fill_value)
+        if not mask.any():
+            continue
+        seeds = zip(xs[mask].tolist(), ys[mask].tolist())
+
+        block = tile[:height, :width]
+        tile_filled, outgoing = _fill_block(block, x0, y0, canvas.width, canvas.height, seeds, target,
+                                            fill_value, boundary_value, connectivity)
+        filled += tile_filled
+        for sy, sx0, sx1 in outgoing:
+            queue(sy, sx0, sx1)
+    return filled
 
 
 # --- Main Application ---
@@ -122,6 +1042,11 @@ def main():
     boundary_color = COLORS[0]
     fill_color = COLORS[1]
     active_filler = None
+    tolerance = 0
+    fill_style = 'solid'
+    history = UndoHistory(shade=shade_spans)
+    recorder = None  # Collects the changes of the fill or stroke in progress
+    fill_paint = None  # Mapped color or shader written by the fill in progress, kept for redo
 
     font = pygame.font.SysFont('Arial', 14, bold=True)
 
@@ -138,11 +1063,59 @@ def main():
     color_buttons = {color: pygame.Rect(margin + i * (color_swatch_size + 5), CANVAS_HEIGHT + 70, color_swatch_size,
                                         color_swatch_size) for i, color in enumerate(COLORS)}
 
+    # Text surfaces are rendered once and reused whenever the UI panel is redrawn
+    tool_labels = {tool: font.render(tool.replace('_', '-').title(), True, (0, 0, 0)) for tool in tools}
+    clear_label = font.render("Clear", True, (0, 0, 0))
+    info_text = font.render("Left-click to set Boundary | Right-click to set Fill | Ctrl+Z / Ctrl+Y to Undo / Redo",
+                            True, (50, 50, 50))
+    tolerance_label = font.render(f"Flood tolerance: {tolerance}  ([ / ])", True, (50, 50, 50))
+    style_label = font.render(f"Fill style: {fill_style.title()}  (G)", True, (50, 50, 50))
+
+    # --- Dirty-Rectangle State ---
+    canvas_rect = canvas.get_rect()
+    panel_rect = pygame.Rect(0, CANVAS_HEIGHT, SCREEN_WIDTH, UI_HEIGHT)
+    panel_snapshot = None  # Copy of the drawn UI panel, used to repair areas under the preview
+    ui_dirty = True
+    dirty_rects = [canvas_rect]
+    preview_rect = None
+
     running = True
     while running:
-        for event in pygame.event.get():
+        # Sleep until the next event unless there is something left to animate or present
+        if active_filler or dirty_rects or ui_dirty:
+            events = pygame.event.get()
+        else:
+            events = [pygame.event.wait()] + pygame.event.get()
+
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.VIDEOEXPOSE:
+                dirty_rects.append(screen.get_rect())
+
+            # --- Undo / Redo ---
+            elif event.type == pygame.KEYDOWN and event.mod & pygame.KMOD_CTRL:
+                if active_filler is None and not drawing:
+                    changed = None
+                    if event.key == pygame.K_z:
+                        changed = history.undo(canvas)
+                    elif event.key == pygame.K_y:
+                        changed = history.redo(canvas)
+                    if changed:
+                        dirty_rects.append(changed)
+
+            # --- Flood Tolerance ---
+            elif event.type == pygame.KEYDOWN and event.key in (pygame.K_LEFTBRACKET, pygame.K_RIGHTBRACKET):
+                step = TOLERANCE_STEP if event.key == pygame.K_RIGHTBRACKET else -TOLERANCE_STEP
+                tolerance = max(0, min(441, tolerance + step))
+                tolerance_label = font.render(f"Flood tolerance: {tolerance}  ([ / ])", True, (50, 50, 50))
+                ui_dirty = True
+
+            # --- Fill Style ---
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_g:
+                fill_style = FILL_STYLES[(FILL_STYLES.index(fill_style) + 1) % len(FILL_STYLES)]
+                style_label = font.render(f"Fill style: {fill_style.title()}  (G)", True, (50, 50, 50))
+                ui_dirty = True
 
             # --- Mouse Events ---
             if event.type == pygame.MOUSEBUTTONDOWN:
@@ -150,12 +1123,15 @@ def main():
                     # UI clicks
                     clicked_ui = False
                     if clear_button.collidepoint(event.pos):
-                        canvas.fill(BG_COLOR)
+                        recorder = SpanRecorder()
+                        dirty_rects.append(recorder.record_stroke(canvas, canvas_rect, pygame.Surface.fill, BG_COLOR))
+                        history.push(recorder.finish(), canvas.map_rgb(BG_COLOR))
                         clicked_ui = True
 
                     for tool, rect in tool_buttons.items():
                         if rect.collidepoint(event.pos):
                             active_tool = tool
+                            ui_dirty = True
                             clicked_ui = True
                             break
 
@@ -165,18 +1141,33 @@ def main():
                                 boundary_color = color
                             elif event.button == 3:  # Right-click sets fill color
                                 fill_color = color
+                            ui_dirty = True
                             clicked_ui = True
                             break
 
                     # Canvas clicks
                     if not clicked_ui and event.pos[1] < CANVAS_HEIGHT:
                         x, y = event.pos
-                        if 'bound' in active_tool:
+                        recorder = SpanRecorder()
+                        if fill_style != 'solid' and ('bound' in active_tool or 'flood' in active_tool):
+                            # Styled fills find the region first, then shade all of its spans at once
+                            conn = 8 if active_tool.endswith('8') else 4
+                            fill_paint = region_shader(fill_style, (x, y), fill_color)
+                            if 'bound' in active_tool:
+                                active_filler = styled_fill(canvas, x, y, fill_paint, conn, boundary_color,
+                                                            fill_color, recorder=recorder)
+                            else:
+                                active_filler = styled_fill(canvas, x, y, fill_paint, conn, tolerance=tolerance,
+                                                            recorder=recorder)
+                        elif 'bound' in active_tool:
                             conn = 8 if active_tool == 'bound_8' else 4
-                            active_filler = boundary_fill_iterative(canvas, x, y, fill_color, boundary_color, conn)
+                            fill_paint = canvas.map_rgb(fill_color)
+                            active_filler = boundary_fill_iterative(canvas, x, y, fill_color, boundary_color, conn,
+                                                                    recorder)
                         elif 'flood' in active_tool:
                             conn = 8 if active_tool == 'flood_8' else 4
-                            active_filler = flood_fill_iterative(canvas, x, y, fill_color, conn)
+                            fill_paint = canvas.map_rgb(fill_color)
+                            active_filler = flood_fill_iterative(canvas, x, y, fill_color, conn, recorder, tolerance)
                         else:
                             drawing = True
                             start_pos = event.pos
@@ -184,7 +1175,9 @@ def main():
 
             elif event.type == pygame.MOUSEMOTION:
                 if drawing and active_tool == 'pencil' and event.pos[1] < CANVAS_HEIGHT:
-                    pygame.draw.line(canvas, boundary_color, last_pos, event.pos, 2)
+                    area = stroke_bounds((last_pos, event.pos), 2)
+                    dirty_rects.append(recorder.record_stroke(canvas, area, pygame.draw.line, boundary_color, last_pos,
+                                                              event.pos, 2))
                     last_pos = event.pos
 
             elif event.type == pygame.MOUSEBUTTONUP:
@@ -194,56 +1187,79 @@ def main():
                     if end_pos[1] >= CANVAS_HEIGHT: end_pos = (end_pos[0], CANVAS_HEIGHT - 1)
 
                     if active_tool == 'line':
-                        pygame.draw.line(canvas, boundary_color, start_pos, end_pos, 2)
+                        area = stroke_bounds((start_pos, end_pos), 2)
+                        dirty_rects.append(recorder.record_stroke(canvas, area, pygame.draw.line, boundary_color,
+                                                                  start_pos, end_pos, 2))
                     elif active_tool == 'rect':
                         rect = pygame.Rect(start_pos, (end_pos[0] - start_pos[0], end_pos[1] - start_pos[1]))
                         rect.normalize()
-                        pygame.draw.rect(canvas, boundary_color, rect, 2)
+                        area = stroke_bounds((rect.topleft, rect.bottomright), 2)
+                        dirty_rects.append(recorder.record_stroke(canvas, area, pygame.draw.rect, boundary_color,
+                                                                  rect, 2))
                     elif active_tool == 'circle':
                         dx = end_pos[0] - start_pos[0]
                         dy = end_pos[1] - start_pos[1]
                         radius = int(math.sqrt(dx * dx + dy * dy))
                         if radius > 0:
-                            pygame.draw.circle(canvas, boundary_color, start_pos, radius, 2)
+                            cx, cy = start_pos
+                            area = stroke_bounds(((cx - radius, cy - radius), (cx + radius, cy + radius)), 2)
+                            dirty_rects.append(recorder.record_stroke(canvas, area, pygame.draw.circle,
+                                                                      boundary_color, start_pos, radius, 2))
+                    history.push(recorder.finish(), canvas.map_rgb(boundary_color))
 
         # --- Animation Step ---
         if active_filler:
             try:
-                next(active_filler)
+                changed = next(active_filler)
+                if changed:
+                    dirty_rects.append(changed)
             except StopIteration:
                 active_filler = None
+                history.push(recorder.finish(), fill_paint)
 
         # --- Drawing ---
-        screen.fill((50, 50, 60))  # Dark UI background
-        screen.blit(canvas, (0, 0))
-
-        # UI Panel
-        pygame.draw.rect(screen, (230, 230, 240), (0, CANVAS_HEIGHT, SCREEN_WIDTH, UI_HEIGHT))
-
-        # Draw tool buttons
-        for tool, rect in tool_buttons.items():
-            is_active = active_tool == tool
-            pygame.draw.rect(screen, (180, 190, 220) if is_active else (210, 210, 220), rect, border_radius=5)
-            pygame.draw.rect(screen, (60, 70, 100) if is_active else (150, 150, 150), rect, 2, 5)
-            label = tool.replace('_', '-').title()
-            text = font.render(label, True, (0, 0, 0))
-            screen.blit(text, text.get_rect(center=rect.center))
-
-        # Draw clear button
-        pygame.draw.rect(screen, (220, 180, 180), clear_button, border_radius=5)
-        pygame.draw.rect(screen, (100, 60, 60), clear_button, 2, 5)
-        text = font.render("Clear", True, (0, 0, 0))
-        screen.blit(text, text.get_rect(center=clear_button.center))
-
-        # Draw color palette and info
-        info_text = font.render("Left-click to set Boundary | Right-click to set Fill", True, (50, 50, 50))
-        screen.blit(info_text, (margin, CANVAS_HEIGHT + 55))
-        for color, rect in color_buttons.items():
-            pygame.draw.rect(screen, color, rect, border_radius=4)
-            if color == boundary_color:
-                pygame.draw.rect(screen, (0, 0, 0), rect, 3, 4)
-            if color == fill_color:
-                pygame.draw.rect(screen, (0, 0, 0), (rect.x + 2, rect.y + 2, rect.width - 4, rect.height - 4), 2, 4)
+        if ui_dirty:
+            # UI Panel
+            pygame.draw.rect(screen, (230, 230, 240), panel_rect)
+
+            # Draw tool buttons
+            for tool, rect in tool_buttons.items():
+                is_active = active_tool == tool
+                pygame.draw.rect(screen, (180, 190, 220) if is_active else (210, 210, 220), rect, border_radius=5)
+                pygame.draw.rect(screen, (60, 70, 100) if is_active else (150, 150, 150), rect, 2, 5)
+                screen.blit(tool_labels[tool], tool_labels[tool].get_rect(center=rect.center))
+
+            # Draw clear button
+            pygame.draw.rect(screen, (220, 180, 180), clear_button, border_radius=5)
+            pygame.draw.rect(screen, (100, 60, 60), clear_button, 2, 5)
+            screen.blit(clear_label, clear_label.get_rect(center=clear_button.center))
+
+            # Draw color palette and info
+            screen.blit(info_text, (margin, CANVAS_HEIGHT + 55))
+            screen.blit(tolerance_label, (margin + len(COLORS) * (color_swatch_size + 5) + 15, CANVAS_HEIGHT + 75))
+            screen.blit(style_label, (margin + len(COLORS) * (color_swatch_size + 5) + 230, CANVAS_HEIGHT + 75))
+            for color, rect in color_buttons.items():
+                pygame.draw.rect(screen, color, rect, border_radius=4)
+                if color == boundary_color:
+                    pygame.draw.rect(screen, (0, 0, 0), rect, 3, 4)
+                if color == fill_color:
+                    pygame.draw.rect(screen, (0, 0, 0), (rect.x + 2, rect.y + 2, rect.width - 4, rect.height - 4), 2, 4)
+
+            panel_snapshot = screen.subsurface(panel_rect).copy()
+            dirty_rects.append(panel_rect)
+            ui_dirty = False
+
+        # Repair every changed area (including the old preview) from the canvas and panel
+        if preview_rect:
+            dirty_rects.append(preview_rect)
+            preview_rect = None
+        for rect in dirty_rects:
+            area = rect.clip(canvas_rect)
+            if area:
+                screen.blit(canvas, area, area)
+            area = rect.clip(panel_rect)
+            if area:
+                screen.blit(panel_snapshot, area, area.move(0, -CANVAS_HEIGHT))
 
         # Draw dynamic preview
         if drawing and start_pos and active_tool in ['line', 'rect', 'circle']:
@@ -251,24 +1267,110 @@ def main():
             if current_pos[1] >= CANVAS_HEIGHT: current_pos = (current_pos[0], CANVAS_HEIGHT - 1)
 
             if active_tool == 'line':
-                pygame.draw.line(screen, (100, 100, 100), start_pos, current_pos, 1)
+                preview_rect = pygame.draw.line(screen, (100, 100, 100), start_pos, current_pos, 1)
             elif active_tool == 'rect':
                 rect = pygame.Rect(start_pos, (current_pos[0] - start_pos[0], current_pos[1] - start_pos[1]))
                 rect.normalize()
-                pygame.draw.rect(screen, (100, 100, 100), rect, 1)
+                preview_rect = pygame.draw.rect(screen, (100, 100, 100), rect, 1)
             elif active_tool == 'circle':
                 dx = current_pos[0] - start_pos[0]
                 dy = current_pos[1] - start_pos[1]
                 radius = int(math.sqrt(dx * dx + dy * dy))
                 if radius > 0:
-                    pygame.draw.circle(screen, (100, 100, 100), start_pos, radius, 1)
+                    preview_rect = pygame.draw.circle(screen, (100, 100, 100), start_pos, radius, 1)
+            if preview_rect:
+                dirty_rects.append(preview_rect)
+
+        # Push only the changed regions to the display
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+            dirty_rects = []
+
+    pygame.quit()
+    sys.exit()
+
+
+def main_tiled(width=TILED_CANVAS_SIZE[0], height=TILED_CANVAS_SIZE[1]):
+    """
+    Viewer for a TiledCanvas far larger than the window. The view shows a pannable window
+    into the canvas and is rebuilt from the resident tiles only when it changes.
+    """
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Tiled Canvas Fill Visualizer")
+
+    view = pygame.Surface((CANVAS_WIDTH, CANVAS_HEIGHT))
+    canvas = TiledCanvas(width, height, view.map_rgb(BG_COLOR))
+    font = pygame.font.SysFont('Arial', 14, bold=True)
+
+    origin = [0, 0]
+    boundary_color, fill_color = COLORS[0], COLORS[1]
+    last_pos, pan_from = None, None
+    view_dirty = True
+    running = True
+
+    while running:
+        for event in [pygame.event.wait()] + pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                moves = {pygame.K_LEFT: (-PAN_STEP, 0), pygame.K_RIGHT: (PAN_STEP, 0),
+                         pygame.K_UP: (0, -PAN_STEP), pygame.K_DOWN: (0, PAN_STEP)}
+                if event.key in moves:
+                    origin[0] += moves[event.key][0]
+                    origin[1] += moves[event.key][1]
+                    view_dirty = True
+                elif pygame.K_1 <= event.key <= pygame.K_9:
+                    fill_color = COLORS[event.key - pygame.K_1 + 1]
+                    view_dirty = True
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.pos[1] < CANVAS_HEIGHT:
+                cx, cy = event.pos[0] + origin[0], event.pos[1] + origin[1]
+                if event.button == 1:  # Left-drag draws boundary strokes
+                    last_pos = (cx, cy)
+                    tiled_line(canvas, last_pos, last_pos, view.map_rgb(boundary_color), 2)
+                elif event.button == 3:  # Right-click fills
+                    start = time.perf_counter()
+                    filled = tiled_fill(canvas, cx, cy, view.map_rgb(fill_color))
+                    print(f"Filled {filled} px in {time.perf_counter() - start:.2f}s, "
+                          f"{canvas.slot_count} tiles allocated")
+                elif event.button == 2:  # Middle-drag pans
+                    pan_from = event.pos
+                view_dirty = True
+            elif event.type == pygame.MOUSEMOTION:
+                if last_pos:
+                    pos = (event.pos[0] + origin[0], min(event.pos[1], CANVAS_HEIGHT - 1) + origin[1])
+                    tiled_line(canvas, last_pos, pos, view.map_rgb(boundary_color), 2)
+                    last_pos = pos
+                    view_dirty = True
+                elif pan_from:
+                    origin[0] -= event.pos[0] - pan_from[0]
+                    origin[1] -= event.pos[1] - pan_from[1]
+                    pan_from = event.pos
+                    view_dirty = True
+            elif event.type == pygame.MOUSEBUTTONUP:
+                last_pos, pan_from = None, None
 
-        pygame.display.flip()
+        if view_dirty:
+            origin[0] = max(0, min(origin[0], width - CANVAS_WIDTH))
+            origin[1] = max(0, min(origin[1], height - CANVAS_HEIGHT))
+            pygame.surfarray.blit_array(view, canvas.read_rect(origin[0], origin[1], CANVAS_WIDTH, CANVAS_HEIGHT).T)
+            screen.blit(view, (0, 0))
+            pygame.draw.rect(screen, (230, 230, 240), (0, CANVAS_HEIGHT, SCREEN_WIDTH, UI_HEIGHT))
+            info = font.render(f"View at {origin[0]}, {origin[1]} of {width}x{height} | Left-drag: draw | "
+                               f"Right-click: fill | 1-9: fill color | Arrows / middle-drag: pan", True, (50, 50, 50))
+            screen.blit(info, (6, CANVAS_HEIGHT + 20))
+            pygame.draw.rect(screen, fill_color, (6, CANVAS_HEIGHT + 50, 25, 25), border_radius=4)
+            pygame.display.flip()
+            view_dirty = False
 
+    canvas.close()
     pygame.quit()
     sys.exit()
 
 
 if __name__ == '__main__':
-    main()
+    if '--tiled' in sys.argv:
+        main_tiled()
+    else:
+        main()
 
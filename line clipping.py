@@ -3,15 +3,15 @@ from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
 import sys
+import time
+from collections import namedtuple
+import numpy as np
+from clip_window import ClipWindow
+from line_clip import INSIDE, LEFT, RIGHT, BOTTOM, TOP, cohen_sutherland_clip_batch
 
-# --- Cohen-Sutherland Line Clipping Algorithm ---
-
-INSIDE = 0  # 0000
-LEFT = 1  # 0001
-RIGHT = 2  # 0010
-BOTTOM = 4  # 0100
-TOP = 8  # 1000
+WINDOW_WIDTH, WINDOW_HEIGHT = 800, 600  # Size of the app window, also the area benchmark lines are drawn in
 
+# --- Cohen-Sutherland Line Clipping Algorithm ---
 
 def compute_outcode(x, y, xmin, ymin, xmax, ymax):
     """Computes the 4-bit outcode for a point."""
@@ -72,14 +72,244 @@ def cohen_sutherland_clip(x1, y1, x2, y2, xmin, ymin, xmax, ymax):
     return (x1, y1, x2, y2) if accepted else None
 
 
+# --- Liang-Barsky Line Clipping Algorithm ---
+
+def liang_barsky_clip(x1, y1, x2, y2, xmin, ymin, xmax, ymax):
+    """
+    Clips a line from P1=(x1,y1) to P2=(x2,y2) against a rectangle using its parametric
+    form P1 + t * (P2 - P1). Each edge narrows the visible range [t0, t1] with a single
+    division, so lines crossing two edges are not re-coded and re-divided.
+    """
+    dx, dy = x2 - x1, y2 - y1
+    t0, t1 = 0.0, 1.0
+
+    for p, q in ((-dx, x1 - xmin), (dx, xmax - x1), (-dy, y1 - ymin), (dy, ymax - y1)):
+        if p == 0:
+            # Parallel to this edge: outside it means outside the window.
+            if q < 0:
+                return None
+            continue
+        t = q / p
+        if p < 0:  # Entering the window across this edge.
+            if t > t1:
+                return None
+            t0 = max(t0, t)
+        else:  # Leaving the window across this edge.
+            if t < t0:
+                return None
+            t1 = min(t1, t)
+
+    return (x1 + t0 * dx, y1 + t0 * dy, x1 + t1 * dx, y1 + t1 * dy)
+
+
+def liang_barsky_clip_batch(lines, xmin, ymin, xmax, ymax):
+    """
+    Liang-Barsky clipping of an (N, 4) array of lines (x1, y1, x2, y2) at once.
+    Returns (clipped, accepted) like cohen_sutherland_clip_batch.
+    """
+    lines = np.asarray(lines, dtype=np.float64).reshape(-1, 4)
+    x1, y1, x2, y2 = lines.T
+    dx, dy = x2 - x1, y2 - y1
+    p = np.stack((-dx, dx, -dy, dy))
+    q = np.stack((x1 - xmin, xmax - x1, y1 - ymin, ymax - y1))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = q / p
+    t0 = np.where(p < 0, t, 0.0).max(axis=0)
+    t1 = np.where(p > 0, t, 1.0).min(axis=0)
+    accepted = (t0 <= t1) & ~((p == 0) & (q < 0)).any(axis=0)
+
+    clipped = np.column_stack((x1 + t0 * dx, y1 + t0 * dy, x1 + t1 * dx, y1 + t1 * dy))
+    return clipped, accepted
+
+
+# --- Clipping Engines ---
+
+# Every engine offers the same interface: clip(x1, y1, x2, y2, xmin, ymin, xmax, ymax)
+# for one line and clip_batch(lines, xmin, ymin, xmax, ymax) for an (N, 4) array.
+ClipEngine = namedtuple('ClipEngine', 'clip clip_batch')
+CLIP_ENGINES = {
+    'cohen-sutherland': ClipEngine(cohen_sutherland_clip, cohen_sutherland_clip_batch),
+    'liang-barsky': ClipEngine(liang_barsky_clip, liang_barsky_clip_batch),
+}
+DEFAULT_CLIP_ENGINE = 'cohen-sutherland'
+
+
+def clip_lines(lines, window, engine=DEFAULT_CLIP_ENGINE):
+    """Clips lines against a window dict with the named engine. Returns the kept lines as an (M, 4) array."""
+    clipped, accepted = CLIP_ENGINES[engine].clip_batch(lines, **window)
+    return clipped[accepted]
+
+
+def make_benchmark_lines(distribution, n, window, rng):
+    """Random (n, 4) lines that mostly lie 'inside' or 'outside' the window, or are 'crossing' it."""
+    xmin, ymin, xmax, ymax = window['xmin'], window['ymin'], window['xmax'], window['ymax']
+    if distribution == 'inside':
+        return np.column_stack([rng.uniform(lo, hi, n) for lo, hi in
+                                ((xmin, xmax), (ymin, ymax), (xmin, xmax), (ymin, ymax))])
+    if distribution == 'outside':
+        # Short segments in the band around the window
+        start = rng.uniform((0, 0), (WINDOW_WIDTH, WINDOW_HEIGHT), (n, 2))
+        start[:, 0] = np.where(start[:, 0] < (xmin + xmax) / 2, start[:, 0] * xmin / WINDOW_WIDTH,
+                               xmax + start[:, 0] * (WINDOW_WIDTH - xmax) / WINDOW_WIDTH)
+        return np.hstack((start, start + rng.normal(0, 10, (n, 2))))
+    # One endpoint inside, the other anywhere on a ring well outside the window
+    inside = rng.uniform((xmin, ymin), (xmax, ymax), (n, 2))
+    angle = rng.uniform(0, 2 * np.pi, n)
+    radius = max(WINDOW_WIDTH, WINDOW_HEIGHT)
+    outside = np.column_stack(((xmin + xmax) / 2 + radius * np.cos(angle), (ymin + ymax) / 2 + radius * np.sin(angle)))
+    return np.hstack((inside, outside))
+
+
+def benchmark_engines(batch_size=1_000_000, scalar_size=20_000, repeats=3):
+    """Times every engine, scalar and batched, on each line distribution and prints lines per second."""
+    window = {'xmin': 200, 'ymin': 150, 'xmax': 600, 'ymax': 450}
+    rng = np.random.default_rng(0)
+    print(f"{'distribution':<12} {'engine':<18} {'scalar lines/s':>15} {'batch lines/s':>15} {'kept':>7}")
+    for distribution in ('inside', 'outside', 'crossing'):
+        lines = make_benchmark_lines(distribution, batch_size, window, rng)
+        sample = lines[:scalar_size].tolist()
+        for name, engine in CLIP_ENGINES.items():
+            start = time.perf_counter()
+            for _ in range(repeats):
+                for line in sample:
+                    engine.clip(*line, **window)
+            scalar_rate = repeats * len(sample) / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                _, accepted = engine.clip_batch(lines, **window)
+            batch_rate = repeats * len(lines) / (time.perf_counter() - start)
+            print(f"{distribution:<12} {name:<18} {scalar_rate:>15,.0f} {batch_rate:>15,.0f} {accepted.mean():>7.1%}")
+
+
+# --- Spatial Index for Incremental Re-clipping ---
+
+GRID_CELL_SIZE = 32  # Edge length of a grid cell, in pixels
+GRID_MAX_CELLS = 64  # Segments whose boxes cover more cells are kept in an overflow list
+GRID_MAX_COLUMNS = 1024  # Cells grow beyond GRID_CELL_SIZE for lines spread over a huge area
+RANDOM_LINE_BATCH = 100_000  # Lines added by the 'N' key
+
+
+class SegmentGrid:
+    """
+    Uniform grid over segment bounding boxes. Each segment is listed in every cell its box
+    covers, stored CSR-style: one sorted array of segment ids and an offset per cell, so a
+    row of cells is a single contiguous slice. Segments spanning more than GRID_MAX_CELLS
+    cells go to an overflow list that every query checks directly.
+    """
+
+    def __init__(self, lines, cell_size=GRID_CELL_SIZE, max_cells=GRID_MAX_CELLS):
+        lines = np.asarray(lines, dtype=np.float64).reshape(-1, 4)
+        self.boxes = np.column_stack((np.minimum(lines[:, 0], lines[:, 2]), np.minimum(lines[:, 1], lines[:, 3]),
+                                      np.maximum(lines[:, 0], lines[:, 2]), np.maximum(lines[:, 1], lines[:, 3])))
+        self.origin = self.boxes[:, :2].min(axis=0) if len(lines) else np.zeros(2)
+        extent = self.boxes[:, 2:].max(axis=0) - self.origin if len(lines) else np.zeros(2)
+        self.cell_size = max(cell_size, extent.max() / GRID_MAX_COLUMNS)
+
+        cx0, cy0 = self._cell(self.boxes[:, 0], 0), self._cell(self.boxes[:, 1], 1)
+        cx1, cy1 = self._cell(self.boxes[:, 2], 0), self._cell(self.boxes[:, 3], 1)
+        self.columns = int(cx1.max()) + 1 if len(lines) else 1
+        self.rows = int(cy1.max()) + 1 if len(lines) else 1
+
+        widths = cx1 - cx0 + 1
+        counts = widths * (cy1 - cy0 + 1)
+        large = counts > max_cells
+        self.overflow = np.flatnonzero(large)
+
+        # One entry per (segment, covered cell), then sorted by cell into CSR form
+        small = np.flatnonzero(~large)
+        ids = np.repeat(small, counts[small])
+        offsets = np.arange(len(ids)) - np.repeat(np.cumsum(counts[small]) - counts[small], counts[small])
+        cells = (cy0[ids] + offsets // widths[ids]) * self.columns + cx0[ids] + offsets % widths[ids]
+        order = np.argsort(cells, kind='stable')
+        self.items = ids[order]
+        self.starts = np.searchsorted(cells[order], np.arange(self.columns * self.rows + 1))
+
+    def _cell(self, values, axis):
+        return ((values - self.origin[axis]) // self.cell_size).astype(np.int64)
+
+    def query(self, rects):
+        """Returns the ids of the segments whose bounding boxes touch any of the (xmin, ymin, xmax, ymax) rects."""
+        # Segments listed in several cells are marked once instead of sorting out duplicates
+        candidates = np.zeros(len(self.boxes), dtype=bool)
+        candidates[self.overflow] = True
+        for xmin, ymin, xmax, ymax in rects:
+            c0 = max(int(self._cell(np.float64(xmin), 0)), 0)
+            c1 = min(int(self._cell(np.float64(xmax), 0)), self.columns - 1)
+            for row in range(max(int(self._cell(np.float64(ymin), 1)), 0),
+                             min(int(self._cell(np.float64(ymax), 1)), self.rows - 1) + 1):
+                if c0 <= c1:
+                    candidates[self.items[self.starts[row * self.columns + c0]:
+                                          self.starts[row * self.columns + c1 + 1]]] = True
+
+        candidates = np.flatnonzero(candidates)
+        boxes = self.boxes[candidates]
+        hit = np.zeros(len(candidates), dtype=bool)
+        for xmin, ymin, xmax, ymax in rects:
+            hit |= (boxes[:, 0] <= xmax) & (boxes[:, 2] >= xmin) & (boxes[:, 1] <= ymax) & (boxes[:, 3] >= ymin)
+        return candidates[hit]
+
+
+def window_difference(a, b):
+    """Returns the parts of window 'a' outside window 'b' as up to four (xmin, ymin, xmax, ymax) rects."""
+    if a['xmax'] < b['xmin'] or a['xmin'] > b['xmax'] or a['ymax'] < b['ymin'] or a['ymin'] > b['ymax']:
+        return [(a['xmin'], a['ymin'], a['xmax'], a['ymax'])]
+    pieces = []
+    if a['xmin'] < b['xmin']:
+        pieces.append((a['xmin'], a['ymin'], b['xmin'], a['ymax']))
+    if a['xmax'] > b['xmax']:
+        pieces.append((b['xmax'], a['ymin'], a['xmax'], a['ymax']))
+    x0, x1 = max(a['xmin'], b['xmin']), min(a['xmax'], b['xmax'])
+    if a['ymin'] < b['ymin']:
+        pieces.append((x0, a['ymin'], x1, b['ymin']))
+    if a['ymax'] > b['ymax']:
+        pieces.append((x0, b['ymax'], x1, a['ymax']))
+    return pieces
+
+
+class IncrementalClipper:
+    """
+    Keeps the clipped result of every stored line. When the window moves or is resized,
+    a line's clipped part can only change if it touches the symmetric difference of the
+    old and new windows, so only the lines the SegmentGrid finds there are re-clipped.
+    """
+
+    def __init__(self, lines, window, engine=DEFAULT_CLIP_ENGINE):
+        self.lines = np.asarray(lines, dtype=np.float64).reshape(-1, 4)
+        self.index = SegmentGrid(self.lines)
+        self.engine = engine
+        self.window = dict(window)
+        self.clipped, self.accepted = CLIP_ENGINES[engine].clip_batch(self.lines, **window)
+
+    def set_window(self, window):
+        """Moves the clip window, re-clipping only the lines it can affect. Returns how many were re-clipped."""
+        changed = self.index.query(window_difference(self.window, window) + window_difference(window, self.window))
+        self.window = dict(window)
+        if len(changed):
+            self.clipped[changed], self.accepted[changed] = CLIP_ENGINES[self.engine].clip_batch(
+                self.lines[changed], **window)
+        return len(changed)
+
+    def set_engine(self, engine):
+        self.engine = engine
+        self.clipped, self.accepted = CLIP_ENGINES[engine].clip_batch(self.lines, **self.window)
+
+    def visible(self):
+        """Returns the kept clipped lines as an (M, 4) array."""
+        return self.clipped[self.accepted]
+
+
 # --- Pygame and OpenGL Setup ---
 
 # Global variables
 state = 'draw_line_start'
 clip_window = {}
-original_lines, clipped_lines = [], []
+original_lines, clipped_lines = np.empty((0, 4)), np.empty((0, 4))
 temp_coords = []
-WINDOW_WIDTH, WINDOW_HEIGHT = 800, 600
+engine_name = DEFAULT_CLIP_ENGINE
+clipper = None  # IncrementalClipper for the current window
+drag = None  # (mode, start mouse position, window at drag start) while the window is dragged
 
 
 def init_gl():
@@ -94,15 +324,15 @@ def init_gl():
 
 
 def draw_lines(lines, color, line_width):
-    """Draws a list of lines."""
-    if not lines: return
+    """Draws an (N, 4) array of lines from a vertex array in a single call."""
+    if not len(lines): return
+    vertices = np.ascontiguousarray(lines, dtype=np.float64).reshape(-1, 2)
     glColor3f(*color)
     glLineWidth(line_width)
-    glBegin(GL_LINES)
-    for line in lines:
-        glVertex2f(line[0], line[1])
-        glVertex2f(line[2], line[3])
-    glEnd()
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glVertexPointer(2, GL_DOUBLE, 0, vertices)
+    glDrawArrays(GL_LINES, 0, len(vertices))
+    glDisableClientState(GL_VERTEX_ARRAY)
 
 
 def draw_rectangle(rect, color, line_width):
@@ -128,16 +358,33 @@ def draw_text(text, x, y, font):
 
 def reset_all():
     """Resets all drawing variables."""
-    global state, clip_window, original_lines, clipped_lines, temp_coords
+    global state, clip_window, original_lines, clipped_lines, temp_coords, clipper, drag
     state = 'draw_line_start'
     clip_window = {}
-    original_lines, clipped_lines = [], []
+    original_lines, clipped_lines = np.empty((0, 4)), np.empty((0, 4))
     temp_coords = []
+    clipper, drag = None, None
+
+
+def random_lines(n, rng=None):
+    """Returns n short random lines scattered over the window."""
+    rng = rng or np.random.default_rng()
+    starts = rng.uniform((0, 0), (WINDOW_WIDTH, WINDOW_HEIGHT), (n, 2))
+    return np.hstack((starts, starts + rng.normal(0, 40, (n, 2))))
+
+
+def dragged_window(mode, start, window, pos):
+    """Returns the clip window moved (or, for 'resize', stretched at its max corner) by the mouse drag."""
+    dx, dy = pos[0] - start[0], pos[1] - start[1]
+    if mode == 'resize':
+        return ClipWindow.from_bounds(window.xmin, window.ymin,
+                                      max(window.xmax + dx, window.xmin + 1), max(window.ymax + dy, window.ymin + 1))
+    return ClipWindow.from_bounds(window.xmin + dx, window.ymin + dy, window.xmax + dx, window.ymax + dy)
 
 
 def main():
     """Main application loop."""
-    global state, clip_window, original_lines, clipped_lines, temp_coords
+    global state, clip_window, original_lines, clipped_lines, temp_coords, engine_name, clipper, drag
 
     pygame.init()
     display = (WINDOW_WIDTH, WINDOW_HEIGHT)
@@ -156,14 +403,32 @@ def main():
 
             if event.type == pygame.MOUSEMOTION:
                 mouse_pos = (event.pos[0], WINDOW_HEIGHT - event.pos[1])
+                if drag:
+                    clip_window = dragged_window(*drag, mouse_pos)
+                    clipper.set_window(clip_window)
+                    clipped_lines = clipper.visible()
+
+            if event.type == pygame.MOUSEBUTTONUP:
+                drag = None
 
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_r:
                     reset_all()
                     print("Canvas reset.")
-                elif event.key == pygame.K_c and original_lines:
+                elif event.key == pygame.K_c and len(original_lines):
                     state = 'draw_clip_rect_start'
                     temp_coords = []
+                elif event.key == pygame.K_e:
+                    names = list(CLIP_ENGINES)
+                    engine_name = names[(names.index(engine_name) + 1) % len(names)]
+                    if clipper:
+                        clipper.set_engine(engine_name)
+                        clipped_lines = clipper.visible()
+                elif event.key == pygame.K_n:
+                    original_lines = np.vstack((original_lines, random_lines(RANDOM_LINE_BATCH)))
+                    if clipper:
+                        clipper = IncrementalClipper(original_lines, clip_window, engine_name)
+                        clipped_lines = clipper.visible()
 
             if event.type == pygame.MOUSEBUTTONDOWN:
                 x, y = event.pos[0], WINDOW_HEIGHT - event.pos[1]
@@ -171,7 +436,7 @@ def main():
                 if state in ['draw_line_start', 'draw_line_end']:
                     temp_coords.append((x, y))
                     if len(temp_coords) == 2:
-                        original_lines.append(tuple(temp_coords[0] + temp_coords[1]))
+                        original_lines = np.vstack((original_lines, temp_coords[0] + temp_coords[1]))
                         temp_coords = []
                         state = 'draw_line_start'
                     else:
@@ -181,19 +446,22 @@ def main():
                     state = 'drawing_clip_rect'
                 elif state == 'drawing_clip_rect':
                     temp_coords.append((x, y))
-                    p1, p2 = temp_coords
-                    xmin, xmax = sorted([p1[0], p2[0]])
-                    ymin, ymax = sorted([p1[1], p2[1]])
-
-                    clip_window = {'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax}
-                    clipped_lines = []
-                    for line in original_lines:
-                        clipped = cohen_sutherland_clip(*line, **clip_window)
-                        if clipped:
-                            clipped_lines.append(clipped)
+                    try:
+                        clip_window = ClipWindow.from_corners(*temp_coords)
+                    except ValueError:
+                        temp_coords.pop()
+                        print("The clipping window needs a width and a height. Click the second corner again.")
+                        continue
+                    clipper = IncrementalClipper(original_lines, clip_window, engine_name)
+                    clipped_lines = clipper.visible()
 
                     state = 'clipped'
                     temp_coords = []
+                elif state == 'clipped':
+                    # Dragging inside the window moves it; Shift+drag resizes it
+                    if clip_window.contains(x, y):
+                        mode = 'resize' if pygame.key.get_mods() & pygame.KMOD_SHIFT else 'move'
+                        drag = (mode, (x, y), clip_window)
 
         # --- Drawing logic ---
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
@@ -224,7 +492,7 @@ def main():
 
         # --- Display instructions ---
         if state == 'draw_line_start':
-            text = "Click to set the start point of a line. Press 'C' to clip."
+            text = "Click to set the start point of a line ('N' adds random lines). Press 'C' to clip."
         elif state == 'draw_line_end':
             text = "Click to set the end point of the line."
         elif state == 'draw_clip_rect_start':
@@ -232,14 +500,18 @@ def main():
         elif state == 'drawing_clip_rect':
             text = "Click to set the second corner of the clipping RECTANGLE."
         elif state == 'clipped':
-            text = "Clipping complete. Press 'R' to reset."
+            text = "Clipping complete. Drag the window to move it, Shift+drag to resize. Press 'R' to reset."
         else:
             text = ""
         draw_text(text, 10, WINDOW_HEIGHT - 30, font)
+        draw_text(f"Clipper: {engine_name} (press 'E' to switch)", 10, WINDOW_HEIGHT - 55, font)
 
         pygame.display.flip()
         pygame.time.wait(10)
 
 
 if __name__ == '__main__':
-    main()
+    if '--benchmark' in sys.argv:
+        benchmark_engines()
+    else:
+        main()
@@ -0,0 +1,72 @@
+import numpy as np
+
+# --- Batch Cohen-Sutherland Shared by the Line Clippers ---
+
+# Region codes, named for y-up coordinates: BOTTOM is y < ymin and TOP is y > ymax.
+# In pygame's y-down screen coordinates ymin is the top of the window, so the two bits
+# swap meaning on screen; the clipping itself is the same either way.
+INSIDE = 0  # 0000
+LEFT = 1  # 0001
+RIGHT = 2  # 0010
+BOTTOM = 4  # 0100
+TOP = 8  # 1000
+
+
+def compute_outcodes(x, y, xmin, ymin, xmax, ymax):
+    """Computes the outcodes of arrays of points at once."""
+    code = (x < xmin).view(np.uint8) * np.uint8(LEFT)
+    code |= (x > xmax).view(np.uint8) * np.uint8(RIGHT)
+    code |= (y < ymin).view(np.uint8) * np.uint8(BOTTOM)
+    code |= (y > ymax).view(np.uint8) * np.uint8(TOP)
+    return code
+
+
+def cohen_sutherland_clip_batch(lines, xmin, ymin, xmax, ymax):
+    """
+    Clips an (N, 4) array of lines (x1, y1, x2, y2) against a rectangle in one go.
+    Outcodes settle the trivially accepted and rejected lines with bit operations; the rest
+    get one vectorized pass per edge, in TOP, BOTTOM, RIGHT, LEFT order, moving every
+    endpoint outside that edge onto it and rejecting lines whose outcodes share a bit.
+    After the four passes every surviving line lies inside the window. Takes the window as
+    keywords, so a ClipWindow can be passed as **window. Returns (clipped, accepted): the
+    clipped (N, 4) float array and a boolean mask of the lines that are kept.
+    """
+    lines = np.asarray(lines, dtype=np.float64).reshape(-1, 4)
+    outcode1 = compute_outcodes(lines[:, 0], lines[:, 1], xmin, ymin, xmax, ymax)
+    outcode2 = compute_outcodes(lines[:, 2], lines[:, 3], xmin, ymin, xmax, ymax)
+    accepted = (outcode1 & outcode2) == 0
+    clipped = lines.copy()
+
+    # Only lines that are neither trivially accepted nor rejected need the edge passes
+    pending = np.flatnonzero(accepted & ((outcode1 | outcode2) != 0))
+    x1, y1, x2, y2 = (lines[pending, i] for i in range(4))
+    rejected = np.zeros(len(pending), dtype=bool)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for edge, bound in ((TOP, ymax), (BOTTOM, ymin), (RIGHT, xmax), (LEFT, xmin)):
+            outcode1 = compute_outcodes(x1, y1, xmin, ymin, xmax, ymax)
+            outcode2 = compute_outcodes(x2, y2, xmin, ymin, xmax, ymax)
+            rejected |= (outcode1 & outcode2) != 0
+            out1 = ((outcode1 & edge) != 0) & ~rejected
+            out2 = ((outcode2 & edge) != 0) & ~rejected
+
+            # Both endpoints lie on the same line, so each can be moved using the other one
+            if edge & (TOP | BOTTOM):
+                x_at = x1 + (x2 - x1) * (bound - y1) / (y2 - y1)
+                np.copyto(x1, x_at, where=out1)
+                np.copyto(x2, x_at, where=out2)
+                np.copyto(y1, bound, where=out1)
+                np.copyto(y2, bound, where=out2)
+            else:
+                y_at = y1 + (y2 - y1) * (bound - x1) / (x2 - x1)
+                np.copyto(y1, y_at, where=out1)
+                np.copyto(y2, y_at, where=out2)
+                np.copyto(x1, bound, where=out1)
+                np.copyto(x2, bound, where=out2)
+
+    resolved = np.column_stack((x1, y1, x2, y2))
+    # Snap away rounding that leaves an endpoint a hair outside the window
+    np.clip(resolved, (xmin, ymin, xmin, ymin), (xmax, ymax, xmax, ymax), out=resolved)
+    clipped[pending] = resolved
+    accepted[pending] = ~rejected
+    return clipped, accepted
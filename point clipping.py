@@ -3,15 +3,79 @@ from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
 import sys
+import numpy as np
+from clip_window import ClipWindow
 
 
 # --- Point Clipping Algorithm ---
 
-def is_point_inside(px, py, xmin, ymin, xmax, ymax):
+def points_inside(points, xmin, ymin, xmax, ymax):
     """
-    Checks if a point (px, py) is inside the clipping window.
+    Checks a whole (N, 2) array of points at once. Returns a boolean mask.
     """
-    return xmin <= px <= xmax and ymin <= py <= ymax
+    x, y = points[:, 0], points[:, 1]
+    return (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
+
+
+# --- Spatial Index ---
+
+POINT_GRID_CELL = 16  # Edge length of a grid cell, in pixels
+POINT_GRID_MAX_COLUMNS = 1024  # Cells grow beyond POINT_GRID_CELL for clouds spread over a huge area
+RANDOM_POINT_BATCH = 1_000_000  # Points added by the 'N' key
+POINT_BUFFER_START = 1024  # Initial capacity (points) of the point and color buffers
+
+
+class PointGrid:
+    """
+    Uniform grid over a point cloud. Points are counting-sorted by cell, so 'order' lists
+    point indices cell by cell and 'starts' holds each cell's offset into it; a row of
+    cells is one contiguous slice. Window queries take the cells fully inside the window
+    as whole slices and only test the points of the cells on its border.
+    """
+
+    def __init__(self, points, cell_size=POINT_GRID_CELL):
+        self.points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        if len(self.points):
+            self.origin = self.points.min(axis=0).astype(np.float64)
+            extent = self.points.max(axis=0) - self.origin
+        else:
+            self.origin, extent = np.zeros(2), np.zeros(2)
+        self.cell_size = max(cell_size, float(extent.max()) / POINT_GRID_MAX_COLUMNS)
+        self.columns = int(extent[0] // self.cell_size) + 1
+        self.rows = int(extent[1] // self.cell_size) + 1
+
+        cells = self._cell(self.points[:, 1], 1) * self.columns + self._cell(self.points[:, 0], 0)
+        counts = np.bincount(cells, minlength=self.columns * self.rows)
+        self.starts = np.concatenate(([0], np.cumsum(counts)))
+        self.order = np.argsort(cells, kind='stable')
+
+    def _cell(self, values, axis):
+        # Same float64 arithmetic for points and window edges, so cell order matches coordinate order
+        return ((np.asarray(values, dtype=np.float64) - self.origin[axis]) // self.cell_size).astype(np.int64)
+
+    def query(self, xmin, ymin, xmax, ymax):
+        """Returns the indices of the points inside the window."""
+        c0, c1 = max(int(self._cell(xmin, 0)), 0), min(int(self._cell(xmax, 0)), self.columns - 1)
+        r0, r1 = max(int(self._cell(ymin, 1)), 0), min(int(self._cell(ymax, 1)), self.rows - 1)
+        window = (xmin, ymin, xmax, ymax)
+        found = [np.empty(0, dtype=np.int64)]
+        if c0 > c1 or r0 > r1:
+            return found[0]
+
+        for row in range(r0, r1 + 1):
+            base = row * self.columns
+            lo, hi = self.starts[base + c0], self.starts[base + c1 + 1]
+            if row in (r0, r1) or c1 - c0 < 2:
+                found.append(self._inside(self.order[lo:hi], window))
+            else:
+                # Only the first and last cell of an inner row can hold points outside the window
+                first, last = self.starts[base + c0 + 1], self.starts[base + c1]
+                found += [self._inside(self.order[lo:first], window), self.order[first:last],
+                          self._inside(self.order[last:hi], window)]
+        return np.concatenate(found)
+
+    def _inside(self, indices, window):
+        return indices[points_inside(self.points[indices], *window)]
 
 
 # --- Pygame and OpenGL Setup ---
@@ -20,9 +84,20 @@ def is_point_inside(px, py, xmin, ymin, xmax, ymax):
 state = 'draw_point'  # Start by drawing points
 coords = []
 clipping_window_params = {}
-points = []
+# Points and their colors live in preallocated buffers; only the first 'point_count' rows are used
+point_buffer = np.empty((POINT_BUFFER_START, 2), dtype=np.float32)
+color_buffer = np.empty((POINT_BUFFER_START, 3), dtype=np.float32)
+point_count = 0
+points = point_buffer[:0]  # Views of the used rows
+point_colors = color_buffer[:0]
+point_index = None  # PointGrid over 'points', built when a window is first applied
+inside_mask = None  # Cached result of the last window query
 WINDOW_WIDTH, WINDOW_HEIGHT = 800, 600
 
+INSIDE_COLOR = (0.0, 1.0, 0.0)  # Green for inside
+OUTSIDE_COLOR = (0.5, 0.5, 1.0)  # Blue for outside
+UNCLIPPED_COLOR = (0.8, 0.8, 0.8)  # White for pre-clipping
+
 
 def init_gl():
     """Initializes OpenGL for 2D drawing."""
@@ -49,21 +124,58 @@ def draw_clipping_window():
         glEnd()
 
 
-def draw_points():
-    """Draws all points, coloring them based on whether they are inside the clip window."""
-    glBegin(GL_POINTS)
-    for p in points:
-        # If clipping has happened, color points based on their position
-        if state == 'clipped':
-            if is_point_inside(p[0], p[1], **clipping_window_params):
-                glColor3f(0.0, 1.0, 0.0)  # Green for inside
-            else:
-                glColor3f(0.5, 0.5, 1.0)  # Blue for outside
-        else:
-            glColor3f(0.8, 0.8, 0.8)  # White for pre-clipping
+def grow_buffer(buffer, capacity, used):
+    """Returns a buffer with room for 'capacity' rows holding the first 'used' rows of 'buffer'."""
+    grown = np.empty((capacity, buffer.shape[1]), dtype=buffer.dtype)
+    grown[:used] = buffer[:used]
+    return grown
 
-        glVertex2f(p[0], p[1])
-    glEnd()
+
+def update_points(new_points=None):
+    """
+    Appends points (if given) and updates the cached colors. The inside mask is only
+    recomputed here, when the points or the clipping window changed.
+    """
+    global points, point_buffer, point_count, point_index, inside_mask, point_colors, color_buffer
+    start = point_count
+    if new_points is not None:
+        new_points = np.asarray(new_points, dtype=np.float32).reshape(-1, 2)
+        end = point_count + len(new_points)
+        if end > len(point_buffer):
+            # Doubling keeps appends amortized O(1) per point instead of copying everything per click
+            capacity = max(end, 2 * len(point_buffer))
+            point_buffer = grow_buffer(point_buffer, capacity, point_count)
+            color_buffer = grow_buffer(color_buffer, capacity, point_count)
+        point_buffer[point_count:end] = new_points
+        point_count = end
+        point_index = None
+    points = point_buffer[:point_count]
+    point_colors = color_buffer[:point_count]
+
+    if state == 'clipped':
+        # Color points based on their position
+        if point_index is None:
+            point_index = PointGrid(points)
+        inside_mask = np.zeros(point_count, dtype=bool)
+        inside_mask[point_index.query(**clipping_window_params)] = True
+        point_colors[:] = np.where(inside_mask[:, None], np.float32(INSIDE_COLOR), np.float32(OUTSIDE_COLOR))
+    else:
+        if inside_mask is not None:
+            start = 0  # The colors still show the last clip
+        inside_mask = None
+        point_colors[start:] = UNCLIPPED_COLOR
+
+
+def draw_points():
+    """Draws all points from vertex and color arrays in a single call."""
+    if not len(points): return
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_COLOR_ARRAY)
+    glVertexPointer(2, GL_FLOAT, 0, points)
+    glColorPointer(3, GL_FLOAT, 0, point_colors)
+    glDrawArrays(GL_POINTS, 0, len(points))
+    glDisableClientState(GL_COLOR_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
 
 
 def draw_text(text, x, y, font):
@@ -76,7 +188,7 @@ def draw_text(text, x, y, font):
 
 def main():
     """Main application loop."""
-    global state, coords, clipping_window_params, points
+    global state, coords, clipping_window_params, point_count
 
     pygame.init()
     display = (WINDOW_WIDTH, WINDOW_HEIGHT)
@@ -98,11 +210,16 @@ def main():
                     state = 'draw_point'
                     coords = []
                     clipping_window_params = {}
-                    points = []
+                    point_count = 0
+                    update_points()
                     print("Canvas reset.")
 
+                if event.key == pygame.K_n:
+                    update_points(np.random.default_rng().uniform((0, 0), (WINDOW_WIDTH, WINDOW_HEIGHT),
+                                                                  (RANDOM_POINT_BATCH, 2)))
+
                 if event.key == pygame.K_c and state == 'draw_point':
-                    if points:
+                    if len(points):
                         state = 'draw_window_start'
                         coords = []
                         print("Switched to clipping mode. Define the window.")
@@ -113,20 +230,22 @@ def main():
                 x, y = event.pos[0], WINDOW_HEIGHT - event.pos[1]
 
                 if state == 'draw_point':
-                    points.append((x, y))
+                    update_points([(x, y)])
                 elif state == 'draw_window_start':
                     coords.append((x, y))
                     state = 'draw_window_end'
                 elif state == 'draw_window_end':
                     coords.append((x, y))
-                    p1 = coords[0]
-                    p2 = coords[1]
-                    xmin, xmax = sorted([p1[0], p2[0]])
-                    ymin, ymax = sorted([p1[1], p2[1]])
-                    clipping_window_params = {'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax}
+                    try:
+                        clipping_window_params = ClipWindow.from_corners(*coords)
+                    except ValueError:
+                        coords.pop()
+                        print("The clipping window needs a width and a height. Click the second corner again.")
+                        continue
 
                     coords = []
                     state = 'clipped'  # Final state
+                    update_points()
 
         # Drawing logic
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
@@ -136,7 +255,7 @@ def main():
 
         # Display instructions
         if state == 'draw_point':
-            text = "Click to draw points. Press 'C' to start clipping."
+            text = "Click to draw points ('N' adds random points). Press 'C' to start clipping."
         elif state == 'draw_window_start':
             text = "Click to set the first corner of the clipping window."
         elif state == 'draw_window_end':
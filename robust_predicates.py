@@ -0,0 +1,76 @@
+from fractions import Fraction
+
+# --- Robust Orientation and Intersection Predicates ---
+
+EPSILON = 2.0 ** -53  # Unit roundoff of a float64
+ORIENT_ERRBOUND = (3.0 + 16.0 * EPSILON) * EPSILON  # Shewchuk's bound on the float orientation error
+
+
+def orient2d_exact(a, b, c):
+    """Sign of the orientation determinant of a, b, c computed exactly with rationals."""
+    ax, ay = Fraction(a[0]), Fraction(a[1])
+    det = (Fraction(b[0]) - ax) * (Fraction(c[1]) - ay) - (Fraction(b[1]) - ay) * (Fraction(c[0]) - ax)
+    return (det > 0) - (det < 0)
+
+
+def orient2d(a, b, c):
+    """
+    Which way a -> b -> c turns: 1 counterclockwise (c left of a -> b), -1 clockwise, 0 collinear.
+    The float determinant is used whenever it exceeds its worst-case rounding error, so the
+    exact rational fallback only runs for points that are collinear or very nearly so.
+    """
+    detleft = (b[0] - a[0]) * (c[1] - a[1])
+    detright = (b[1] - a[1]) * (c[0] - a[0])
+    det = detleft - detright
+    errbound = ORIENT_ERRBOUND * (abs(detleft) + abs(detright))
+    if det > errbound:
+        return 1
+    if det < -errbound:
+        return -1
+    return orient2d_exact(a, b, c)
+
+
+def segment_crossing(p1, p2, p3, p4):
+    """
+    Where segments p1-p2 and p3-p4 cross at a single point inside both, or None when they are
+    parallel, collinear, disjoint or only touch at an endpoint. The decision is exact; the point
+    is rounded to floats, recomputed exactly when the segments are nearly parallel, and kept
+    within both segments' bounding boxes. The segments are put in a canonical order first, so
+    the point doesn't depend on which comes first or which way each runs, and polygons that
+    meet at a crossing get bit-identical vertices however they are passed.
+    """
+    p1, p2 = min(p1, p2), max(p1, p2)
+    p3, p4 = min(p3, p4), max(p3, p4)
+    if (p3, p4) < (p1, p2):
+        p1, p2, p3, p4 = p3, p4, p1, p2
+    d1, d2 = orient2d(p3, p4, p1), orient2d(p3, p4, p2)
+    if d1 == 0 or d2 == 0 or d1 == d2:
+        return None
+    d3, d4 = orient2d(p1, p2, p3), orient2d(p1, p2, p4)
+    if d3 == 0 or d4 == 0 or d3 == d4:
+        return None
+
+    s1_x, s1_y = p2[0] - p1[0], p2[1] - p1[1]
+    s2_x, s2_y = p4[0] - p3[0], p4[1] - p3[1]
+    left, right = s1_x * s2_y, s1_y * s2_x
+    denom = left - right
+    if abs(denom) > 8 * ORIENT_ERRBOUND * (abs(left) + abs(right)):
+        t = ((p3[0] - p1[0]) * s2_y - (p3[1] - p1[1]) * s2_x) / denom
+        x, y = p1[0] + t * s1_x, p1[1] + t * s1_y
+    else:
+        # Nearly parallel: the float denominator has lost its digits, so solve exactly
+        q1, q2, q3, q4 = ([Fraction(p[0]), Fraction(p[1])] for p in (p1, p2, p3, p4))
+        e1_x, e1_y = q2[0] - q1[0], q2[1] - q1[1]
+        e2_x, e2_y = q4[0] - q3[0], q4[1] - q3[1]
+        t = ((q3[0] - q1[0]) * e2_y - (q3[1] - q1[1]) * e2_x) / (e1_x * e2_y - e1_y * e2_x)
+        x, y = float(q1[0] + t * e1_x), float(q1[1] + t * e1_y)
+
+    x = min(max(x, min(p1[0], p2[0]), min(p3[0], p4[0])), max(p1[0], p2[0]), max(p3[0], p4[0]))
+    y = min(max(y, min(p1[1], p2[1]), min(p3[1], p4[1])), max(p1[1], p2[1]), max(p3[1], p4[1]))
+    return (x, y)
+
+
+def point_on_segment(p, a, b):
+    """Whether p lies on the closed segment a-b, decided exactly."""
+    return (min(a[0], b[0]) <= p[0] <= max(a[0], b[0]) and min(a[1], b[1]) <= p[1] <= max(a[1], b[1])
+            and orient2d(a, b, p) == 0)
@@ -1,6 +1,8 @@
 import pygame
 import sys
 import math
+import numpy as np
+from undo_history import SpanRecorder, UndoHistory, stroke_bounds
 
 # --- Configuration ---
 SCREEN_WIDTH, SCREEN_HEIGHT = 800, 700
@@ -15,21 +17,27 @@ COLORS = [
     (255, 165, 0), (165, 42, 42), (128, 128, 128), (211, 211, 211)
 ]
 ANIMATION_BATCH_SIZE = 500  # Pixels per frame during fill animation
+INDEXED_CANVAS = True  # Keep the canvas as 8-bit palette indices instead of 32-bit RGB
+CANVAS_PALETTE = [BG_COLOR] + COLORS  # Index 0 is the background
 
 
 # --- Core Algorithms (Generators for Animation) ---
 
-def boundary_fill_iterative(screen, x, y, fill_color, boundary_color, connectivity=4):
+def boundary_fill_iterative(screen, x, y, fill_color, boundary_color, connectivity=4, recorder=None):
     """
     Performs an iterative boundary fill using a stack.
-    Yields control to the main loop to create an animation effect.
+    Yields the rectangle changed since the previous yield to the main loop,
+    which redraws only that area to create an animation effect.
+    Overwritten pixels are reported to 'recorder' (a SpanRecorder) for undo.
     """
     stack = [(x, y)]
     pixels_processed = 0
+    dirty = pygame.Rect(x, y, 1, 1)
+    fill, boundary = screen.map_rgb(fill_color), screen.map_rgb(boundary_color)
 
     try:
-        initial_color = screen.get_at((x, y))
-        if initial_color == boundary_color or initial_color == fill_color:
+        initial_color = screen.get_at_mapped((x, y))
+        if initial_color == boundary or initial_color == fill:
             print("Seed point is on boundary or already filled.")
             return
     except IndexError:
@@ -42,12 +50,17 @@ def boundary_fill_iterative(screen, x, y, fill_color, boundary_color, connectivi
         if not (0 <= px < CANVAS_WIDTH and 0 <= py < CANVAS_HEIGHT):
             continue
 
-        if screen.get_at((px, py)) != boundary_color and screen.get_at((px, py)) != fill_color:
-            screen.set_at((px, py), fill_color)
+        color = screen.get_at_mapped((px, py))
+        if color != boundary and color != fill:
+            if recorder is not None:
+                recorder.add(px, py, color)
+            screen.set_at((px, py), fill)
             pixels_processed += 1
+            dirty.union_ip((px, py, 1, 1))
 
             if pixels_processed % ANIMATION_BATCH_SIZE == 0:
-                yield
+                yield dirty
+                dirty = pygame.Rect(px, py, 1, 1)
 
             stack.append((px + 1, py))
             stack.append((px - 1, py))
@@ -59,26 +72,29 @@ def boundary_fill_iterative(screen, x, y, fill_color, boundary_color, connectivi
                 stack.append((px - 1, py + 1))
                 stack.append((px + 1, py - 1))
                 stack.append((px - 1, py - 1))
-    yield
+    yield dirty
 
 
-def flood_fill_iterative(screen, x, y, fill_color, connectivity=4):
+def flood_fill_iterative(screen, x, y, fill_color, connectivity=4, recorder=None):
     """
     Performs an iterative flood fill using a stack.
-    Replaces a target color with the fill color. Yields for animation.
+    Replaces a target color with the fill color. Yields changed rectangles for animation.
+    Overwritten pixels are reported to 'recorder' (a SpanRecorder) for undo.
     """
+    fill = screen.map_rgb(fill_color)
     try:
-        target_color = screen.get_at((x, y))
+        target_color = screen.get_at_mapped((x, y))
     except IndexError:
         print("Seed point is outside the canvas.")
         return
 
-    if target_color == fill_color:
+    if target_color == fill:
         print("Target area is already the fill color.")
         return
 
     stack = [(x, y)]
     pixels_processed = 0
+    dirty = pygame.Rect(x, y, 1, 1)
 
     while stack:
         px, py = stack.pop()
@@ -86,12 +102,16 @@ def flood_fill_iterative(screen, x, y, fill_color, connectivity=4):
         if not (0 <= px < CANVAS_WIDTH and 0 <= py < CANVAS_HEIGHT):
             continue
 
-        if screen.get_at((px, py)) == target_color:
-            screen.set_at((px, py), fill_color)
+        if screen.get_at_mapped((px, py)) == target_color:
+            if recorder is not None:
+                recorder.add(px, py, target_color)
+            screen.set_at((px, py), fill)
             pixels_processed += 1
+            dirty.union_ip((px, py, 1, 1))
 
             if pixels_processed % ANIMATION_BATCH_SIZE == 0:
-                yield
+                yield dirty
+                dirty = pygame.Rect(px, py, 1, 1)
 
             stack.append((px + 1, py))
             stack.append((px - 1, py))
@@ -103,16 +123,17 @@ def flood_fill_iterative(screen, x, y, fill_color, connectivity=4):
                 stack.append((px - 1, py + 1))
                 stack.append((px + 1, py - 1))
                 stack.append((px - 1, py - 1))
-    yield
+    yield dirty
 
 
-def scanline_fill_iterative(screen, x, y, fill_color, boundary_color):
+def scanline_fill_iterative(screen, x, y, fill_color, boundary_color, recorder=None):
     """
     Performs an iterative scan-line fill. More efficient than pixel-based fills.
-    Yields for animation.
+    Yields changed rectangles for animation and reports overwritten pixels to 'recorder'.
     """
+    fill, boundary = screen.map_rgb(fill_color), screen.map_rgb(boundary_color)
     try:
-        if screen.get_at((x, y)) == boundary_color or screen.get_at((x, y)) == fill_color:
+        if screen.get_at_mapped((x, y)) in (boundary, fill):
             print("Seed point is on boundary or already filled.")
             return
     except IndexError:
@@ -121,29 +142,36 @@ def scanline_fill_iterative(screen, x, y, fill_color, boundary_color):
 
     stack = [(x, y)]
     pixels_processed = 0
+    dirty = pygame.Rect(x, y, 1, 1)
 
     while stack:
         px, py = stack.pop()
 
         # Find the start of the scanline segment
         x_start = px
-        while x_start >= 0 and screen.get_at((x_start, py)) != boundary_color:
+        while x_start >= 0 and screen.get_at_mapped((x_start, py)) != boundary:
             x_start -= 1
         x_start += 1
 
         # Find the end of the scanline segment
         x_end = px
-        while x_end < CANVAS_WIDTH and screen.get_at((x_end, py)) != boundary_color:
+        while x_end < CANVAS_WIDTH and screen.get_at_mapped((x_end, py)) != boundary:
             x_end += 1
         x_end -= 1
 
         # Draw the scanline
-        pygame.draw.line(screen, fill_color, (x_start, py), (x_end, py))
+        if recorder is not None:
+            for sx in range(x_start, x_end + 1):
+                old_color = screen.get_at_mapped((sx, py))
+                if old_color != fill:
+                    recorder.add(sx, py, old_color)
+        dirty.union_ip(pygame.draw.line(screen, fill, (x_start, py), (x_end, py)))
         pixels_processed += (x_end - x_start + 1)
 
         if pixels_processed > ANIMATION_BATCH_SIZE:
             pixels_processed = 0
-            yield
+            yield dirty
+            dirty = pygame.Rect(x_start, py, 1, 1)
 
         # Check the line above and below for new seeds
         for scan_y in [py - 1, py + 1]:
@@ -152,14 +180,29 @@ def scanline_fill_iterative(screen, x, y, fill_color, boundary_color):
 
             in_span = False
             for scan_x in range(x_start, x_end + 1):
-                color = screen.get_at((scan_x, scan_y))
-                if color != boundary_color and color != fill_color:
+                color = screen.get_at_mapped((scan_x, scan_y))
+                if color != boundary and color != fill:
                     if not in_span:
                         stack.append((scan_x, scan_y))
                         in_span = True
                 else:
                     in_span = False
-    yield
+    yield dirty
+
+
+def create_canvas(width, height):
+    """
+    Creates the drawing canvas. With INDEXED_CANVAS it is an 8-bit surface whose pixels are
+    indices into CANVAS_PALETTE, a quarter of the memory of a 32-bit surface; the palette is
+    only applied when the canvas is blitted to the display.
+    """
+    if INDEXED_CANVAS:
+        canvas = pygame.Surface((width, height), depth=8)
+        canvas.set_palette(CANVAS_PALETTE)
+    else:
+        canvas = pygame.Surface((width, height))
+    canvas.fill(BG_COLOR)
+    return canvas
 
 
 # --- Main Application ---
@@ -168,8 +211,7 @@ def main():
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("Advanced Fill Algorithm Visualizer")
 
-    canvas = pygame.Surface((CANVAS_WIDTH, CANVAS_HEIGHT))
-    canvas.fill(BG_COLOR)
+    canvas = create_canvas(CANVAS_WIDTH, CANVAS_HEIGHT)
 
     # --- State Variables ---
     drawing = False
@@ -178,6 +220,8 @@ def main():
     boundary_color = COLORS[0]
     fill_color = COLORS[1]
     active_filler = None
+    history = UndoHistory()
+    recorder = None  # Collects the changes of the fill or stroke in progress
 
     font = pygame.font.SysFont('Arial', 14, bold=True)
 
@@ -193,11 +237,44 @@ def main():
     color_buttons = {color: pygame.Rect(margin + i * (color_swatch_size + 5), CANVAS_HEIGHT + 70, color_swatch_size,
                                         color_swatch_size) for i, color in enumerate(COLORS)}
 
+    # Text surfaces are rendered once and reused whenever the UI panel is redrawn
+    tool_labels = {tool: font.render(tool.replace('_', '-').title(), True, (0, 0, 0)) for tool in tools}
+    clear_label = font.render("Clear", True, (0, 0, 0))
+    info_text = font.render("Left-click to set Boundary | Right-click to set Fill | Ctrl+Z / Ctrl+Y to Undo / Redo",
+                            True, (50, 50, 50))
+
+    # --- Dirty-Rectangle State ---
+    canvas_rect = canvas.get_rect()
+    panel_rect = pygame.Rect(0, CANVAS_HEIGHT, SCREEN_WIDTH, UI_HEIGHT)
+    panel_snapshot = None  # Copy of the drawn UI panel, used to repair areas under the preview
+    ui_dirty = True
+    dirty_rects = [canvas_rect]
+    preview_rect = None
+
     running = True
     while running:
-        for event in pygame.event.get():
+        # Sleep until the next event unless there is something left to animate or present
+        if active_filler or dirty_rects or ui_dirty:
+            events = pygame.event.get()
+        else:
+            events = [pygame.event.wait()] + pygame.event.get()
+
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.VIDEOEXPOSE:
+                dirty_rects.append(screen.get_rect())
+
+            # --- Undo / Redo ---
+            elif event.type == pygame.KEYDOWN and event.mod & pygame.KMOD_CTRL:
+                if active_filler is None and not drawing:
+                    changed = None
+                    if event.key == pygame.K_z:
+                        changed = history.undo(canvas)
+                    elif event.key == pygame.K_y:
+                        changed = history.redo(canvas)
+                    if changed:
+                        dirty_rects.append(changed)
 
             # --- Mouse Events ---
             if event.type == pygame.MOUSEBUTTONDOWN:
@@ -205,12 +282,15 @@ def main():
                     # UI clicks
                     clicked_ui = False
                     if clear_button.collidepoint(event.pos):
-                        canvas.fill(BG_COLOR)
+                        recorder = SpanRecorder()
+                        dirty_rects.append(recorder.record_stroke(canvas, canvas_rect, pygame.Surface.fill, BG_COLOR))
+                        history.push(recorder.finish(), canvas.map_rgb(BG_COLOR))
                         clicked_ui = True
 
                     for tool, rect in tool_buttons.items():
                         if rect.collidepoint(event.pos):
                             active_tool = tool
+                            ui_dirty = True
                             clicked_ui = True
                             break
 
@@ -220,20 +300,23 @@ def main():
                                 boundary_color = color
                             elif event.button == 3:  # Right-click sets fill color
                                 fill_color = color
+                            ui_dirty = True
                             clicked_ui = True
                             break
 
                     # Canvas clicks
                     if not clicked_ui and event.pos[1] < CANVAS_HEIGHT:
                         x, y = event.pos
+                        recorder = SpanRecorder()
                         if 'bound' in active_tool:
                             conn = 8 if active_tool == 'bound_8' else 4
-                            active_filler = boundary_fill_iterative(canvas, x, y, fill_color, boundary_color, conn)
+                            active_filler = boundary_fill_iterative(canvas, x, y, fill_color, boundary_color, conn,
+                                                                    recorder)
                         elif 'flood' in active_tool:
                             conn = 8 if active_tool == 'flood_8' else 4
-                            active_filler = flood_fill_iterative(canvas, x, y, fill_color, conn)
+                            active_filler = flood_fill_iterative(canvas, x, y, fill_color, conn, recorder)
                         elif active_tool == 'scanline':
-                            active_filler = scanline_fill_iterative(canvas, x, y, fill_color, boundary_color)
+                            active_filler = scanline_fill_iterative(canvas, x, y, fill_color, boundary_color, recorder)
                         else:
                             drawing = True
                             start_pos = event.pos
@@ -241,7 +324,9 @@ def main():
 
             elif event.type == pygame.MOUSEMOTION:
                 if drawing and active_tool == 'pencil' and event.pos[1] < CANVAS_HEIGHT:
-                    pygame.draw.line(canvas, boundary_color, last_pos, event.pos, 2)
+                    area = stroke_bounds((last_pos, event.pos), 2)
+                    dirty_rects.append(recorder.record_stroke(canvas, area, pygame.draw.line, boundary_color, last_pos,
+                                                              event.pos, 2))
                     last_pos = event.pos
 
             elif event.type == pygame.MOUSEBUTTONUP:
@@ -251,56 +336,77 @@ def main():
                     if end_pos[1] >= CANVAS_HEIGHT: end_pos = (end_pos[0], CANVAS_HEIGHT - 1)
 
                     if active_tool == 'line':
-                        pygame.draw.line(canvas, boundary_color, start_pos, end_pos, 2)
+                        area = stroke_bounds((start_pos, end_pos), 2)
+                        dirty_rects.append(recorder.record_stroke(canvas, area, pygame.draw.line, boundary_color,
+                                                                  start_pos, end_pos, 2))
                     elif active_tool == 'rect':
                         rect = pygame.Rect(start_pos, (end_pos[0] - start_pos[0], end_pos[1] - start_pos[1]))
                         rect.normalize()
-                        pygame.draw.rect(canvas, boundary_color, rect, 2)
+                        area = stroke_bounds((rect.topleft, rect.bottomright), 2)
+                        dirty_rects.append(recorder.record_stroke(canvas, area, pygame.draw.rect, boundary_color,
+                                                                  rect, 2))
                     elif active_tool == 'circle':
                         dx = end_pos[0] - start_pos[0]
                         dy = end_pos[1] - start_pos[1]
                         radius = int(math.sqrt(dx * dx + dy * dy))
                         if radius > 0:
-                            pygame.draw.circle(canvas, boundary_color, start_pos, radius, 2)
+                            cx, cy = start_pos
+                            area = stroke_bounds(((cx - radius, cy - radius), (cx + radius, cy + radius)), 2)
+                            dirty_rects.append(recorder.record_stroke(canvas, area, pygame.draw.circle,
+                                                                      boundary_color, start_pos, radius, 2))
+                    history.push(recorder.finish(), canvas.map_rgb(boundary_color))
 
         # --- Animation Step ---
         if active_filler:
             try:
-                next(active_filler)
+                changed = next(active_filler)
+                if changed:
+                    dirty_rects.append(changed)
             except StopIteration:
                 active_filler = None
+                history.push(recorder.finish(), canvas.map_rgb(fill_color))
 
         # --- Drawing ---
-        screen.fill((50, 50, 60))  # Dark UI background
-        screen.blit(canvas, (0, 0))
-
-        # UI Panel
-        pygame.draw.rect(screen, (230, 230, 240), (0, CANVAS_HEIGHT, SCREEN_WIDTH, UI_HEIGHT))
-
-        # Draw tool buttons
-        for tool, rect in tool_buttons.items():
-            is_active = active_tool == tool
-            pygame.draw.rect(screen, (180, 190, 220) if is_active else (210, 210, 220), rect, border_radius=5)
-            pygame.draw.rect(screen, (60, 70, 100) if is_active else (150, 150, 150), rect, 2, 5)
-            label = tool.replace('_', '-').title()
-            text = font.render(label, True, (0, 0, 0))
-            screen.blit(text, text.get_rect(center=rect.center))
-
-        # Draw clear button
-        pygame.draw.rect(screen, (220, 180, 180), clear_button, border_radius=5)
-        pygame.draw.rect(screen, (100, 60, 60), clear_button, 2, 5)
-        text = font.render("Clear", True, (0, 0, 0))
-        screen.blit(text, text.get_rect(center=clear_button.center))
-
-        # Draw color palette and info
-        info_text = font.render("Left-click to set Boundary | Right-click to set Fill", True, (50, 50, 50))
-        screen.blit(info_text, (margin, CANVAS_HEIGHT + 55))
-        for color, rect in color_buttons.items():
-            pygame.draw.rect(screen, color, rect, border_radius=4)
-            if color == boundary_color:
-                pygame.draw.rect(screen, (0, 0, 0), rect, 3, 4)
-            if color == fill_color:
-                pygame.draw.rect(screen, (0, 0, 0), (rect.x + 2, rect.y + 2, rect.width - 4, rect.height - 4), 2, 4)
+        if ui_dirty:
+            # UI Panel
+            pygame.draw.rect(screen, (230, 230, 240), panel_rect)
+
+            # Draw tool buttons
+            for tool, rect in tool_buttons.items():
+                is_active = active_tool == tool
+                pygame.draw.rect(screen, (180, 190, 220) if is_active else (210, 210, 220), rect, border_radius=5)
+                pygame.draw.rect(screen, (60, 70, 100) if is_active else (150, 150, 150), rect, 2, 5)
+                screen.blit(tool_labels[tool], tool_labels[tool].get_rect(center=rect.center))
+
+            # Draw clear button
+            pygame.draw.rect(screen, (220, 180, 180), clear_button, border_radius=5)
+            pygame.draw.rect(screen, (100, 60, 60), clear_button, 2, 5)
+            screen.blit(clear_label, clear_label.get_rect(center=clear_button.center))
+
+            # Draw color palette and info
+            screen.blit(info_text, (margin, CANVAS_HEIGHT + 55))
+            for color, rect in color_buttons.items():
+                pygame.draw.rect(screen, color, rect, border_radius=4)
+                if color == boundary_color:
+                    pygame.draw.rect(screen, (0, 0, 0), rect, 3, 4)
+                if color == fill_color:
+                    pygame.draw.rect(screen, (0, 0, 0), (rect.x + 2, rect.y + 2, rect.width - 4, rect.height - 4), 2, 4)
+
+            panel_snapshot = screen.subsurface(panel_rect).copy()
+            dirty_rects.append(panel_rect)
+            ui_dirty = False
+
+        # Repair every changed area (including the old preview) from the canvas and panel
+        if preview_rect:
+            dirty_rects.append(preview_rect)
+            preview_rect = None
+        for rect in dirty_rects:
+            area = rect.clip(canvas_rect)
+            if area:
+                screen.blit(canvas, area, area)
+            area = rect.clip(panel_rect)
+            if area:
+                screen.blit(panel_snapshot, area, area.move(0, -CANVAS_HEIGHT))
 
         # Draw dynamic preview
         if drawing and start_pos and active_tool in ['line', 'rect', 'circle']:
@@ -308,19 +414,24 @@ def main():
             if current_pos[1] >= CANVAS_HEIGHT: current_pos = (current_pos[0], CANVAS_HEIGHT - 1)
 
             if active_tool == 'line':
-                pygame.draw.line(screen, (100, 100, 100), start_pos, current_pos, 1)
+                preview_rect = pygame.draw.line(screen, (100, 100, 100), start_pos, current_pos, 1)
             elif active_tool == 'rect':
                 rect = pygame.Rect(start_pos, (current_pos[0] - start_pos[0], current_pos[1] - start_pos[1]))
                 rect.normalize()
-                pygame.draw.rect(screen, (100, 100, 100), rect, 1)
+                preview_rect = pygame.draw.rect(screen, (100, 100, 100), rect, 1)
             elif active_tool == 'circle':
                 dx = current_pos[0] - start_pos[0]
                 dy = current_pos[1] - start_pos[1]
                 radius = int(math.sqrt(dx * dx + dy * dy))
                 if radius > 0:
-                    pygame.draw.circle(screen, (100, 100, 100), start_pos, radius, 1)
-
-        pygame.display.flip()
+                    preview_rect = pygame.draw.circle(screen, (100, 100, 100), start_pos, radius, 1)
+            if preview_rect:
+                dirty_rects.append(preview_rect)
+
+        # Push only the changed regions to the display
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+            dirty_rects = []
 
     pygame.quit()
     sys.exit()
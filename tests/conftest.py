@@ -0,0 +1,146 @@
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+
+def load_script(filename, name):
+    """Imports one of the repository's scripts (most have spaces in their names) as module 'name'."""
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module  # Registered first so pool workers can unpickle its functions
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+EXPOSE = 'expose'
+
+
+def run_app(main, frames):
+    """
+    Runs a script's pygame main loop on scripted input. 'frames' is a list of event lists, one
+    per pass of the loop; QUIT is sent once they run out. Every update() call copies only the
+    rects it is given to a mirror of the screen, and at the start of each pass the mirror must
+    equal the screen. A frame given as EXPOSE sends VIDEOEXPOSE, which makes the apps repaint
+    the whole window; the pass must leave the mirror unchanged, so nothing stale was on show.
+    Returns the number of update() calls made during each pass.
+    """
+    import pygame
+    import pytest
+
+    frames = list(frames)
+    state = {'mirror': None, 'pos': (0, 0), 'before_expose': None}
+    counts = []
+
+    def presented():
+        screen = pygame.display.get_surface()
+        if state['mirror'] is None:
+            state['mirror'] = pygame.Surface(screen.get_size())
+        return screen, state['mirror']
+
+    def update(rects=None):
+        screen, mirror = presented()
+        if rects is None:
+            rects = [screen.get_rect()]
+        elif isinstance(rects, pygame.Rect) or (len(rects) == 4 and isinstance(rects[0], int)):
+            rects = [rects]
+        for rect in rects:
+            if rect:
+                area = pygame.Rect(rect).clip(screen.get_rect())
+                mirror.blit(screen, area, area)
+        counts[-1] += 1
+
+    def get(*args, **kwargs):
+        if counts:
+            screen, mirror = presented()
+            assert (pygame.surfarray.array3d(mirror) == pygame.surfarray.array3d(screen)).all(), \
+                "frame %d left the display out of date" % (len(counts) - 1)
+            if state['before_expose'] is not None:
+                assert (pygame.surfarray.array3d(mirror) == state['before_expose']).all(), \
+                    "a full repaint at frame %d changed what was on show" % (len(counts) - 1)
+                state['before_expose'] = None
+        counts.append(0)
+        events = frames.pop(0) if frames else [pygame.event.Event(pygame.QUIT)]
+        if events is EXPOSE:
+            state['before_expose'] = pygame.surfarray.array3d(presented()[1])
+            events = [pygame.event.Event(pygame.VIDEOEXPOSE)]
+        for event in events:
+            if hasattr(event, 'pos'):
+                state['pos'] = event.pos
+        return events
+
+    patch = pytest.MonkeyPatch()
+    patch.setattr(pygame.event, 'get', get)
+    patch.setattr(pygame.event, 'wait', lambda *args, **kwargs: pygame.event.Event(pygame.NOEVENT))
+    patch.setattr(pygame.mouse, 'get_pos', lambda: state['pos'])
+    patch.setattr(pygame.display, 'update', update)
+    patch.setattr(pygame.display, 'flip', lambda: update())
+    try:
+        with pytest.raises(SystemExit):
+            main()
+    finally:
+        patch.undo()
+    return counts
+
+
+def drawing_session(tool_x, fill_tool, canvas_height):
+    """
+    Scripted input for the fill visualizers: a pencil stroke, a rectangle drawn with a live
+    preview, a fill inside it, two undos and a redo, followed by idle passes.
+    'tool_x(name)' returns the x coordinate of a tool button.
+    """
+    import pygame
+
+    def click(pos, button=1):
+        return [pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=button),
+                pygame.event.Event(pygame.MOUSEBUTTONUP, pos=pos, button=button)]
+
+    def motion(pos):
+        return pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(1, 0, 0))
+
+    def ctrl(key):
+        return [pygame.event.Event(pygame.KEYDOWN, key=key, mod=pygame.KMOD_CTRL, unicode='', scancode=0)]
+
+    button_y = canvas_height + 25
+    return [
+        [],
+        [pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(100, 100), button=1)],
+        [motion((150, 120)), motion((200, 100))],
+        [pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(200, 100), button=1)],
+        click((tool_x('rect'), button_y)),
+        [pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(300, 300), button=1)],
+        [motion((340, 330))],
+        EXPOSE,
+        [motion((360, 350))],
+        EXPOSE,
+        [pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(360, 350), button=1)],
+        EXPOSE,
+        click((tool_x(fill_tool), button_y)),
+        click((330, 325)),
+    ] + [[]] * 20 + [
+        EXPOSE,
+        ctrl(pygame.K_z), EXPOSE, ctrl(pygame.K_z), EXPOSE, ctrl(pygame.K_y),
+        EXPOSE, [], [],
+    ]
+
+
+def naive_boundary_fill(surface, x, y, fill_color, boundary_color, connectivity=4):
+    """Reference boundary fill that reads every pixel with get_at() when it is popped."""
+    steps = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+    if connectivity == 8:
+        steps += [(1, 1), (-1, 1), (1, -1), (-1, -1)]
+    width, height = surface.get_size()
+    stack = [(x, y)]
+    while stack:
+        px, py = stack.pop()
+        if not (0 <= px < width and 0 <= py < height):
+            continue
+        color = surface.get_at((px, py))
+        if color == boundary_color or color == fill_color:
+            continue
+        surface.set_at((px, py), fill_color)
+        stack.extend((px + dx, py + dy) for dx, dy in steps)
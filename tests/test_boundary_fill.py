@@ -0,0 +1,70 @@
+import random
+
+import numpy as np
+import pygame
+import pytest
+
+from conftest import drawing_session, load_script, naive_boundary_fill, run_app
+
+boundary_fill = load_script('boundary fillinf.py', 'boundary_fill')
+
+BOUNDARY, FILL = (0, 0, 0), (0, 200, 0)
+
+
+def make_canvas(seed, size=(160, 120)):
+    """Random boundary strokes plus a few blobs that are already fill colored."""
+    rng = random.Random(seed)
+    width, height = size
+    surface = pygame.Surface(size)
+    surface.fill((255, 255, 255))
+    for _ in range(12):
+        pygame.draw.line(surface, BOUNDARY, (rng.randrange(width), rng.randrange(height)),
+                         (rng.randrange(width), rng.randrange(height)))
+    for _ in range(4):
+        pygame.draw.circle(surface, FILL, (rng.randrange(width), rng.randrange(height)), rng.randint(2, 8))
+    return surface
+
+
+def fill(filler, surface, *args, **kwargs):
+    recorder = boundary_fill.SpanRecorder()
+    for _ in filler(surface, *args, recorder=recorder, **kwargs):
+        pass
+    return pygame.surfarray.array2d(surface), recorder.finish()
+
+
+@pytest.mark.parametrize('connectivity', [4, 8])
+@pytest.mark.parametrize('max_stack', [1, 3, boundary_fill.MAX_STACK_ENTRIES])
+def test_bitset_fill_matches_iterative_fill(connectivity, max_stack):
+    for seed in range(10):
+        canvas = make_canvas(seed)
+        x, y = random.Random(seed).randrange(160), random.Random(-seed).randrange(120)
+        expected = fill(boundary_fill.boundary_fill_iterative, canvas.copy(), x, y, FILL, BOUNDARY, connectivity)
+        result = fill(boundary_fill.boundary_fill_bitset, canvas.copy(), x, y, FILL, BOUNDARY, connectivity,
+                      max_stack=max_stack)
+        assert np.array_equal(result[0], expected[0])
+        assert np.array_equal(result[1], expected[1])
+
+
+@pytest.mark.parametrize('connectivity', [4, 8])
+def test_iterative_fill_matches_per_pixel_fill(connectivity):
+    for seed in range(10):
+        canvas = make_canvas(seed)
+        x, y = random.Random(seed).randrange(160), random.Random(-seed).randrange(120)
+        expected = canvas.copy()
+        naive_boundary_fill(expected, x, y, FILL, BOUNDARY, connectivity)
+        pixels, spans = fill(boundary_fill.boundary_fill_iterative, canvas, x, y, FILL, BOUNDARY, connectivity)
+        assert np.array_equal(pixels, pygame.surfarray.array2d(expected))
+        changed = np.count_nonzero(pixels != pygame.surfarray.array2d(make_canvas(seed)))
+        assert int((spans[:, 2] - spans[:, 1] + 1).sum()) == changed
+
+
+def test_main_presents_every_change_with_dirty_rects():
+    """The dirty rects pushed by main() keep the display identical to a full redraw, and idle passes push nothing."""
+    tools = ['pencil', 'line', 'rect', 'circle', 'fill_4', 'fill_8', 'bitset_4', 'bitset_8']
+
+    def tool_x(tool):
+        return 10 + tools.index(tool) * (70 + 10) + 5
+
+    counts = run_app(boundary_fill.main, drawing_session(tool_x, 'fill_4', boundary_fill.CANVAS_HEIGHT))
+    assert counts[-3:-1] == [0, 0]
+    assert counts[0] > 0
@@ -0,0 +1,48 @@
+import pytest
+
+from clip_window import ClipWindow
+
+
+@pytest.mark.parametrize('corners', [((100, 100), (100, 100)), ((100, 50), (100, 300)), ((20, 80), (400, 80))])
+def test_window_without_area_is_rejected(corners):
+    with pytest.raises(ValueError, match="encloses no area"):
+        ClipWindow.from_corners(*corners)
+
+
+def test_repeated_vertices_are_dropped():
+    window = ClipWindow([(0, 0), (0, 0), (0, 10), (10, 10), (10, 10), (10, 0)])
+    assert len(window.planes) == 4 and window.is_rectangle
+    assert window.contains(5, 5) and not window.contains(11, 5)
+
+
+@pytest.mark.parametrize('vertices', [
+    [(0, 0), (10, 0), (5, 2), (10, 10), (0, 10)],  # Reflex vertex at (5, 2)
+    [(0, 0), (10, 10), (10, 0), (0, 14)],  # Bow tie
+    [(50, 0), (80, 95), (0, 35), (100, 35), (20, 95)],  # Pentagram: every turn goes the same way
+])
+def test_non_convex_window_is_rejected(vertices):
+    with pytest.raises(ValueError, match="not convex"):
+        ClipWindow(vertices)
+
+
+def test_convex_window_with_collinear_vertex_is_accepted():
+    window = ClipWindow([(0, 0), (5, 0), (10, 0), (10, 10), (0, 10)])
+    assert window.contains(8, 5) and window.contains(5, 0) and not window.contains(5, -1)
+    assert ClipWindow(window.vertices[::-1]).vertices.tolist() == window.vertices.tolist()
+
+
+def test_intersect_solves_exactly_when_floats_cannot_separate_the_ends():
+    window = ClipWindow([(0.1, 0.3), (7.7, 9.1), (9.3, 0.7)])
+    # An endpoint exactly on edge 2 and one an ulp outside it: both sides round to the same float
+    p1, p2 = (7.861473985902347, 8.25226157401268), (7.8614739859023475, 8.252261574012678)
+    assert window.side(2, *p1) == window.side(2, *p2)
+    x, y = window.intersect(2, p1, p2)
+    assert min(p1[0], p2[0]) <= x <= max(p1[0], p2[0]) and min(p1[1], p2[1]) <= y <= max(p1[1], p2[1])
+
+
+def test_intersect_degenerate_segments():
+    window = ClipWindow.from_bounds(0, 0, 10, 10)
+    assert window.intersect(0, (0, 2), (0, 8)) == (0, 2)  # Along the edge itself
+    assert window.intersect(0, (3, 2), (3, 8)) == (3, 2)  # Parallel to it
+    assert window.intersect(0, (0, 5), (-4, 5)) == (0.0, 5.0)  # Starting on the edge
+    assert window.intersect(0, (1e308, 5), (-1e308, 5)) == (0.0, 5.0)  # Side values overflow
@@ -0,0 +1,31 @@
+import os
+import runpy
+
+import pygame
+
+from conftest import EXPOSE, ROOT, run_app
+
+
+def test_app_presents_only_when_something_changes():
+    """The app redraws on new lines, previews, clears and exposes, and leaves the display alone otherwise."""
+    def down(pos):
+        return pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1)
+
+    def up(pos):
+        return pygame.event.Event(pygame.MOUSEBUTTONUP, pos=pos, button=1)
+
+    def motion(pos):
+        return pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(1, 0, 0))
+
+    clear = pygame.event.Event(pygame.KEYDOWN, key=pygame.K_c, mod=0, unicode='c', scancode=0)
+    frames = [
+        [], [],
+        [down((100, 100))], [motion((300, 200))], EXPOSE, [up((300, 200))],
+        [], [motion((500, 500))], [],
+        [down((250, 50))], [up((700, 400))], EXPOSE,
+        [clear], [], EXPOSE, [],
+    ]
+    counts = run_app(lambda: runpy.run_path(os.path.join(ROOT, 'cohen sutherland.py')), frames)
+    assert counts[:6] == [1, 0, 1, 1, 1, 1]
+    assert counts[6:9] == [0, 0, 0]  # Idle, and moving the mouse without a line preview
+    assert counts[9:] == [1, 1, 1, 1, 0, 1, 0, 0]
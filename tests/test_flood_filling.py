@@ -0,0 +1,279 @@
+import math
+import os
+import random
+import subprocess
+import sys
+
+import numpy as np
+import pygame
+import pytest
+
+from conftest import drawing_session, load_script, naive_boundary_fill, run_app
+
+flood_filling = load_script('flood filling.py', 'flood_filling')
+
+
+def make_canvas():
+    width, height = flood_filling.CANVAS_WIDTH, flood_filling.CANVAS_HEIGHT
+    surface = pygame.Surface((width, height))
+    surface.fill((255, 255, 255))
+    for x in range(0, width, 37):
+        pygame.draw.line(surface, (0, 0, 0), (x, 0), (x + 90, height - 1))
+    pygame.draw.circle(surface, (0, 0, 0), (width // 2, height // 2), 120, 1)
+    return surface
+
+
+def run(filler):
+    for _ in filler:
+        pass
+
+
+def parallel_fills_after_pygame_init():
+    """Runs parallel fills after pygame.init(), as the app does, and compares them with the sequential fill."""
+    pygame.init()
+    expected = make_canvas()
+    run(flood_filling.flood_fill_iterative(expected, 5, 5, (255, 0, 0)))
+    expected_pixels = pygame.surfarray.array2d(expected)
+    with flood_filling.FillPool(4) as pool:
+        for i in range(10):
+            surface = make_canvas()
+            flood_filling.parallel_fill_surface(surface, 5, 5, (255, 0, 0), tile_size=64, pool=pool)
+            assert (pygame.surfarray.array2d(surface) == expected_pixels).all()
+            if i == 0:
+                workers, buffer = pool.pool, pool.shm
+            assert pool.pool is workers and pool.shm is buffer  # One pool and buffer for every fill
+
+    # The session-wide pool is shut down at exit
+    surface = make_canvas()
+    flood_filling.parallel_fill_surface(surface, 5, 5, (255, 0, 0), tile_size=64)
+    assert (pygame.surfarray.array2d(surface) == expected_pixels).all()
+    pygame.quit()
+
+
+def test_parallel_fill_after_pygame_init():
+    # Run in a child process so a pool that never shuts down fails the test instead of hanging it
+    subprocess.run([sys.executable, '-c', 'import test_flood_filling; test_flood_filling.parallel_fills_after_pygame_init()'],
+                   cwd=os.path.dirname(os.path.abspath(__file__)), timeout=120, check=True)
+
+
+def test_styled_boundary_region_stops_at_fill_color():
+    surface = pygame.Surface((flood_filling.CANVAS_WIDTH, flood_filling.CANVAS_HEIGHT))
+    surface.fill((255, 255, 255))
+    pygame.draw.rect(surface, (0, 0, 0), (10, 10, 60, 40), 1)
+    pygame.draw.line(surface, (255, 0, 0), (40, 11), (40, 48))  # Already painted with the fill color
+
+    expected = surface.copy()
+    run(flood_filling.boundary_fill_iterative(expected, 20, 20, (255, 0, 0), (0, 0, 0)))
+    spans = flood_filling.fill_region_spans(surface, 20, 20, 4, (0, 0, 0), (255, 0, 0))
+    flood_filling.shade_spans(surface, spans, flood_filling.pattern_shader([[(255, 0, 0)]]))
+
+    assert (pygame.surfarray.array2d(surface) == pygame.surfarray.array2d(expected)).all()
+    assert spans[:, 2].max() == 39
+
+
+def finish(filler):
+    try:
+        while True:
+            next(filler)
+    except StopIteration as done:
+        return done.value
+
+
+def test_fill_results_agree_across_fill_modes():
+    surface = pygame.Surface((flood_filling.CANVAS_WIDTH, flood_filling.CANVAS_HEIGHT))
+    surface.fill((255, 255, 255))
+    pygame.draw.circle(surface, (0, 0, 0), (120, 90), 50, 2)
+    pygame.draw.line(surface, (0, 0, 0), (70, 90), (170, 60), 2)
+
+    flood = finish(flood_filling.flood_fill_iterative(surface.copy(), 120, 100, (255, 0, 0)))
+    boundary = finish(flood_filling.boundary_fill_iterative(surface.copy(), 120, 100, (255, 0, 0), (0, 0, 0)))
+    shader = flood_filling.region_shader('radial', (120, 100), (255, 0, 0))
+    styled = finish(flood_filling.styled_fill(surface.copy(), 120, 100, shader, boundary_color=(0, 0, 0)))
+
+    assert flood[:4] == boundary[:4] == styled[:4]
+    assert flood.span_count == flood.bbox.height  # A convex region has one span per row
+
+
+def test_fill_stats_spans_match_pixels():
+    rng = np.random.default_rng(7)
+    mask = rng.random((40, 60)) < 0.6  # (rows, columns) of filled pixels
+    by_pixel, by_span = flood_filling.FillStats(60, 40), flood_filling.FillStats(60, 40)
+    for y, x in zip(*np.nonzero(mask)):
+        by_pixel.add(int(x), int(y))
+    for y in rng.permutation(40).tolist():  # Rows in any order, like a stack-driven fill
+        row = np.concatenate(([0], mask[y].astype(np.int8), [0]))
+        edges = np.flatnonzero(np.diff(row))
+        for x0, x1 in zip(edges[::2].tolist(), (edges[1::2] - 1).tolist()):
+            by_span.add_span(y, x0, x1)
+
+    padded = np.pad(mask, 1).astype(np.int8)
+    perimeter = int(np.abs(np.diff(padded, axis=0)).sum() + np.abs(np.diff(padded, axis=1)).sum())
+    spans = int((np.diff(padded, axis=1) == 1).sum())
+    ys, xs = np.nonzero(mask)
+    bbox = pygame.Rect(xs.min(), ys.min(), xs.max() - xs.min() + 1, ys.max() - ys.min() + 1)
+    assert by_pixel.result()[:4] == by_span.result()[:4] == (int(mask.sum()), bbox, spans, perimeter)
+
+
+def test_batch_flood_fill_shares_regions_between_seeds():
+    surface = pygame.Surface((200, 100))
+    surface.fill((255, 255, 255))
+    pygame.draw.line(surface, (0, 0, 0), (100, 0), (100, 99))
+
+    seeds = [(10, 10), (150, 50), (90, 90), (300, 5), (100, 40)]
+    colors = [(255, 0, 0), (0, 0, 255), (0, 255, 0), (0, 255, 0), (0, 255, 0)]
+    labels, results = flood_filling.batch_flood_fill(surface, seeds, colors)
+
+    assert labels.tolist() == [0, 1, 0, -1, 4]
+    assert [result is not None for result in results] == [True, True, False, False, True]
+    assert results[0].pixel_count == 100 * 100 and results[4].pixel_count == 100
+    pixels = pygame.surfarray.array2d(surface)
+    assert (pixels[:100] == surface.map_rgb((255, 0, 0))).all()
+    assert (pixels[100] == surface.map_rgb((0, 255, 0))).all()
+    assert (pixels[101:] == surface.map_rgb((0, 0, 255))).all()
+
+
+def naive_tolerance_fill(surface, x, y, fill_color, tolerance, connectivity, distance):
+    """Reference flood fill that measures each pixel's color distance to the seed as it is reached."""
+    original = surface.copy()
+    seed = original.get_at((x, y))
+    seen, stack, count = {(x, y)}, [(x, y)], 0
+    steps = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+    if connectivity == 8:
+        steps += [(1, 1), (-1, 1), (1, -1), (-1, -1)]
+    while stack:
+        px, py = stack.pop()
+        if distance(original.get_at((px, py)), seed) > tolerance:
+            continue
+        surface.set_at((px, py), fill_color)
+        count += 1
+        for dx, dy in steps:
+            nx, ny = px + dx, py + dy
+            if 0 <= nx < surface.get_width() and 0 <= ny < surface.get_height() and (nx, ny) not in seen:
+                seen.add((nx, ny))
+                stack.append((nx, ny))
+    return count
+
+
+def rgb_distance(a, b):
+    return math.dist(tuple(a)[:3], tuple(b)[:3])
+
+
+def lab_distance(a, b):
+    lab = flood_filling._rgb_to_lab(np.array([tuple(a)[:3], tuple(b)[:3]], dtype=np.float32))
+    return math.dist(lab[0], lab[1])
+
+
+@pytest.mark.parametrize('tolerance, connectivity, color_space', [
+    (0, 4, 'rgb'), (30, 4, 'rgb'), (30, 8, 'rgb'), (90, 4, 'rgb'), (12, 4, 'lab'), (12, 8, 'lab')])
+def test_tolerance_fill_matches_per_pixel_distance(tolerance, connectivity, color_space):
+    rng = random.Random(tolerance + connectivity)
+    surface = pygame.Surface((flood_filling.CANVAS_WIDTH, flood_filling.CANVAS_HEIGHT))
+    surface.fill((0, 0, 0))
+    pygame.draw.rect(surface, (240, 240, 240), (20, 20, 160, 120))
+    for _ in range(40):  # Antialiased strokes and near-white speckles inside the area
+        color = [rng.randrange(256) for _ in range(3)]
+        pygame.draw.aaline(surface, color, (rng.randrange(20, 180), rng.randrange(20, 140)),
+                           (rng.randrange(20, 180), rng.randrange(20, 140)))
+        shade = [rng.randrange(200, 256) for _ in range(3)]
+        surface.set_at((rng.randrange(20, 180), rng.randrange(20, 140)), shade)
+
+    expected = surface.copy()
+    distance = lab_distance if color_space == 'lab' else rgb_distance
+    count = naive_tolerance_fill(expected, 25, 25, (255, 0, 0), tolerance, connectivity, distance)
+    result = finish(flood_filling.flood_fill_iterative(surface, 25, 25, (255, 0, 0), connectivity,
+                                                       tolerance=tolerance, color_space=color_space))
+
+    assert (pygame.surfarray.array2d(surface) == pygame.surfarray.array2d(expected)).all()
+    assert result.pixel_count == count
+
+
+@pytest.mark.parametrize('connectivity', [4, 8])
+def test_boundary_fill_matches_per_pixel_fill(connectivity):
+    rng = random.Random(connectivity)
+    surface = pygame.Surface((flood_filling.CANVAS_WIDTH, flood_filling.CANVAS_HEIGHT))
+    surface.fill((255, 255, 255))
+    pygame.draw.rect(surface, (0, 0, 0), (10, 10, 240, 160), 1)
+    for _ in range(30):
+        color = rng.choice([(0, 0, 0), (255, 0, 0), (0, 0, 255)])
+        pygame.draw.line(surface, color, (rng.randrange(10, 250), rng.randrange(10, 170)),
+                         (rng.randrange(10, 250), rng.randrange(10, 170)))
+
+    for seed in [(20, 20), (120, 90), (200, 150), (11, 168)]:
+        expected = surface.copy()
+        naive_boundary_fill(expected, *seed, (255, 0, 0), (0, 0, 0), connectivity)
+        filled = surface.copy()
+        recorder = flood_filling.SpanRecorder()
+        result = finish(flood_filling.boundary_fill_iterative(filled, *seed, (255, 0, 0), (0, 0, 0), connectivity,
+                                                              recorder))
+        changed = pygame.surfarray.array2d(filled) != pygame.surfarray.array2d(surface)
+        assert (pygame.surfarray.array2d(filled) == pygame.surfarray.array2d(expected)).all()
+        if result is not None:
+            assert result.pixel_count == int((recorder.finish()[:, 2] - recorder.finish()[:, 1] + 1).sum())
+            assert result.pixel_count == np.count_nonzero(changed)
+
+
+def test_main_presents_every_change_with_dirty_rects():
+    """The dirty rects pushed by main() keep the display identical to a full redraw, and idle passes push nothing."""
+    tools = ['pencil', 'line', 'rect', 'circle', 'bound_4', 'bound_8', 'flood_4', 'flood_8']
+
+    def tool_x(tool):
+        return 8 + tools.index(tool) * (65 + 8) + 5
+
+    counts = run_app(flood_filling.main, drawing_session(tool_x, 'flood_4', flood_filling.CANVAS_HEIGHT))
+    assert counts[-3:-1] == [0, 0]
+    assert counts[0] > 0
+
+
+def naive_array_fill(pixels, x, y, fill_value, connectivity=4, boundary_value=None):
+    """Reference stack fill over a (height, width) array of packed colors, one pixel at a time."""
+    height, width = pixels.shape
+    target = pixels[y, x]
+    steps = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+    if connectivity == 8:
+        steps += [(1, 1), (-1, 1), (1, -1), (-1, -1)]
+    stack, count = [(x, y)], 0
+    while stack:
+        px, py = stack.pop()
+        if not (0 <= px < width and 0 <= py < height):
+            continue
+        value = pixels[py, px]
+        if boundary_value is None:
+            if value != target:
+                continue
+        elif value == boundary_value or value == fill_value:
+            continue
+        pixels[py, px] = fill_value
+        count += 1
+        stack.extend((px + dx, py + dy) for dx, dy in steps)
+    return count
+
+
+@pytest.mark.parametrize('connectivity', [4, 8])
+@pytest.mark.parametrize('boundary_value', [None, 0])
+def test_tiled_fill_matches_per_pixel_fill(connectivity, boundary_value):
+    rng = random.Random(connectivity)
+    canvas = flood_filling.TiledCanvas(150, 100, 0xFFFFFF, tile_size=16)
+    for _ in range(6):
+        flood_filling.tiled_line(canvas, (rng.randrange(150), rng.randrange(100)),
+                                 (rng.randrange(150), rng.randrange(100)), rng.choice([0, 0x0000FF]))
+    flood_filling.tiled_line(canvas, (0, 50), (149, 50), 0xFF0000)  # Already the fill color
+
+    for seed, fill_value in [((5, 5), 0xFF0000), ((140, 95), 0x00FF00), ((75, 30), 0xFFFFFF), ((2, 98), 0xFF0000)]:
+        expected = canvas.read_rect(0, 0, 150, 100)
+        if expected[seed[1], seed[0]] in (fill_value, boundary_value):
+            continue
+        count = naive_array_fill(expected, *seed, fill_value, connectivity, boundary_value)
+        written = canvas.slot_count
+        assert flood_filling.tiled_fill(canvas, *seed, fill_value, connectivity, boundary_value) == count
+        assert np.array_equal(canvas.read_rect(0, 0, 150, 100), expected)
+        assert canvas.slot_count == written  # Filling never gives an unwritten tile a slot
+    canvas.close()
+
+
+def test_tiled_fill_of_blank_canvas_touches_no_pixels():
+    canvas = flood_filling.TiledCanvas(20000, 20000, 0xFFFFFF)
+    assert flood_filling.tiled_fill(canvas, 10, 10, 0xFF0000) == 20000 * 20000
+    assert canvas.slot_count == 0 and not canvas.resident
+    assert canvas.get_pixel(19999, 19999) == 0xFF0000
+    assert (canvas.read_rect(-5, 19990, 20, 20)[:10, 5:] == 0xFF0000).all()
+    canvas.close()
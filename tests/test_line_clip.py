@@ -0,0 +1,84 @@
+import numpy as np
+import pygame
+import pytest
+
+from clip_window import ClipWindow
+from conftest import load_script
+from line_clip import cohen_sutherland_clip_batch
+
+line_clipping = load_script('line clipping.py', 'line_clipping')
+
+
+def random_lines(rng, n, width=800, height=600):
+    """Lines with endpoints anywhere around an 800x600 area, plus axis-parallel ones."""
+    lines = rng.uniform((-200, -200, -200, -200), (width + 200, height + 200) * 2, (n, 4))
+    lines[:n // 8, 2] = lines[:n // 8, 0]  # Vertical
+    lines[n // 8:n // 4, 3] = lines[n // 8:n // 4, 1]  # Horizontal
+    return lines
+
+
+@pytest.mark.parametrize('window', [ClipWindow.from_bounds(200, 150, 600, 450),
+                                    ClipWindow.from_rect(pygame.Rect(200, 150, 400, 300)),
+                                    ClipWindow.from_bounds(0, 0, 10, 700)])
+def test_batch_cohen_sutherland_matches_scalar(window):
+    lines = random_lines(np.random.default_rng(0), 4000)
+    clipped, accepted = cohen_sutherland_clip_batch(lines, **window)
+    for line, result, keep in zip(lines.tolist(), clipped.tolist(), accepted.tolist()):
+        expected = line_clipping.cohen_sutherland_clip(*line, **window)
+        assert keep == (expected is not None)
+        if keep:
+            assert result == pytest.approx(expected, abs=1e-9)
+
+
+@pytest.mark.parametrize('distribution', ['inside', 'outside', 'crossing'])
+def test_clip_engines_agree_on_random_lines(distribution):
+    window = {'xmin': 200, 'ymin': 150, 'xmax': 600, 'ymax': 450}
+    rng = np.random.default_rng(1)
+    lines = np.vstack((line_clipping.make_benchmark_lines(distribution, 3000, window, rng), random_lines(rng, 1000)))
+
+    cs = line_clipping.CLIP_ENGINES['cohen-sutherland']
+    lb = line_clipping.CLIP_ENGINES['liang-barsky']
+    cs_clipped, cs_accepted = cs.clip_batch(lines, **window)
+    lb_clipped, lb_accepted = lb.clip_batch(lines, **window)
+    assert np.array_equal(cs_accepted, lb_accepted)
+    np.testing.assert_allclose(cs_clipped[cs_accepted], lb_clipped[lb_accepted], atol=1e-7)
+
+    for line, keep, result in zip(lines[:500].tolist(), lb_accepted.tolist(), lb_clipped.tolist()):
+        expected = lb.clip(*line, **window)
+        assert keep == (expected is not None)
+        if keep:
+            assert result == pytest.approx(expected, abs=1e-9)
+
+
+def test_segment_grid_query_matches_brute_force():
+    rng = np.random.default_rng(2)
+    lines = np.vstack((line_clipping.random_lines(5000, rng),
+                       rng.uniform(-500, 1300, (50, 4))))  # Long lines that land in the overflow list
+    grid = line_clipping.SegmentGrid(lines)
+    assert len(grid.overflow)
+    boxes = np.column_stack((np.minimum(lines[:, 0], lines[:, 2]), np.minimum(lines[:, 1], lines[:, 3]),
+                             np.maximum(lines[:, 0], lines[:, 2]), np.maximum(lines[:, 1], lines[:, 3])))
+    for _ in range(50):
+        rects = []
+        for _ in range(rng.integers(1, 4)):
+            x0, y0 = rng.uniform(-100, 900, 2)
+            rects.append((x0, y0, x0 + rng.uniform(0, 300), y0 + rng.uniform(0, 300)))
+        expected = np.zeros(len(lines), dtype=bool)
+        for xmin, ymin, xmax, ymax in rects:
+            expected |= (boxes[:, 0] <= xmax) & (boxes[:, 2] >= xmin) & (boxes[:, 1] <= ymax) & (boxes[:, 3] >= ymin)
+        assert np.array_equal(np.sort(grid.query(rects)), np.flatnonzero(expected))
+
+
+@pytest.mark.parametrize('engine', list(line_clipping.CLIP_ENGINES))
+def test_incremental_clipper_matches_full_reclip(engine):
+    rng = np.random.default_rng(3)
+    lines = line_clipping.random_lines(20000, rng)
+    window = ClipWindow.from_bounds(200, 150, 600, 450)
+    clipper = line_clipping.IncrementalClipper(lines, window, engine)
+    for _ in range(20):
+        mode = rng.choice(['move', 'resize'])
+        window = line_clipping.dragged_window(mode, (0, 0), window, tuple(rng.uniform(-60, 60, 2)))
+        reclipped = clipper.set_window(window)
+        assert reclipped < len(lines)
+        expected = line_clipping.clip_lines(lines, window, engine)
+        assert np.array_equal(clipper.visible(), expected)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from conftest import load_script
+
+point_clipping = load_script('point clipping.py', 'point_clipping')
+
+
+def point_cloud(rng):
+    """Uniform points, a dense cluster, repeated points and points on whole-pixel coordinates."""
+    return np.vstack((rng.uniform(0, 800, (20000, 2)),
+                      rng.normal(400, 5, (5000, 2)),
+                      np.repeat(rng.uniform(0, 800, (50, 2)), 20, axis=0),
+                      rng.integers(0, 800, (5000, 2)))).astype(np.float32)
+
+
+@pytest.mark.parametrize('cell_size', [1, point_clipping.POINT_GRID_CELL, 100])
+def test_point_grid_query_matches_points_inside(cell_size):
+    rng = np.random.default_rng(cell_size)
+    points = point_cloud(rng)
+    grid = point_clipping.PointGrid(points, cell_size)
+    windows = [(200, 150, 600, 450), (0, 0, 800, 800), (395, 395, 405, 405), (-50, -50, -10, -10),
+               (100, 100, 100, 100), (700, 10, 1000, 900)]
+    for _ in range(40):
+        x0, y0 = rng.integers(-100, 800, 2)
+        windows.append((int(x0), int(y0), int(x0 + rng.integers(0, 300)), int(y0 + rng.integers(0, 300))))
+    for window in windows:
+        expected = np.flatnonzero(point_clipping.points_inside(points, *window))
+        assert np.array_equal(np.sort(grid.query(*window)), expected), window
+
+
+def test_update_points_colors_match_points_inside(monkeypatch):
+    rng = np.random.default_rng(4)
+    chunks = [rng.uniform(0, 800, (n, 2)) for n in (1, 5, 1500, 3, 40000)]
+    for chunk in chunks:
+        point_clipping.update_points(chunk)
+    points = np.vstack(chunks).astype(np.float32)
+    assert np.array_equal(point_clipping.points, points)
+
+    window = {'xmin': 150, 'ymin': 100, 'xmax': 520, 'ymax': 610}
+    monkeypatch.setattr(point_clipping, 'state', 'clipped')
+    monkeypatch.setattr(point_clipping, 'clipping_window_params', window)
+    point_clipping.update_points()
+    inside = point_clipping.points_inside(points, **window)
+    assert np.array_equal(point_clipping.inside_mask, inside)
+    assert (point_clipping.point_colors[inside] == np.float32(point_clipping.INSIDE_COLOR)).all()
+    assert (point_clipping.point_colors[~inside] == np.float32(point_clipping.OUTSIDE_COLOR)).all()
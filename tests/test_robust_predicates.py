@@ -0,0 +1,78 @@
+import math
+from fractions import Fraction
+
+import pytest
+
+from robust_predicates import orient2d, orient2d_exact, point_on_segment, segment_crossing
+
+
+def naive_orient2d(a, b, c):
+    det = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+    return (det > 0) - (det < 0)
+
+
+@pytest.mark.parametrize('a, b, c, expected', [
+    ((0, 0), (10, 0), (5, 5), 1),
+    ((0, 0), (10, 0), (5, -5), -1),
+    ((0, 0), (10, 10), (20, 20), 0),
+    ((0, 0), (10, 10), (10, 10), 0),  # Repeated point
+    ((3, 3), (3, 3), (3, 3), 0),
+    ((0, 0), (2 ** 60, 2 ** 60 + 1), (2 ** 61, 2 ** 61 + 2), 0),  # Collinear beyond float precision
+    ((0.1, 0.1), (0.2, 0.2), (0.3, 0.3), orient2d_exact((0.1, 0.1), (0.2, 0.2), (0.3, 0.3))),
+])
+def test_orient2d_known_cases(a, b, c, expected):
+    assert orient2d(a, b, c) == expected
+    assert orient2d_exact(a, b, c) == expected
+
+
+def test_orient2d_matches_exact_sign_near_a_line():
+    """Shewchuk's test: points a few ulps off the line through (12, 12) and (24, 24)."""
+    ulp = 2.0 ** -53
+    disagreements = 0
+    for i in range(64):
+        for j in range(64):
+            a = (0.5 + i * ulp, 0.5 + j * ulp)
+            expected = orient2d_exact(a, (12, 12), (24, 24))
+            assert orient2d(a, (12, 12), (24, 24)) == expected
+            disagreements += naive_orient2d(a, (12, 12), (24, 24)) != expected
+    assert disagreements  # The float determinant alone gets some of these wrong
+
+
+@pytest.mark.parametrize('segments', [
+    ((0, 0), (10, 0), (10, 0), (20, 5)),  # Touch at a shared endpoint
+    ((0, 0), (10, 0), (5, 0), (5, 5)),  # T-junction: an endpoint on the other's interior
+    ((0, 0), (10, 0), (5, 0), (15, 0)),  # Collinear overlap
+    ((0, 0), (10, 0), (12, 0), (15, 0)),  # Collinear, disjoint
+    ((0, 0), (10, 0), (0, 1), (10, 1)),  # Parallel
+    ((0, 0), (10, 0), (4, 4), (4, 4)),  # Zero-length segment
+])
+def test_segment_crossing_ignores_degenerate_contacts(segments):
+    p1, p2, p3, p4 = segments
+    assert segment_crossing(p1, p2, p3, p4) is None
+    assert segment_crossing(p3, p4, p1, p2) is None
+
+
+def test_segment_crossing_point_is_exact_when_representable():
+    assert segment_crossing((0, 0), (2, 2), (0, 2), (2, 0)) == (1.0, 1.0)
+    assert segment_crossing((0, 5), (10, 5), (3, 0), (3, 10)) == (3.0, 5.0)
+
+
+def test_nearly_parallel_crossing_is_the_rounded_exact_point():
+    p1, p2 = (0.0, 0.0), (1e6, 1.0)
+    p3, p4 = (0.0, 1e-15), (1e6, 1.0 - 1e-15)  # Close enough to parallel for the rational path
+    x, y = segment_crossing(p1, p2, p3, p4)
+    q1, q2, q3, q4 = ([Fraction(c) for c in p] for p in (p1, p2, p3, p4))
+    e1, e2 = (q2[0] - q1[0], q2[1] - q1[1]), (q4[0] - q3[0], q4[1] - q3[1])
+    t = ((q3[0] - q1[0]) * e2[1] - (q3[1] - q1[1]) * e2[0]) / (e1[0] * e2[1] - e1[1] * e2[0])
+    assert (x, y) == (float(q1[0] + t * e1[0]), float(q1[1] + t * e1[1]))
+
+
+def test_point_on_segment_is_exact():
+    a, b = (0.1, 0.2), (0.7, 1.4)
+    assert point_on_segment(a, a, b) and point_on_segment(b, a, b)
+    assert point_on_segment((3, 3), (0, 0), (6, 6))
+    assert not point_on_segment((7, 7), (0, 0), (6, 6))  # On the line, past the end
+    assert not point_on_segment((3, math.nextafter(3, 4)), (0, 0), (6, 6))
+    assert point_on_segment((2, 2), (2, 2), (2, 2)) and not point_on_segment((2, 3), (2, 2), (2, 2))
+    mid = (0.4, 0.8)  # Not exactly on the line once rounded to floats
+    assert point_on_segment(mid, a, b) == (orient2d_exact(a, b, mid) == 0)
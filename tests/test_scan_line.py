@@ -0,0 +1,61 @@
+import numpy as np
+import pygame
+import pytest
+
+from conftest import drawing_session, load_script, run_app
+from undo_history import SpanRecorder, UndoHistory
+
+scan_line = load_script('scan line.py', 'scan_line')
+
+
+def test_main_presents_every_change_with_dirty_rects():
+    """The dirty rects pushed by main() keep the display identical to a full redraw, and idle passes push nothing."""
+    tools = ['pencil', 'line', 'rect', 'circle', 'bound_4', 'bound_8', 'flood_4', 'flood_8', 'scanline']
+
+    def tool_x(tool):
+        return 6 + tools.index(tool) * (60 + 6) + 5
+
+    counts = run_app(scan_line.main, drawing_session(tool_x, 'scanline', scan_line.CANVAS_HEIGHT))
+    assert counts[-3:-1] == [0, 0]
+    assert counts[0] > 0
+
+
+def draw_scene(canvas):
+    pygame.draw.rect(canvas, scan_line.COLORS[0], (40, 30, 300, 200), 2)
+    pygame.draw.circle(canvas, scan_line.COLORS[3], (150, 120), 50, 2)
+    pygame.draw.line(canvas, scan_line.COLORS[0], (40, 130), (340, 60), 2)
+    pygame.draw.line(canvas, scan_line.COLORS[1], (60, 200), (300, 210), 1)
+
+
+@pytest.mark.parametrize('fill', ['boundary_4', 'boundary_8', 'flood_4', 'flood_8', 'scanline'])
+def test_indexed_canvas_matches_rgb_canvas(monkeypatch, fill):
+    canvases = []
+    for indexed in (True, False):
+        monkeypatch.setattr(scan_line, 'INDEXED_CANVAS', indexed)
+        canvas = scan_line.create_canvas(scan_line.CANVAS_WIDTH, scan_line.CANVAS_HEIGHT)
+        draw_scene(canvas)
+        recorder = SpanRecorder()
+        fill_color, boundary_color = scan_line.COLORS[4], scan_line.COLORS[0]
+        if fill.startswith('boundary'):
+            filler = scan_line.boundary_fill_iterative(canvas, 100, 100, fill_color, boundary_color,
+                                                       int(fill[-1]), recorder)
+        elif fill.startswith('flood'):
+            filler = scan_line.flood_fill_iterative(canvas, 100, 100, fill_color, int(fill[-1]), recorder)
+        else:
+            filler = scan_line.scanline_fill_iterative(canvas, 100, 100, fill_color, boundary_color, recorder)
+        for _ in filler:
+            pass
+        filled = pygame.surfarray.array3d(canvas)
+
+        history = UndoHistory()
+        history.push(recorder.finish(), canvas.map_rgb(fill_color))
+        history.undo(canvas)
+        undone = pygame.surfarray.array3d(canvas)
+        history.redo(canvas)
+        canvases.append((canvas.get_bytesize(), filled, undone, pygame.surfarray.array3d(canvas)))
+
+    (indexed_size, *indexed), (rgb_size, *rgb) = canvases
+    assert indexed_size == 1 and rgb_size == 4
+    for indexed_pixels, rgb_pixels in zip(indexed, rgb):
+        assert np.array_equal(indexed_pixels, rgb_pixels)
+    assert not np.array_equal(indexed[0], indexed[1])  # The fill changed something
@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+
+from clip_window import ClipWindow
+from conftest import load_script
+
+sutherland_hodgman = load_script('Sutherland Hodgeman.py', 'sutherland_hodgman')
+
+
+def reference_clip(subject, window):
+    """Textbook Sutherland-Hodgman with float half-plane tests, one clockwise window edge at a time."""
+    output = [tuple(map(float, v)) for v in subject]
+    edge_ends = window.vertices.tolist()
+    for edge in range(len(edge_ends)):
+        (x1, y1), (x2, y2) = edge_ends[edge - 1], edge_ends[edge]
+        inside = lambda p: (x2 - x1) * (p[1] - y1) - (y2 - y1) * (p[0] - x1) <= 0
+
+        def intersect(s, e):
+            ds = (x2 - x1) * (s[1] - y1) - (y2 - y1) * (s[0] - x1)
+            de = (x2 - x1) * (e[1] - y1) - (y2 - y1) * (e[0] - x1)
+            t = ds / (ds - de)
+            return (s[0] + t * (e[0] - s[0]), s[1] + t * (e[1] - s[1]))
+
+        input_list, output = output, []
+        if not input_list:
+            break
+        s = input_list[-1]
+        for e in input_list:
+            if inside(e):
+                if not inside(s):
+                    output.append(intersect(s, e))
+                output.append(e)
+            elif inside(s):
+                output.append(intersect(s, e))
+            s = e
+    return output
+
+
+def random_polygon(rng, n, center=(400, 300), radius=300):
+    """A star-shaped polygon with n vertices, reaching well outside the test windows."""
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+    radii = rng.uniform(0.2, 1.0, n) * radius
+    return list(zip((center[0] + radii * np.cos(angles)).tolist(), (center[1] + radii * np.sin(angles)).tolist()))
+
+
+def same_ring(a, b):
+    """Whether vertex lists a and b are the same cyclic sequence (within rounding)."""
+    a, b = np.asarray(a, dtype=np.float64).reshape(-1, 2), np.asarray(b, dtype=np.float64).reshape(-1, 2)
+    if len(a) != len(b):
+        return False
+    if not len(a):
+        return True
+    return any(np.allclose(np.roll(a, -shift, axis=0), b, atol=1e-7) for shift in range(len(a)))
+
+
+RECT = ClipWindow.from_bounds(200, 150, 600, 450)
+CONVEX = ClipWindow([(250, 100), (600, 180), (640, 420), (300, 500), (150, 320)])
+
+
+def test_rect_clipper_matches_reference():
+    rng = np.random.default_rng(5)
+    polygons = [random_polygon(rng, n) for n in rng.integers(3, 60, 200)]
+    polygons += [[(0, 0), (10, 0), (10, 10)], [(300, 300), (400, 300), (350, 400)]]  # Outside, inside
+    clipper = sutherland_hodgman.RectClipper(RECT, capacity=4)  # Small buffers so they have to grow
+    batch = sutherland_hodgman.sutherland_hodgman_clip_batch(polygons, RECT)
+    for polygon, many, result in zip(polygons, clipper.clip_many(polygons), batch):
+        expected = reference_clip(polygon, RECT)
+        assert np.allclose(clipper.clip(polygon), np.reshape(expected, (-1, 2)), atol=1e-9)
+        assert np.allclose(many, np.reshape(expected, (-1, 2)), atol=1e-9)
+        assert (result == []) == (expected == [])
+        if expected:
+            assert np.allclose(result[0], expected, atol=1e-9)
+
+
+@pytest.mark.parametrize('window', [RECT, CONVEX])
+def test_general_clip_matches_reference(window):
+    rng = np.random.default_rng(6)
+    for n in rng.integers(3, 60, 100):
+        polygon = random_polygon(rng, n)
+        expected = reference_clip(polygon, window)
+        result = sutherland_hodgman.sutherland_hodgman_clip(polygon, window)
+        assert (result == []) == (expected == [])
+        if expected:
+            assert np.allclose(result[0], expected, atol=1e-9)
+
+@pytest.mark.parametrize('window', [RECT, CONVEX])
+def test_stream_matches_reference(window, tmp_path):
+    rng = np.random.default_rng(7)
+    for n in list(rng.integers(3, 60, 100)) + [5000]:
+        polygon = random_polygon(rng, n)
+        expected = reference_clip(polygon, window)
+        assert same_ring(list(sutherland_hodgman.sutherland_hodgman_stream(iter(polygon), window)), expected)
+
+    source, target = tmp_path / 'source.bin', tmp_path / 'target.bin'
+    np.asarray(polygon, dtype=np.float64).tofile(source)
+    written = sutherland_hodgman.clip_vertex_file(str(source), str(target), window, chunk_size=64)
+    assert written == len(expected)
+    assert same_ring(np.fromfile(target, dtype=np.float64), expected)
+
+
+def same_cycle(a, b):
+    """Whether vertex lists a and b are exactly the same cyclic sequence."""
+    a, b = np.asarray(a, dtype=np.float64).reshape(-1, 2), np.asarray(b, dtype=np.float64).reshape(-1, 2)
+    return len(a) == len(b) and any(np.array_equal(np.roll(a, -shift, axis=0), b) for shift in range(len(a)))
+
+
+SQUARE = ClipWindow.from_bounds(0, 0, 10, 10)
+TRIANGLE = ClipWindow([(0, 0), (10, 0), (0, 10)])
+
+
+@pytest.mark.parametrize('window, subject, expected', [
+    (SQUARE, [(0, 0), (10, 0), (10, 10), (0, 10)], [(0, 0), (10, 0), (10, 10), (0, 10)]),  # The window itself
+    (SQUARE, [(0, 0), (5, 0), (5, 10), (0, 10)], [(0, 0), (5, 0), (5, 10), (0, 10)]),  # Two shared edges
+    (SQUARE, [(5, 0), (8, 5), (5, 8), (2, 5)], [(5, 0), (8, 5), (5, 8), (2, 5)]),  # A vertex on an edge
+    (SQUARE, [(-5, -5), (5, 5), (-5, 5)], [(0, 0), (5, 5), (0, 5)]),  # Crossing exactly at a corner
+    (SQUARE, [(-5, 5), (0, 5), (5, 5), (5, 15), (-5, 15)],  # A subject vertex on an edge, collinear with its neighbours
+     [(0, 10), (0, 5), (0, 5), (5, 5), (5, 10)]),
+    # Touching from outside: an edge or a vertex on the boundary leaves a zero-area polygon along it
+    (SQUARE, [(10, 0), (20, 0), (20, 10), (10, 10)], [(10, 0), (10, 0), (10, 10), (10, 10)]),
+    (SQUARE, [(10, 10), (20, 10), (20, 20)], [(10, 10)] * 4),
+    (SQUARE, [(5, 0), (15, 0), (15, -5), (5, -5)], [(5, 0), (5, 0), (10, 0), (10, 0)]),
+    (TRIANGLE, [(0, 0), (10, 0), (0, 10)], [(0, 0), (10, 0), (0, 10)]),
+    (TRIANGLE, [(5, 5), (10, 5), (10, 10), (5, 10)], [(5, 5)] * 3),
+    (TRIANGLE, [(0, 10), (5, 5), (10, 0), (10, 10)], [(0, 10), (0, 10), (5, 5), (10, 0), (10, 0)]),
+])
+def test_degenerate_contacts_give_exact_vertices(window, subject, expected):
+    """Collinear, touching and shared-vertex inputs: every clipper gives exactly the textbook vertices."""
+    assert same_cycle(reference_clip(subject, window), expected)
+    [clipped] = sutherland_hodgman.sutherland_hodgman_clip(subject, window)
+    assert same_cycle(clipped, expected)
+    assert same_cycle(list(sutherland_hodgman.sutherland_hodgman_stream(subject, window)), expected)
+    if window.is_rectangle:
+        assert same_cycle(sutherland_hodgman.RectClipper(window).clip(subject), expected)
+        [batch] = sutherland_hodgman.sutherland_hodgman_clip_batch([subject], window)
+        assert same_cycle(batch, expected)
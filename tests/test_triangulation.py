@@ -0,0 +1,68 @@
+import numpy as np
+
+from clip_window import ClipWindow
+from conftest import load_script
+from triangulation import TriangulationCache, triangulate
+
+sutherland_hodgman = load_script('Sutherland Hodgeman.py', 'sutherland_hodgman')
+
+BOWTIE = [(563, 54), (206, 165), (687, 338), (575, 482)]
+
+
+def doubled_areas(vertices, triangles):
+    a, b, c = (vertices[triangles[:, i]] for i in range(3))
+    return (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+
+
+def test_polygon_with_hole_is_covered_exactly():
+    outer = [(0, 0), (100, 0), (100, 60), (50, 30), (0, 60)]
+    hole = [(40, 10), (60, 10), (50, 20)]
+    vertices, triangles = triangulate(outer, [hole])
+    areas = doubled_areas(vertices, triangles)
+    assert (areas > 0).all()
+    assert areas.sum() == 2 * (4500 - 100)
+
+
+def test_self_intersecting_polygon_falls_back_to_a_fan():
+    vertices, triangles = triangulate(BOWTIE)
+    assert len(triangles) == 2 and (triangles[:, 0] == 0).all()
+    assert (doubled_areas(vertices, triangles) > 0).all()
+
+
+def test_clipped_self_intersecting_subject_gets_a_mesh():
+    window = ClipWindow.from_corners((250, 100), (650, 450))
+    clipped = sutherland_hodgman.sutherland_hodgman_clip(BOWTIE, window)
+    meshes = TriangulationCache().update([(polygon, []) for polygon in clipped])
+    assert len(meshes) == 1
+    vertices, triangles = meshes[0]
+    assert len(triangles) and triangles.max() < len(vertices)
+    assert np.all(doubled_areas(vertices, triangles) > 0)
+
+
+def test_cache_matches_uncached_triangulation():
+    """Across updates the cache returns what triangulate gives, reusing only meshes of unchanged polygons."""
+    square = [(0, 0), (40, 0), (40, 40), (0, 40)]
+    hole = [(10, 10), (10, 20), (20, 20), (20, 10)]
+    notch = [(50, 0), (90, 0), (90, 40), (70, 20), (50, 40)]
+    frames = [
+        [(square, []), (notch, [])],
+        [(square, []), (notch, []), (square, [])],  # A repeated polygon is meshed once
+        [(square, [hole]), (notch, [])],  # The same outer ring with a hole is a new polygon
+        [(BOWTIE, []), (square, [hole])],
+        [],
+        [(square, [])],
+    ]
+    cache = TriangulationCache()
+    previous = {}
+    for regions in frames:
+        meshes = cache.update(regions)
+        unique = list({repr(region): region for region in regions}.values())
+        assert len(meshes) == len(unique)
+        for region, (vertices, triangles) in zip(unique, meshes):
+            expected_vertices, expected_triangles = triangulate(*region)
+            assert np.array_equal(vertices, expected_vertices)
+            assert np.array_equal(triangles, expected_triangles)
+            if repr(region) in previous:
+                assert previous[repr(region)][1] is triangles
+        previous = {repr(region): mesh for region, mesh in zip(unique, meshes)}
+        assert len(cache.meshes) == len(unique)
@@ -0,0 +1,121 @@
+import numpy as np
+import pygame
+import pytest
+
+from undo_history import SpanRecorder, UndoHistory, stroke_bounds
+
+
+class CountingSurface(pygame.Surface):
+    """A surface that counts the fill() calls made on it."""
+
+    fills = 0
+
+    def fill(self, *args, **kwargs):
+        self.fills += 1
+        return super().fill(*args, **kwargs)
+
+
+def make_canvas():
+    surface = CountingSurface((64, 48))
+    surface.fill((255, 255, 255))
+    pygame.draw.circle(surface, (0, 0, 255), (20, 20), 9)
+    surface.fills = 0
+    return surface
+
+
+def record_block(surface, rect, color):
+    """Paints 'rect' pixel by pixel, as the fills do, and returns the recorded spans."""
+    recorder = SpanRecorder()
+    for y in range(rect.top, rect.bottom):
+        for x in range(rect.left, rect.right):
+            recorder.add(x, y, surface.get_at_mapped((x, y)))
+            surface.set_at((x, y), color)
+    return recorder.finish()
+
+
+def test_undo_and_redo_restore_exact_pixels():
+    surface = make_canvas()
+    history = UndoHistory()
+    states = [pygame.surfarray.array2d(surface)]
+
+    history.push(record_block(surface, pygame.Rect(10, 5, 30, 20), (255, 0, 0)), surface.map_rgb((255, 0, 0)))
+    states.append(pygame.surfarray.array2d(surface))
+    recorder = SpanRecorder()
+    area = stroke_bounds(((0, 0), (63, 47)), 2)
+    recorder.record_stroke(surface, area, pygame.draw.line, (0, 0, 0), (0, 0), (63, 47), 2)
+    history.push(recorder.finish(), surface.map_rgb((0, 0, 0)))
+    states.append(pygame.surfarray.array2d(surface))
+
+    assert history.undo(surface) is not None
+    assert (pygame.surfarray.array2d(surface) == states[1]).all()
+    assert history.undo(surface) == pygame.Rect(10, 5, 30, 20)
+    assert (pygame.surfarray.array2d(surface) == states[0]).all()
+    assert history.undo(surface) is None
+
+    assert history.redo(surface) == pygame.Rect(10, 5, 30, 20)
+    assert (pygame.surfarray.array2d(surface) == states[1]).all()
+    history.redo(surface)
+    assert (pygame.surfarray.array2d(surface) == states[2]).all()
+    assert history.redo(surface) is None
+
+
+def test_new_action_discards_redo_stack():
+    surface = make_canvas()
+    history = UndoHistory()
+    history.push(record_block(surface, pygame.Rect(0, 0, 8, 8), (255, 0, 0)), surface.map_rgb((255, 0, 0)))
+    history.undo(surface)
+    history.push(record_block(surface, pygame.Rect(4, 4, 8, 8), (0, 255, 0)), surface.map_rgb((0, 255, 0)))
+    assert history.redo(surface) is None
+    assert history.size == sum(spans.nbytes for spans, _ in history.undo_stack)
+
+
+def test_shader_entries_are_redone_through_the_shade_hook():
+    calls = []
+
+    def shade(surface, spans, shader):
+        calls.append(spans.copy())
+        for row, x0, x1 in spans.tolist():
+            surface.fill(shader(x0, row), (x0, row, x1 - x0 + 1, 1))
+        return pygame.Rect(0, 0, 1, 1)
+
+    surface = make_canvas()
+    shader = lambda x, y: (x * 4, y * 5, 0)
+    spans = record_block(surface, pygame.Rect(2, 2, 6, 3), (0, 0, 0))
+    history = UndoHistory(shade=shade)
+    history.push(spans, shader)
+    history.undo(surface)
+    history.redo(surface)
+    assert (calls[0] == spans[:, :3]).all()
+    with pytest.raises(ValueError):
+        UndoHistory().push(spans, shader)
+
+
+def test_oldest_entries_are_evicted_over_budget():
+    surface = make_canvas()
+    entries = [record_block(surface, pygame.Rect(40, i * 4, 16, 4), (i * 40, 0, 0)) for i in range(4)]
+    history = UndoHistory(budget=2 * entries[0].nbytes)
+    for i, spans in enumerate(entries):
+        history.push(spans, surface.map_rgb((i * 40, 0, 0)))
+
+    assert [spans is entry for (spans, _), entry in zip(history.undo_stack, entries[2:])] == [True, True]
+    assert history.size == 2 * entries[0].nbytes
+    assert history.undo(surface) is not None
+    assert history.undo(surface) is not None
+    assert history.undo(surface) is None
+
+
+def test_entries_cost_one_span_per_changed_run():
+    surface = make_canvas()
+    spans = record_block(surface, pygame.Rect(30, 10, 25, 20), (255, 0, 0))
+    # The block covers 20 rows of white, so every row is a single span
+    assert spans.shape == (20, 4)
+    assert (spans[:, 1] == 30).all() and (spans[:, 2] == 54).all()
+
+    history = UndoHistory()
+    history.push(spans, surface.map_rgb((255, 0, 0)))
+    surface.fills = 0
+    history.undo(surface)
+    assert surface.fills == len(spans)
+    surface.fills = 0
+    history.redo(surface)
+    assert surface.fills == len(spans)
@@ -0,0 +1,228 @@
+import math
+import random
+
+import pytest
+
+from conftest import load_script
+
+weiler_atherton = load_script('Weiler-Atherton.py', 'weiler_atherton')
+
+
+def random_ring(rng, n, center, radius):
+    """A star-shaped (usually concave) counterclockwise ring around 'center', at least radius / 4 from it."""
+    angles = sorted(rng.uniform(0, 2 * math.pi) for _ in range(n))
+    return [(center[0] + r * math.cos(a), center[1] + r * math.sin(a))
+            for a, r in ((a, rng.uniform(radius / 4, radius)) for a in angles)]
+
+
+def brute_force_pairs(subject_rings, clip_rings):
+    """Every (subject edge, clip edge) pair whose bounding boxes overlap."""
+    def boxes(rings):
+        for r, ring in enumerate(rings):
+            for i in range(len(ring)):
+                (x1, y1), (x2, y2) = ring[i - 1], ring[i]
+                yield (r, i), (min(x1, x2), max(x1, x2), min(y1, y2), max(y1, y2))
+
+    clip_boxes = list(boxes(clip_rings))
+    return {(edge, other)
+            for edge, (ax0, ax1, ay0, ay1) in boxes(subject_rings)
+            for other, (bx0, bx1, by0, by1) in clip_boxes
+            if ax0 <= bx1 and bx0 <= ax1 and ay0 <= by1 and by0 <= ay1}
+
+
+def test_sweep_finds_every_overlapping_edge_pair_once():
+    rng = random.Random(45)
+    for _ in range(40):
+        subject = [random_ring(rng, rng.randint(3, 40), (rng.randint(0, 200), rng.randint(0, 200)), 120)
+                   for _ in range(rng.randint(1, 3))]
+        clip = [random_ring(rng, rng.randint(3, 40), (rng.randint(0, 200), rng.randint(0, 200)), 120)
+                for _ in range(rng.randint(1, 3))]
+        # A long thin edge makes sure the tall edges are exercised
+        clip.append([(rng.randint(0, 200), -50), (rng.randint(0, 200), 300), (rng.randint(0, 200), 300)])
+        pairs = list(weiler_atherton.sweep_edge_pairs(subject, clip))
+        assert len(pairs) == len(set(pairs))
+        assert set(pairs) == brute_force_pairs(subject, clip)
+
+
+REFERENCE_OPERATIONS = {
+    'intersection': lambda a, b: a and b,
+    'union': lambda a, b: a or b,
+    'difference': lambda a, b: a and not b,
+    'xor': lambda a, b: a != b,
+}
+
+
+def random_polygon(rng):
+    """An (outer, holes) pair, with a hole in about half of them."""
+    center = (rng.uniform(60, 140), rng.uniform(60, 140))
+    outer = random_ring(rng, rng.randint(3, 25), center, rng.uniform(40, 90))
+    holes = [random_ring(rng, rng.randint(3, 8), center, 8)[::-1]] if rng.random() < 0.5 else []
+    return outer, holes
+
+
+@pytest.mark.parametrize('operation', weiler_atherton.BOOLEAN_OPERATIONS)
+def test_boolean_operations_match_point_sampling(operation):
+    """Every sample point is inside the result exactly when the operation holds for the two inputs."""
+    rng = random.Random(46)
+    samples = [(rng.uniform(0, 240), rng.uniform(0, 240)) for _ in range(1500)]
+    for _ in range(15):
+        subject, clip = random_polygon(rng), random_polygon(rng)
+        subject_rings, clip_rings = weiler_atherton.polygon_rings(subject), weiler_atherton.polygon_rings(clip)
+        result_rings = weiler_atherton.polygon_rings(weiler_atherton.polygon_boolean(subject, clip, operation))
+        for p in samples:
+            expected = REFERENCE_OPERATIONS[operation](weiler_atherton.point_in_rings(p, subject_rings),
+                                                       weiler_atherton.point_in_rings(p, clip_rings))
+            assert weiler_atherton.point_in_rings(p, result_rings) == expected
+
+
+@pytest.mark.parametrize('rows', [None, 1, 7, 500])
+def test_polygon_locator_matches_point_in_rings(rows):
+    """Integer vertices and grid samples put many queries exactly on vertices and edges."""
+    rng = random.Random(47)
+    grid = [(x, y) for x in range(-5, 206, 3) for y in range(-5, 206, 3)]
+    for _ in range(8):
+        polygon = weiler_atherton.polygon_rings(random_polygon(rng))
+        rings = [[(round(x), round(y)) for x, y in ring] for ring in polygon]
+        # A self-intersecting ring, whose edges can't be kept in order within a row
+        rings.append([(rng.randint(0, 200), rng.randint(0, 200)) for _ in range(rng.randint(4, 12))])
+        rings.append([(40, 40), (40, 120), (120, 120), (120, 40)])  # Vertical and horizontal edges
+        samples = grid + [p for ring in rings for p in ring] + [(rng.uniform(0, 200), rng.uniform(0, 200))
+                                                                  for _ in range(500)]
+        locator = weiler_atherton.PolygonLocator(rings, rows)
+        expected = [weiler_atherton.point_in_rings(p, rings) for p in samples]
+        assert [locator.contains(x, y) for x, y in samples] == expected
+        assert locator.contains_points(samples).tolist() == expected
+        assert locator.contains_points(samples, chunk_size=97).tolist() == expected
+
+
+def same_polygon(a, b):
+    """Whether vertex lists a and b are exactly the same cycle, in either direction."""
+    a, b = [tuple(map(float, p)) for p in a], [tuple(map(float, p)) for p in b]
+    return len(a) == len(b) and any(a[i:] + a[:i] in (b, b[::-1]) for i in range(len(a)))
+
+
+SQUARE = [(0, 10), (10, 10), (10, 0), (0, 0)]
+
+
+@pytest.mark.parametrize('subject, expected', [
+    ([(0, 0), (10, 0), (10, 10), (0, 10)], [[(0, 0), (10, 0), (10, 10), (0, 10)]]),  # The clip polygon itself
+    ([(0, 0), (5, 0), (5, 10), (0, 10)], [[(0, 0), (5, 0), (5, 10), (0, 10)]]),  # Shared edges
+    ([(5, 0), (8, 5), (5, 8), (2, 5)], [[(5, 0), (8, 5), (5, 8), (2, 5)]]),  # A vertex on an edge
+    ([(-5, -5), (5, 5), (-5, 5)], [[(0, 0), (5, 5), (0, 5)]]),  # Crossing exactly at a corner
+    ([(-5, 5), (0, 5), (5, 5), (5, 15), (-5, 15)], [[(0, 5), (5, 5), (5, 10), (0, 10)]]),  # Collinear vertices
+    ([(5, -5), (15, -5), (15, 5), (5, 5)], [[(5, 0), (10, 0), (10, 5), (5, 5)]]),  # Proper crossings only
+    ([(5, 5), (15, 5), (15, -5), (5, -5)], [[(5, 0), (10, 0), (10, 5), (5, 5)]]),  # Same, wound the other way
+    # Touching from outside leaves nothing
+    ([(10, 0), (20, 0), (20, 10), (10, 10)], []),
+    ([(10, 10), (20, 10), (20, 20)], []),
+    ([(5, 0), (15, 0), (15, -5), (5, -5)], []),
+])
+def test_weiler_atherton_degenerate_contacts_give_exact_vertices(subject, expected):
+    for clip in (SQUARE, SQUARE[::-1]):
+        result = weiler_atherton.weiler_atherton_clip(subject, clip)
+        assert len(result) == len(expected)
+        assert all(any(same_polygon(ring, want) for want in expected) for ring in result)
+
+
+def test_weiler_atherton_clip_matches_point_sampling():
+    """General-position pairs in either winding: the clip covers exactly the points inside both."""
+    rng = random.Random(48)
+    samples = [(rng.uniform(0, 240), rng.uniform(0, 240)) for _ in range(1500)]
+    for _ in range(30):
+        subject, clip = random_polygon(rng)[0], random_polygon(rng)[0]
+        if rng.random() < 0.5:
+            clip = clip[::-1]
+        result = weiler_atherton.weiler_atherton_clip(subject, clip)
+        for p in samples:
+            expected = weiler_atherton.is_inside(p, subject) and weiler_atherton.is_inside(p, clip)
+            assert weiler_atherton.point_in_rings(p, result) == expected
+
+
+# Shapes on a small integer grid, so random placements share vertices, edges and collinear runs
+GRID_SHAPES = [
+    [(0, 0), (4, 0), (4, 3), (0, 3)],
+    [(0, 0), (4, 0), (4, 2), (2, 2), (2, 4), (0, 4)],
+    [(0, 0), (4, 0), (0, 4)],
+    [(0, 0), (6, 0), (6, 4), (4, 4), (4, 2), (2, 2), (2, 4), (0, 4)],
+    [(0, 0), (4, 2), (0, 4), (2, 2)],
+]
+
+
+def grid_polygon(rng):
+    dx, dy = rng.randint(0, 4), rng.randint(0, 4)
+    polygon = [(x + dx, y + dy) for x, y in rng.choice(GRID_SHAPES)]
+    return polygon[::-1] if rng.random() < 0.5 else polygon
+
+
+@pytest.mark.parametrize('operation', weiler_atherton.BOOLEAN_OPERATIONS)
+def test_greiner_hormann_handles_touching_polygons_exactly(operation):
+    """Point sampling decides the result; its vertices must be exactly input vertices or edge crossings."""
+    rng = random.Random(49)
+    samples = [(rng.uniform(-1, 11), rng.uniform(-1, 11)) for _ in range(500)]
+    for _ in range(150):
+        subject, clip = grid_polygon(rng), grid_polygon(rng)
+        exact = set(subject + clip) | {pt for pt, _, _ in weiler_atherton.find_ring_intersections([subject], [clip])}
+        result_rings = weiler_atherton.polygon_rings(weiler_atherton.greiner_hormann_clip(subject, clip, operation))
+        assert {p for ring in result_rings for p in ring} <= exact
+        for p in samples:
+            expected = REFERENCE_OPERATIONS[operation](weiler_atherton.is_inside(p, subject),
+                                                       weiler_atherton.is_inside(p, clip))
+            assert weiler_atherton.point_in_rings(p, result_rings) == expected
+
+
+def test_greiner_hormann_coincident_vertices():
+    subject = [(0, 0), (4, 0), (4, 4), (0, 4)]
+    clip = [(4, 4), (8, 4), (8, 8), (4, 8)]  # Meets the subject only at the coincident vertex (4, 4)
+
+    def clip_rings(operation):
+        return [outer for outer, _ in weiler_atherton.greiner_hormann_clip(subject, clip, operation)]
+
+    assert clip_rings('intersection') == []
+    [union] = clip_rings('union')  # One ring pinched at (4, 4)
+    assert same_polygon(union, [(8, 4), (8, 8), (4, 8), (4, 4), (0, 4), (0, 0), (4, 0), (4, 4)])
+    [difference] = clip_rings('difference')
+    assert same_polygon(difference, subject)
+    xor = clip_rings('xor')
+    assert len(xor) == 2 and same_polygon(xor[0], subject) and same_polygon(xor[1], clip)
+
+
+def test_remove_degeneracies_leaves_only_proper_crossings():
+    rng = random.Random(50)
+    for _ in range(100):
+        subject, clip = [grid_polygon(rng)], [grid_polygon(rng)]
+        originals = [list(ring) for ring in subject + clip]
+        touching = weiler_atherton.has_degeneracies(subject, clip)
+        moved = weiler_atherton.remove_degeneracies(subject, clip)
+        assert (moved > 0) == touching
+        assert not weiler_atherton.has_degeneracies(subject, clip)
+        shifts = [math.dist(p, q) for ring, original in zip(subject + clip, originals) for p, q in zip(ring, original)]
+        assert sum(shift > 0 for shift in shifts) <= moved
+        assert max(shifts) < 1e-6
+
+
+def test_remove_degeneracies_moves_subject_vertices_first():
+    subject = [[(0, 0), (4, 0), (4, 4), (0, 4)]]
+    clip = [[(4, 4), (8, 4), (8, 8), (4, 8)]]  # The coincident vertex (4, 4)
+    assert weiler_atherton.remove_degeneracies(subject, clip) >= 1
+    assert clip == [[(4, 4), (8, 4), (8, 8), (4, 8)]]
+    assert subject[0][2] != (4, 4) and math.dist(subject[0][2], (4, 4)) < 1e-6
+
+
+def test_engine_switch_skips_engines_that_reject_the_clip_polygon():
+    concave = [(0, 0), (10, 0), (5, 2), (10, 10), (0, 10)]
+    flat = [(0, 0), (5, 5), (10, 10)]
+    convex = [(0, 0), (10, 0), (10, 10), (0, 10)]
+    assert not weiler_atherton.engine_accepts('sutherland-hodgman', concave)
+    assert not weiler_atherton.engine_accepts('sutherland-hodgman', flat)
+    assert weiler_atherton.engine_accepts('sutherland-hodgman', convex)
+    names = list(weiler_atherton.POLYGON_CLIP_ENGINES)
+    for polygon in (concave, flat):
+        seen = {weiler_atherton.DEFAULT_POLYGON_CLIP_ENGINE}
+        name = weiler_atherton.DEFAULT_POLYGON_CLIP_ENGINE
+        for _ in names:
+            name = weiler_atherton.next_engine(name, polygon)
+            seen.add(name)
+        assert seen == {name for name in names if weiler_atherton.POLYGON_CLIP_ENGINES[name].concave}
+    name = weiler_atherton.DEFAULT_POLYGON_CLIP_ENGINE
+    assert {name := weiler_atherton.next_engine(name, convex) for _ in names} == set(names)
+    assert {name := weiler_atherton.next_engine(name) for _ in names} == set(names)
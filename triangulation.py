@@ -0,0 +1,266 @@
+import math
+import numpy as np
+from robust_predicates import orient2d
+
+# --- Polygon Triangulation by Monotone Partition ---
+#
+# The polygon (outer ring plus holes) is first cut into y-monotone pieces by a top-to-bottom
+# sweep that adds diagonals at split and merge vertices, then each piece is triangulated in
+# linear time with the stack algorithm. Overall O(n log n); works for concave polygons and holes.
+
+
+def _above(p, q):
+    """Sweep order: higher y first, ties broken by smaller x."""
+    return p[1] > q[1] or (p[1] == q[1] and p[0] < q[0])
+
+
+def _clean_ring(ring):
+    """Drops repeated consecutive vertices; returns None for rings that enclose nothing."""
+    ring = [tuple(p) for p in ring]
+    ring = [p for i, p in enumerate(ring) if p != ring[i - 1]] if len(ring) > 1 else ring
+    if len(ring) < 3:
+        return None
+    area = sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring[-1:] + ring[:-1], ring))
+    return ring if area != 0 else None
+
+
+def _x_at(points, edge, y):
+    """x where edge (a, b) meets the horizontal line at y."""
+    (x1, y1), (x2, y2) = points[edge[0]], points[edge[1]]
+    if y1 == y2:
+        return min(x1, x2)
+    return x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+
+
+def _monotone_diagonals(points, nxt, prv):
+    """The diagonals that split the polygon into y-monotone pieces (interior on the left of nxt)."""
+    order = sorted(range(len(points)), key=lambda i: (-points[i][1], points[i][0]))
+    status = []  # Edges (i, nxt[i]) crossing the sweep line with the interior to their right, left to right
+    helper = {}
+    is_merge = set()
+    diagonals = []
+
+    def left_edge(v):
+        # Edge of the status directly left of vertex v
+        x, y = points[v]
+        lo, hi = 0, len(status)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _x_at(points, status[mid], y) < x:
+                lo = mid + 1
+            else:
+                hi = mid
+        return status[lo - 1]
+
+    def insert(edge):
+        x, y = points[edge[0]]
+        lo, hi = 0, len(status)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _x_at(points, status[mid], y) < x:
+                lo = mid + 1
+            else:
+                hi = mid
+        status.insert(lo, edge)
+        helper[edge] = edge[0]
+
+    def close(edge, v):
+        # Removing an edge whose helper is a merge vertex needs a diagonal to it
+        if helper[edge] in is_merge:
+            diagonals.append((v, helper[edge]))
+        status.remove(edge)
+
+    def update_left(v):
+        edge = left_edge(v)
+        if helper[edge] in is_merge:
+            diagonals.append((v, helper[edge]))
+        helper[edge] = v
+
+    for v in order:
+        p, a, b = points[v], points[prv[v]], points[nxt[v]]
+        prev_edge, edge = (prv[v], v), (v, nxt[v])
+        convex = orient2d(a, p, b) > 0
+        if _above(p, a) and _above(p, b):
+            if not convex:  # Split vertex
+                edge_left = left_edge(v)
+                diagonals.append((v, helper[edge_left]))
+                helper[edge_left] = v
+            insert(edge)  # Start or split vertex
+        elif _above(a, p) and _above(b, p):
+            close(prev_edge, v)  # End or merge vertex
+            if not convex:  # Merge vertex
+                update_left(v)
+                is_merge.add(v)
+        elif _above(a, p):  # Regular vertex with the interior to its right
+            close(prev_edge, v)
+            insert(edge)
+        else:  # Regular vertex with the interior to its left
+            update_left(v)
+    return diagonals
+
+
+def _faces(points, nxt, diagonals):
+    """Splits the polygon along the diagonals; returns each piece as a counterclockwise index list."""
+    outgoing = {v: [nxt[v]] for v in range(len(points))}
+    for a, b in set(map(frozenset, diagonals)):
+        outgoing[a].append(b)
+        outgoing[b].append(a)
+
+    def angle(v, w):
+        return math.atan2(points[w][1] - points[v][1], points[w][0] - points[v][0])
+
+    # Half-edge u->v continues along the outgoing edge at v that is first clockwise from v->u
+    turn = {}
+    for v, targets in outgoing.items():
+        if len(targets) == 1:
+            continue
+        ordered = sorted(targets, key=lambda w: angle(v, w))
+        turn[v] = ordered
+    pieces = []
+    used = set()
+    half_edges = [(v, w) for v, targets in outgoing.items() for w in targets]
+    for start in half_edges:
+        if start in used:
+            continue
+        piece = []
+        u, v = start
+        while (u, v) not in used:
+            used.add((u, v))
+            piece.append(u)
+            if v in turn:
+                ordered = turn[v]
+                back = angle(v, u)
+                # Largest angle strictly below the reverse direction, wrapping around
+                candidates = [w for w in ordered if w != u]
+                below = [w for w in candidates if angle(v, w) < back]
+                w = below[-1] if below else candidates[-1]
+            else:
+                w = outgoing[v][0]
+            u, v = v, w
+        pieces.append(piece)
+    return pieces
+
+
+def _triangulate_monotone(points, piece, triangles):
+    """Stack triangulation of one y-monotone counterclockwise piece, appending index triples."""
+    n = len(piece)
+    top = min(range(n), key=lambda k: (-points[piece[k]][1], points[piece[k]][0]))
+    bottom = min(range(n), key=lambda k: (points[piece[k]][1], -points[piece[k]][0]))
+    # Walking forward from the top descends the left chain, backward the right chain
+    side = {}
+    k = top
+    while k != bottom:
+        side[piece[k]] = 'left'
+        k = (k + 1) % n
+    k = (top - 1) % n
+    while k != bottom:
+        side[piece[k]] = 'right'
+        k = (k - 1) % n
+    side[piece[bottom]] = 'left'
+    side[piece[top]] = 'right'
+    order = sorted(piece, key=lambda i: (-points[i][1], points[i][0]))
+
+    def emit(a, b, c):
+        turn = orient2d(points[a], points[b], points[c])
+        if turn:  # Collinear vertices give empty triangles, which are left out
+            triangles.append((a, b, c) if turn > 0 else (a, c, b))
+
+    stack = [order[0], order[1]]
+    for u in order[2:-1]:
+        if side[u] != side[stack[-1]]:
+            for a, b in zip(stack, stack[1:]):
+                emit(u, a, b)
+            stack = [stack[-1], u]
+        else:
+            v = stack.pop()
+            while stack:
+                w = stack[-1]
+                turn = orient2d(points[w], points[u], points[v])
+                if (turn < 0) if side[u] == 'left' else (turn > 0):
+                    emit(u, v, w)
+                    v = stack.pop()
+                else:
+                    break
+            stack.extend((v, u))
+    last = order[-1]
+    for a, b in zip(stack, stack[1:]):
+        emit(last, a, b)
+
+
+def _fan(points, count, triangles):
+    """Triangle fan from the first vertex over points[:count], appending index triples."""
+    for i in range(1, count - 1):
+        turn = orient2d(points[0], points[i], points[i + 1])
+        if turn:
+            triangles.append((0, i, i + 1) if turn > 0 else (0, i + 1, i))
+
+
+def triangulate(outer, holes=()):
+    """
+    Triangulates a simple polygon with optional holes.
+    Returns (vertices, triangles): an (N, 2) float array and an (M, 3) uint32 array of
+    counterclockwise vertex indices, ready for glDrawElements.
+    Rings that are not simple (self-intersecting outer ring, crossing holes) cannot be split
+    by the sweep; they fall back to a fan over the outer ring, which fills it the way
+    GL_POLYGON does.
+    """
+    rings = []
+    enclosed = 0  # Twice the area inside the outer ring and outside the holes
+    for k, ring in enumerate([outer] + list(holes)):
+        ring = _clean_ring(ring)
+        if ring is None:
+            if k == 0:
+                return np.zeros((0, 2)), np.zeros((0, 3), dtype=np.uint32)
+            continue
+        area = sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring[-1:] + ring[:-1], ring))
+        # Interior on the left: the outer ring counterclockwise, holes clockwise
+        if (area > 0) != (k == 0):
+            ring = ring[::-1]
+        rings.append(ring)
+        enclosed += abs(area) if k == 0 else -abs(area)
+
+    points, nxt, prv = [], [], []
+    for ring in rings:
+        base, count = len(points), len(ring)
+        points.extend(ring)
+        nxt.extend(base + (i + 1) % count for i in range(count))
+        prv.extend(base + (i - 1) % count for i in range(count))
+
+    vertices = np.array(points, dtype=np.float64)
+    triangles = []
+    try:
+        for piece in _faces(points, nxt, _monotone_diagonals(points, nxt, prv)):
+            if len(piece) >= 3:
+                _triangulate_monotone(points, piece, triangles)
+    except (IndexError, KeyError, ValueError):  # Crossing edges leave the sweep status inconsistent
+        triangles = None
+    if triangles is not None:
+        # Crossing edges can also leave the sweep with overlapping triangles; their area gives them away
+        corners = vertices[np.array(triangles, dtype=np.intp).reshape(-1, 3)]
+        (ax, ay), (bx, by), (cx, cy) = (corners[:, i].T for i in range(3))
+        covered = ((bx - ax) * (cy - ay) - (by - ay) * (cx - ax)).sum()
+        if not math.isclose(covered, enclosed, rel_tol=1e-9, abs_tol=1e-9):
+            triangles = None
+    if triangles is None:
+        triangles = []
+        _fan(points, len(rings[0]), triangles)
+    return vertices, np.array(triangles, dtype=np.uint32).reshape(-1, 3)
+
+
+class TriangulationCache:
+    """
+    Triangle meshes for clip results, keyed by the polygon's vertices, so a result is only
+    triangulated again when it actually changes.
+    """
+
+    def __init__(self):
+        self.meshes = {}
+
+    def update(self, regions):
+        """Meshes for a list of (outer, holes) pairs; entries for polygons no longer shown are dropped."""
+        meshes = {}
+        for outer, holes in regions:
+            key = (tuple(map(tuple, outer)), tuple(tuple(map(tuple, hole)) for hole in holes))
+            meshes[key] = self.meshes.get(key) or meshes.get(key) or triangulate(outer, holes)
+        self.meshes = meshes
+        return list(meshes.values())
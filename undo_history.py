@@ -0,0 +1,124 @@
+from array import array
+from collections import deque
+import numpy as np
+import pygame
+
+# --- Undo History Shared by the Fill Visualizers ---
+
+UNDO_MEMORY_BUDGET = 8 * 1024 * 1024  # Bytes of span records kept for undo/redo
+
+
+class SpanRecorder:
+    """
+    Collects the pixels changed by one fill or stroke while it runs.
+    finish() run-length encodes them into (row, x0, x1, old_color) spans.
+    """
+
+    def __init__(self):
+        self.xs, self.ys, self.olds = array('i'), array('i'), array('I')
+        self.chunks = []  # (ys, xs, olds) arrays captured from stroke diffs
+
+    def add(self, x, y, old_color):
+        """Records a single pixel about to be overwritten (old_color is a mapped value)."""
+        self.xs.append(x)
+        self.ys.append(y)
+        self.olds.append(old_color)
+
+    def add_many(self, xs, ys, old_colors):
+        """Records arrays of pixels about to be overwritten."""
+        self.chunks.append((np.asarray(ys), np.asarray(xs), np.asarray(old_colors)))
+
+    def record_stroke(self, surface, area, draw, *args):
+        """
+        Runs draw(surface, *args) and records the pixels it changed inside 'area',
+        which must cover everything the call can touch. Returns the Rect reported by draw.
+        """
+        area = area.clip(surface.get_rect())
+        if not area:
+            return draw(surface, *args)
+        before = pygame.surfarray.array2d(surface.subsurface(area))
+        changed_rect = draw(surface, *args)
+        after = pygame.surfarray.array2d(surface.subsurface(area))
+        xs, ys = np.nonzero(before != after)
+        self.chunks.append((ys + area.y, xs + area.x, before[xs, ys]))
+        return changed_rect
+
+    def finish(self):
+        """Returns the recorded changes as a uint32 array of (row, x0, x1, old_color) spans."""
+        ys = np.concatenate([np.frombuffer(self.ys, dtype=np.int32)] + [c[0] for c in self.chunks]).astype(np.int64)
+        xs = np.concatenate([np.frombuffer(self.xs, dtype=np.int32)] + [c[1] for c in self.chunks]).astype(np.int64)
+        olds = np.concatenate([np.frombuffer(self.olds, dtype=np.uint32)] + [c[2] for c in self.chunks])
+        if not len(xs):
+            return np.empty((0, 4), dtype=np.uint32)
+
+        order = np.lexsort((xs, ys))
+        xs, ys, olds = xs[order], ys[order], olds[order]
+        breaks = (np.diff(xs) != 1) | (np.diff(ys) != 0) | (np.diff(olds) != 0)
+        starts = np.concatenate(([0], np.flatnonzero(breaks) + 1))
+        ends = np.concatenate((starts[1:] - 1, [len(xs) - 1]))
+        return np.column_stack((ys[starts], xs[starts], xs[ends], olds[starts])).astype(np.uint32)
+
+
+class UndoHistory:
+    """
+    Undo/redo stacks of span deltas. Every entry changed its spans to a single new color
+    or to the output of a shader, so undo repaints the old colors in O(spans) and redo
+    repaints the new color. Shader entries are redone by shade(surface, spans, shader),
+    which must be given for histories that record them.
+    The oldest entries are evicted once the stored spans exceed 'budget' bytes.
+    """
+
+    def __init__(self, budget=UNDO_MEMORY_BUDGET, shade=None):
+        self.budget = budget
+        self.shade = shade
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.size = 0
+
+    def push(self, spans, new_color):
+        """Records a finished action; starting a new action discards the redo stack."""
+        if not len(spans):
+            return
+        if callable(new_color) and self.shade is None:
+            raise ValueError("UndoHistory needs a 'shade' function to record shader fills")
+        self.size -= sum(entry[0].nbytes for entry in self.redo_stack)
+        self.redo_stack.clear()
+        self.undo_stack.append((spans, new_color))
+        self.size += spans.nbytes
+        while self.size > self.budget and self.undo_stack:
+            self.size -= self.undo_stack.popleft()[0].nbytes
+
+    def undo(self, surface):
+        """Reverts the latest action. Returns the changed Rect, or None if there is nothing to undo."""
+        if not self.undo_stack:
+            return None
+        spans, new_color = self.undo_stack.pop()
+        self.redo_stack.append((spans, new_color))
+        for row, x0, x1, old_color in spans.tolist():
+            surface.fill(old_color, (x0, row, x1 - x0 + 1, 1))
+        return self._bounds(spans)
+
+    def redo(self, surface):
+        """Re-applies the latest undone action. Returns the changed Rect, or None."""
+        if not self.redo_stack:
+            return None
+        spans, new_color = self.redo_stack.pop()
+        self.undo_stack.append((spans, new_color))
+        if callable(new_color):
+            return self.shade(surface, spans[:, :3], new_color)
+        for row, x0, x1, _ in spans.tolist():
+            surface.fill(new_color, (x0, row, x1 - x0 + 1, 1))
+        return self._bounds(spans)
+
+    @staticmethod
+    def _bounds(spans):
+        y0, x0 = int(spans[:, 0].min()), int(spans[:, 1].min())
+        y1, x1 = int(spans[:, 0].max()), int(spans[:, 2].max())
+        return pygame.Rect(x0, y0, x1 - x0 + 1, y1 - y0 + 1)
+
+
+def stroke_bounds(points, pad):
+    """Returns a Rect covering 'points' grown by 'pad' pixels on every side."""
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return pygame.Rect(min(xs) - pad, min(ys) - pad, max(xs) - min(xs) + 2 * pad + 1, max(ys) - min(ys) + 2 * pad + 1)